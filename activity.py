@@ -0,0 +1,139 @@
+"""
+Recent-activity ring buffers for the moderator and admin feeds
+
+Trades, signups and logins are appended to one fixed-size global
+buffer and to a buffer per kind as they happen, so "the last N events"
+is a slice off the end of a deque (O(N)) instead of a walk over every
+user's history plus a sort.
+
+Every event gets an increasing id. stream() follows the feed from an id
+onwards as server-sent events, which /api/activity/stream uses for live
+moderation; clients reconnect with Last-Event-ID.
+
+Buffers are per process: with several gunicorn workers each keeps the
+events it served, and app_aws backfills older trades from DynamoDB the
+first time a feed is read.
+
+Environment:
+    ACTIVITY_SIZE           events kept in the global buffer (default 1000)
+    ACTIVITY_KIND_SIZE      events kept per kind (default 200)
+    ACTIVITY_STREAM_SECONDS max length of one stream connection (default 300)
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+ACTIVITY_SIZE = int(os.environ.get('ACTIVITY_SIZE', 1000))
+ACTIVITY_KIND_SIZE = int(os.environ.get('ACTIVITY_KIND_SIZE', 200))
+ACTIVITY_STREAM_SECONDS = float(os.environ.get('ACTIVITY_STREAM_SECONDS', 300))
+HEARTBEAT_SECONDS = 15
+
+KINDS = ('trade', 'signup', 'login')
+
+
+class ActivityFeed:
+    """Global and per-kind ring buffers of recent events"""
+
+    def __init__(self, size=ACTIVITY_SIZE, kind_size=ACTIVITY_KIND_SIZE, kinds=KINDS):
+        self.events = deque(maxlen=size)
+        self.by_kind = {kind: deque(maxlen=kind_size) for kind in kinds}
+        self.last_id = 0
+        self.backfilled = False
+        self._changed = threading.Condition()
+        self._backfill_lock = threading.Lock()
+
+    def record(self, kind, username, timestamp=None, **fields):
+        """
+        Append one event
+
+        Args:
+            kind: 'trade', 'signup', 'login', ...; kinds without their own
+                  buffer only go to the global one
+            fields: Extra event data (e.g. type, coin_id, amount for trades)
+
+        Returns:
+            dict: The stored event
+        """
+        with self._changed:
+            self.last_id += 1
+            event = dict(fields, id=self.last_id, kind=kind, username=username,
+                         timestamp=str(timestamp or datetime.now().isoformat()))
+            self.events.append(event)
+            if kind in self.by_kind:
+                self.by_kind[kind].append(event)
+            self._changed.notify_all()
+        return event
+
+    def record_trade(self, username, transaction):
+        fields = {'transaction_id': transaction['transaction_id']} if 'transaction_id' in transaction else {}
+        return self.record('trade', username, transaction['timestamp'], type=transaction['type'],
+                           coin_id=transaction['coin_id'], quantity=float(transaction['quantity']),
+                           amount=float(transaction['amount']), **fields)
+
+    def backfill(self, kind, load_events):
+        """
+        Fill spare capacity with stored events, once per process
+
+        Args:
+            load_events: fn() -> stored events (dicts with at least username
+                         and timestamp), newest first; ones already recorded
+                         (same transaction_id) are skipped
+        """
+        if self.backfilled:
+            return
+        with self._backfill_lock:
+            if self.backfilled:
+                return
+            stored = load_events()
+            with self._changed:
+                seen = {event.get('transaction_id') for event in self.events} - {None}
+                buffers = [self.events] + ([self.by_kind[kind]] if kind in self.by_kind else [])
+                for item in stored:
+                    if all(len(buffer) >= buffer.maxlen for buffer in buffers):
+                        break
+                    if item.get('transaction_id') in seen:
+                        continue
+                    # Older than everything recorded live; id 0 keeps it out of streams
+                    event = dict(item, id=0, kind=kind, timestamp=str(item.get('timestamp', '')))
+                    for buffer in buffers:
+                        if len(buffer) < buffer.maxlen:
+                            buffer.appendleft(event)
+            self.backfilled = True
+
+    def recent(self, n=20, kind=None):
+        """Newest n events (of one kind, if given), newest first"""
+        buffer = self.events if kind is None else self.by_kind.get(kind, ())
+        with self._changed:
+            return list(islice(reversed(buffer), max(n, 0)))
+
+    def since(self, last_id, timeout=None):
+        """Events newer than last_id, oldest first, waiting up to timeout for one"""
+        with self._changed:
+            if self.last_id <= last_id and timeout:
+                self._changed.wait_for(lambda: self.last_id > last_id, timeout)
+            newer = min(self.last_id - last_id, len(self.events))
+            return list(islice(reversed(self.events), max(newer, 0)))[::-1]
+
+    def stream(self, last_id=None, kind=None, duration=ACTIVITY_STREAM_SECONDS):
+        """Server-sent events from last_id (default: now) until duration elapses"""
+        # An id from another worker or before a restart may be ahead of this feed
+        last_id = self.last_id if last_id is None else min(last_id, self.last_id)
+        deadline = time.monotonic() + duration
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            events = self.since(last_id, timeout=min(HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0)))
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                last_id = event['id']
+                if kind is None or event['kind'] == kind:
+                    yield f"id: {event['id']}\nevent: {event['kind']}\ndata: {json.dumps(event)}\n\n"
+
+    def __len__(self):
+        return len(self.events)
@@ -0,0 +1,207 @@
+"""
+Vectorized market analytics for the analyst dashboard
+
+Computes per-coin volatility (full period and rolling), simple moving
+average, RSI, drawdowns and the cross-coin return correlation matrix
+with NumPy over the historical series each app already serves
+(get_market_series, i.e. [{'x': ms, 'y': price}]).
+
+Series are converted to NumPy arrays once when cached, resampled onto
+one time grid with np.interp into a (coins x points) matrix, and every
+metric is a whole-matrix operation; rolling windows use cumulative sums
+instead of Python loops. All metrics for 20 coins over a year of hourly
+data (including the correlation matrix) take tens of milliseconds, the
+correlation matrix alone a couple.
+
+Historical series are cached per (coin, days, currency) and finished
+results per (coin set, days, window, currency).
+"""
+
+import time
+
+import numpy as np
+
+import upstream
+from cache import TTLCache
+
+SERIES_TTL = 300
+ANALYTICS_TTL = 300
+DEFAULT_WINDOW = 24
+RSI_PERIOD = 14
+MAX_COINS = 50
+
+MS_PER_YEAR = 365 * 24 * 3600 * 1000
+
+series_cache = TTLCache(max_entries=1024)
+analytics_cache = TTLCache(max_entries=256)
+
+
+def series_arrays(points):
+    """[{'x': ms, 'y': price}, ...] -> (timestamps, prices) arrays sorted by time"""
+    x = np.fromiter((p['x'] for p in points), dtype=np.float64, count=len(points))
+    y = np.fromiter((p['y'] for p in points), dtype=np.float64, count=len(points))
+    order = np.argsort(x, kind='stable')
+    return x[order], y[order]
+
+
+def align_series(arrays_by_coin):
+    """
+    Resample (timestamps, prices) arrays onto a common time grid
+
+    Returns:
+        tuple: (coins, timestamps_ms, prices[coins, points]) covering the
+        span where every series has data; each coin's prices are contiguous
+    """
+    coins, xs, ys = [], [], []
+    for coin_id, (x, y) in arrays_by_coin.items():
+        if len(x) < 2:
+            continue
+        coins.append(coin_id)
+        xs.append(x)
+        ys.append(y)
+    if not coins:
+        return [], np.empty(0), np.empty((0, 0))
+
+    start = max(x[0] for x in xs)
+    end = min(x[-1] for x in xs)
+    step = float(np.median(np.diff(xs[0])))
+    if end <= start or step <= 0:
+        return [], np.empty(0), np.empty((0, 0))
+
+    grid = np.arange(start, end + step / 2, step)
+    prices = np.empty((len(coins), len(grid)))
+    for row, (x, y) in enumerate(zip(xs, ys)):
+        prices[row] = np.interp(grid, x, y)
+    return coins, grid, prices
+
+
+def _window_sum(values, window):
+    """Sums of every trailing window along the time axis (axis 1)"""
+    csum = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=csum[:, 1:])
+    return csum[:, window:] - csum[:, :-window]
+
+
+def compute_analytics(arrays_by_coin, window=DEFAULT_WINDOW, rsi_period=RSI_PERIOD):
+    """
+    Volatility, moving average, RSI, drawdowns and correlations
+
+    Args:
+        arrays_by_coin: {coin_id: (timestamps, prices)} as from series_arrays()
+        window: Rolling window in data points (hourly data: 24 = one day)
+        rsi_period: RSI lookback in data points
+
+    Returns:
+        dict: per-coin 'metrics' and a 'correlation' matrix
+    """
+    started = time.perf_counter()
+    coins, grid, prices = align_series(arrays_by_coin)
+    missing = [coin_id for coin_id in arrays_by_coin if coin_id not in coins]
+    points = len(grid)
+    if points <= max(window, rsi_period) + 1:
+        return {'coins': [], 'missing': list(arrays_by_coin), 'points': points, 'metrics': {},
+                'correlation': {'coins': [], 'matrix': []}}
+
+    step_ms = grid[1] - grid[0]
+    periods_per_year = MS_PER_YEAR / step_ms
+    annualize = np.sqrt(periods_per_year)
+
+    safe_prices = np.maximum(prices, 1e-12)
+    returns = np.diff(np.log(safe_prices), axis=1)
+
+    # Rolling volatility for every window at once, from running sums of r and r^2
+    mean = _window_sum(returns, window) / window
+    mean_sq = _window_sum(returns * returns, window) / window
+    rolling_vol = np.sqrt(np.maximum(mean_sq - mean * mean, 0)) * annualize
+    peak_rolling_vol = rolling_vol.max(axis=1)
+    full_vol = returns.std(axis=1) * annualize
+
+    latest_sma = prices[:, -window:].mean(axis=1)
+
+    # RSI over the last rsi_period changes (simple-average variant, vectorized)
+    changes = np.diff(prices[:, -(rsi_period + 1):], axis=1)
+    gains = np.clip(changes, 0, None).mean(axis=1)
+    losses = np.clip(-changes, 0, None).mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(losses == 0, 100.0, 100 - 100 / (1 + gains / losses))
+    rsi = np.where((gains == 0) & (losses == 0), 50.0, rsi)
+
+    running_peak = np.maximum.accumulate(prices, axis=1)
+    drawdowns = prices / running_peak
+    max_drawdown = drawdowns.min(axis=1) - 1
+    current_drawdown = drawdowns[:, -1] - 1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = np.nan_to_num(np.corrcoef(returns), nan=0.0)
+    correlation = np.atleast_2d(correlation)
+
+    latest = prices[:, -1]
+    period_return = latest / prices[:, 0] - 1
+    metrics = {}
+    for i, coin_id in enumerate(coins):
+        metrics[coin_id] = {
+            'price': round(float(latest[i]), 6),
+            'return_pct': round(float(period_return[i]) * 100, 2),
+            'volatility_pct': round(float(full_vol[i]) * 100, 2),
+            'rolling_volatility_pct': round(float(rolling_vol[i, -1]) * 100, 2),
+            'peak_rolling_volatility_pct': round(float(peak_rolling_vol[i]) * 100, 2),
+            'sma': round(float(latest_sma[i]), 6),
+            'price_vs_sma_pct': round(float(latest[i] / latest_sma[i] - 1) * 100, 2),
+            'rsi': round(float(rsi[i]), 1),
+            'max_drawdown_pct': round(float(max_drawdown[i]) * 100, 2),
+            'current_drawdown_pct': round(float(current_drawdown[i]) * 100, 2)
+        }
+
+    return {
+        'coins': coins,
+        'missing': missing,
+        'points': points,
+        'window': window,
+        'periods_per_year': round(periods_per_year, 1),
+        'metrics': metrics,
+        'correlation': {'coins': coins, 'matrix': np.round(correlation, 3).tolist()},
+        'compute_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+
+
+def cached_series(loader, coin_id, days, currency):
+    """
+    Series as numpy arrays, converted once per cache fill
+
+    The loader must return None (or raise) when it has no real data;
+    nothing is cached then and callers report the coin as missing.
+    """
+    def load():
+        points = loader(coin_id, days, currency)
+        return series_arrays(points) if points else None
+    return series_cache.get_or_load((coin_id, days, currency), SERIES_TTL, load)
+
+
+async def market_analytics(coins, days, window, currency, loader):
+    """
+    Analytics for a coin set, cached per (coins, days, window, currency)
+
+    Missing series are loaded concurrently on the upstream pool.
+
+    Args:
+        loader: fn(coin_id, days, currency) -> [{'x': ms, 'y': price}], None
+                without real data (never mock series)
+    """
+    coins = list(dict.fromkeys(coins))[:MAX_COINS]
+    key = (tuple(sorted(coins)), days, window, currency)
+    result = analytics_cache.get(key, ANALYTICS_TTL)
+    if result is not None:
+        return result
+
+    results = await upstream.gather(**{
+        coin_id: upstream.run_async(cached_series, loader, coin_id, days, currency)
+        for coin_id in coins
+    })
+    series = {coin_id: data for coin_id, data in results.items() if isinstance(data, tuple)}
+    result = compute_analytics(series, window)
+    result['missing'] = sorted(set(result['missing']) | (set(coins) - set(series)))
+    result.update({'days': days, 'currency': currency})
+    # Results with missing coins are recomputed until their history loads
+    if result['metrics'] and not result['missing']:
+        analytics_cache.set(key, result)
+    return result
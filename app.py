@@ -1,15 +1,29 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-import requests
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, flash
+import upstream
+import screener
+from market_data import get_market_stats, get_trending_coins, get_fear_greed
+from dashboard_bundle import bundle_cache, bundle_response, history_days, parse_widgets, resolve_bundle
 from datetime import datetime, timedelta
+import heapq
+import importlib
 import os
 import sqlite3
 import json
-
-# AWS SDK
+from auth import AuthBusy, SEED_PASSWORD_HASHES, hash_password, verify_password
+from user_directory import UserDirectory
+from pnl import Ledger
+from journal import Journal
+from activity import ActivityFeed
+from leaderboard import Leaderboard
+from market_plane import MARKET_PLANE_NAME, MarketPlane
+from fragments import FragmentCache
+from http_cache import HttpCache
+from rate_limit import RateLimiter
+
+# AWS SDK (boto3 itself is imported lazily by aws_clients on first use)
 try:
-    import boto3
     from botocore.exceptions import ClientError
+    from aws_clients import LazyClient
     AWS_AVAILABLE = True
 except ImportError:
     AWS_AVAILABLE = False
@@ -26,18 +40,19 @@ app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
 
+# Per-user / per-IP token buckets for /api/* and login (see rate_limit.py)
+rate_limiter = RateLimiter(app)
+http_cache = HttpCache(app)
+fragment_cache = FragmentCache(app)
+
 # AWS SNS Configuration
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', None)
 
-# Initialize SNS client if AWS is available
+# SNS client is built on first publish and shared per process
 if AWS_AVAILABLE and SNS_TOPIC_ARN:
-    try:
-        sns_client = boto3.client('sns', region_name=AWS_REGION)
-        print(f"✅ AWS SNS initialized for region: {AWS_REGION}")
-    except Exception as e:
-        sns_client = None
-        print(f"⚠️ AWS SNS initialization failed: {e}")
+    sns_client = LazyClient('sns')
+    print(f"✅ AWS SNS enabled for region: {AWS_REGION}")
 else:
     sns_client = None
     if not AWS_AVAILABLE:
@@ -46,28 +61,30 @@ else:
         print("⚠️ AWS SNS disabled: SNS_TOPIC_ARN not configured")
 
 # Dictionary-based "database" with 4 user types (email-based)
-users_db = {
+# Seed passwords are precomputed hashes (see auth.py)
+# UserDirectory keeps username and role indexes alongside the email key
+users_db = UserDirectory({
     'demo@user.com': {
         'username': 'demo',
-        'password': generate_password_hash('demo123'),
+        'password': SEED_PASSWORD_HASHES['demo@user.com'],
         'role': 'user'
     },
     'admin@crypto.com': {
         'username': 'admin',
-        'password': generate_password_hash('demo123'),
+        'password': SEED_PASSWORD_HASHES['admin@crypto.com'],
         'role': 'admin'
     },
     'analyst@crypto.com': {
         'username': 'analyst',
-        'password': generate_password_hash('demo123'),
+        'password': SEED_PASSWORD_HASHES['analyst@crypto.com'],
         'role': 'analyst'
     },
     'mod@crypto.com': {
         'username': 'moderator',
-        'password': generate_password_hash('demo123'),
+        'password': SEED_PASSWORD_HASHES['mod@crypto.com'],
         'role': 'moderator'
     }
-}
+})
 
 # Tracked coins database - expanded list
 tracked_coins = [
@@ -77,6 +94,17 @@ tracked_coins = [
     'filecoin', 'vechain', 'theta-token', 'elrond-erd-2', 'hedera-hashgraph'
 ]
 
+def invalidate_coin_caches():
+    """Drop everything rendered for the old tracked coin list"""
+    bundle_cache.invalidate()
+    fragment_cache.invalidate()
+    screener.index_cache.invalidate()
+
+# Prices and the tracked coin list shared by every worker (see market_plane.py)
+market_plane = MarketPlane(app, tracked_coins, name=f'{MARKET_PLANE_NAME}_local',
+                           fetch_prices=lambda coin_ids: fetch_usd_prices(coin_ids),
+                           on_coins_changed=invalidate_coin_caches)
+
 # Supported fiat currencies
 supported_currencies = {
     'usd': {'symbol': '$', 'name': 'US Dollar'},
@@ -100,6 +128,18 @@ price_alerts = {}
 # Transaction history
 transaction_history = {}
 
+# Trades across transaction_history, kept by the journaled handlers so dashboards don't sum it
+trade_stats = {'count': 0}
+
+# Cost-basis lots and running P&L per user (pnl.Ledger), updated on every trade
+user_ledgers = {}
+
+# Recent trades, signups and logins for the moderator and admin feeds
+activity_feed = ActivityFeed()
+
+# Users ranked by total portfolio value, re-ranked on trades and price ticks
+leaderboard = Leaderboard()
+
 # User favorites
 user_favorites = {}
 
@@ -225,45 +265,76 @@ The CryptoPulse Team
     
     return subject, message
 
-def get_crypto_prices(coin_ids, currency='usd'):
-    """Fetch current prices from CoinGecko API in specified currency"""
+def price_params(coin_ids, currency):
+    return {
+        'ids': ','.join(coin_ids),
+        'vs_currencies': currency,
+        'include_24hr_change': 'true',
+        'include_market_cap': 'true',
+        'include_24hr_vol': 'true'
+    }
+
+def get_crypto_prices(coin_ids, currency='usd', priority='prices'):
+    """Current prices in specified currency
+
+    Served from the shared market plane snapshot while it is fresh,
+    otherwise fetched from CoinGecko. Trades pass priority='trade', always
+    go to CoinGecko and are served first from the call budget.
+    """
+    if priority != 'trade':
+        shared = market_plane.prices(coin_ids, currency)
+        if shared is not None:
+            return shared
+    
     try:
-        ids = ','.join(coin_ids)
-        url = f'https://api.coingecko.com/api/v3/simple/price?ids={ids}&vs_currencies={currency}&include_24hr_change=true&include_market_cap=true&include_24hr_vol=true'
-        response = requests.get(url, timeout=10)
-        return response.json()
+        # Stale last-good prices while upstream is down; never mock prices here,
+        # they are used to price trades
+        return upstream.fetch_json('/simple/price', params=price_params(coin_ids, currency), priority=priority)
     except Exception as e:
         print(f"Error fetching prices: {e}")
         return {}
 
-def get_historical_data(coin_id, days=7, currency='usd'):
-    """Fetch historical price data for charts in specified currency"""
+def fetch_usd_prices(coin_ids):
+    """Live USD prices for the market plane"""
+    return upstream.fetch_json('/simple/price', params=price_params(coin_ids, 'usd'))
+
+def fetch_usd_history(coin_id, days):
+    """Raw /market_chart data in USD, or None when the upstream call fails"""
     try:
-        url = f'https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart?vs_currency={currency}&days={days}'
-        print(f"Fetching from URL: {url}")
-        response = requests.get(url, timeout=10)
-        print(f"API response status: {response.status_code}")
-        
-        if response.status_code != 200:
-            print(f"API error: {response.text}")
-            return generate_mock_data(coin_id, days, currency)
-            
-        data = response.json()
+        path = f'/coins/{coin_id}/market_chart'
+        print(f"Fetching from URL: {upstream.COINGECKO_API}{path}?vs_currency=usd&days={days}")
+        data = upstream.fetch_json(path, params={'vs_currency': 'usd', 'days': days})
         print(f"API response keys: {data.keys() if data else 'No data'}")
-        
-        # Format data for Chart.js
-        prices = []
-        for timestamp, price in data.get('prices', []):
-            prices.append({
-                'x': timestamp,
-                'y': round(price, 6)
-            })
-        
-        print(f"Formatted {len(prices)} price points")
-        return prices if prices else generate_mock_data(coin_id, days, currency)
+        return data
     except Exception as e:
         print(f"Error fetching historical data: {e}")
+        return None
+
+def get_historical_data(coin_id, days=7, currency='usd'):
+    """
+    Historical price data for charts in the specified currency
+    
+    History is downloaded and cached once in USD; other currencies are
+    converted from it at response time (see fx.py).
+    """
+    prices = get_market_series(coin_id, days, currency)
+    if prices is None:
         return generate_mock_data(coin_id, days, currency)
+    print(f"Formatted {len(prices)} price points in {currency}")
+    return prices
+
+def get_market_series(coin_id, days=7, currency='usd'):
+    """
+    Real historical prices for analytics, backtests, risk and portfolio curves
+    
+    Returns None when CoinGecko has no data, so mock series are never
+    cached or modelled (the coin is reported as missing instead).
+    """
+    import fx  # NumPy is only loaded once history is first requested
+    chart = fx.usd_chart(coin_id, days, lambda: fetch_usd_history(coin_id, days))
+    if chart is None:
+        return None
+    return fx.chart_points(chart, currency)
 
 def generate_mock_data(coin_id, days=7, currency='usd'):
     """Generate mock historical data for testing"""
@@ -282,22 +353,9 @@ def generate_mock_data(coin_id, days=7, currency='usd'):
         'dogecoin': 0.08
     }
     
-    # Currency conversion rates (mock)
-    currency_rates = {
-        'usd': 1,
-        'eur': 0.85,
-        'gbp': 0.73,
-        'jpy': 110,
-        'cad': 1.25,
-        'aud': 1.35,
-        'chf': 0.92,
-        'cny': 6.45,
-        'inr': 74,
-        'krw': 1180
-    }
-    
+    import fx
     base_price_usd = base_prices_usd.get(coin_id, 1000)
-    conversion_rate = currency_rates.get(currency, 1)
+    conversion_rate = fx.rate(currency)
     base_price = base_price_usd * conversion_rate
     
     prices = []
@@ -319,13 +377,127 @@ def generate_mock_data(coin_id, days=7, currency='usd'):
 
 def initialize_user_portfolio(username):
     """Initialize a new user's portfolio with starting balance"""
-    if username not in user_portfolios:
-        user_portfolios[username] = {
-            'balance': 10000.0,  # Starting with $10,000 fake money
-            'holdings': {}  # {coin_id: quantity}
-        }
-    if username not in transaction_history:
-        transaction_history[username] = []
+    # Not journaled (replayed trades re-create it), but a checkpoint must not capture it mid-change
+    with journal.locked():
+        if username not in user_portfolios:
+            user_portfolios[username] = {
+                'balance': 10000.0,  # Starting with $10,000 fake money
+                'holdings': {}  # {coin_id: quantity}
+            }
+            leaderboard.update_user(username, 10000.0, {})
+        if username not in transaction_history:
+            transaction_history[username] = []
+        if username not in user_ledgers:
+            user_ledgers[username] = Ledger()
+
+# Journaled mutations: applied through journal.apply() live and replayed on
+# startup, so each handler must only depend on its arguments and the state
+
+def apply_trade(username, transaction):
+    """Apply a buy or sell to balance, holdings, cost basis and history; sells get realized_pnl"""
+    initialize_user_portfolio(username)
+    portfolio = user_portfolios[username]
+    coin_id = transaction['coin_id']
+    quantity = transaction['quantity']
+    if transaction['type'] == 'buy':
+        portfolio['balance'] -= transaction['amount']
+        portfolio['holdings'][coin_id] = portfolio['holdings'].get(coin_id, 0) + quantity
+        user_ledgers[username].record_trade('buy', coin_id, quantity, transaction['price'])
+    else:
+        portfolio['holdings'][coin_id] -= quantity
+        if portfolio['holdings'][coin_id] == 0:
+            del portfolio['holdings'][coin_id]
+        portfolio['balance'] += transaction['amount']
+        transaction['realized_pnl'] = user_ledgers[username].record_trade('sell', coin_id, quantity,
+                                                                          transaction['price'])
+    transaction_history[username].append(transaction)
+    trade_stats['count'] += 1
+    leaderboard.update_user(username, portfolio['balance'], portfolio['holdings'])
+    if portfolio_curves is not None:
+        portfolio_curves.record_trade(username, transaction)
+    return transaction
+
+def apply_add_user(email, user):
+    users_db[email] = user
+    if user['role'] == 'user':
+        initialize_user_portfolio(user['username'])
+
+def apply_delete_user(email):
+    """Remove the account and everything kept under its username"""
+    username = users_db.pop(email)['username']
+    trade_stats['count'] -= len(transaction_history.get(username, ()))
+    for state in (user_portfolios, transaction_history, user_ledgers, user_favorites):
+        state.pop(username, None)
+    leaderboard.remove_user(username)
+    if portfolio_curves is not None:
+        portfolio_curves.forget(username)
+
+def apply_toggle_favorite(username, coin_id):
+    """Returns 'added' or 'removed'"""
+    favorites = user_favorites.setdefault(username, [])
+    if coin_id in favorites:
+        favorites.remove(coin_id)
+        return 'removed'
+    favorites.append(coin_id)
+    return 'added'
+
+def apply_add_coin(coin_id):
+    if coin_id not in tracked_coins:
+        tracked_coins.append(coin_id)
+
+def apply_remove_coin(coin_id):
+    if coin_id in tracked_coins:
+        tracked_coins.remove(coin_id)
+
+def capture_state():
+    """Everything the journal snapshots (pickled under the journal lock)"""
+    return {
+        'users': {email: dict(user) for email, user in users_db.items()},
+        'portfolios': user_portfolios,
+        'transactions': transaction_history,
+        'ledgers': {username: ledger.to_dict() for username, ledger in user_ledgers.items()},
+        'favorites': user_favorites,
+        'tracked_coins': tracked_coins
+    }
+
+def restore_state(state):
+    """Replace the in-memory state with a snapshot's and rebuild what is derived from it"""
+    users_db.clear()
+    users_db.update(state['users'])
+    for target, key in ((user_portfolios, 'portfolios'), (transaction_history, 'transactions'),
+                        (user_favorites, 'favorites')):
+        target.clear()
+        target.update(state[key])
+    user_ledgers.clear()
+    user_ledgers.update((username, Ledger.from_dict(positions)) for username, positions in state['ledgers'].items())
+    tracked_coins[:] = state['tracked_coins']
+    trade_stats['count'] = sum(len(transactions) for transactions in transaction_history.values())
+    leaderboard.rebuild({username: (portfolio['balance'], portfolio['holdings'])
+                         for username, portfolio in user_portfolios.items()})
+    if portfolio_curves is not None:
+        portfolio_curves.timelines.invalidate()
+        portfolio_curves.curves.invalidate()
+    invalidate_coin_caches()
+
+def recovered_trades():
+    """Newest recovered trades as activity events (the feed itself is not journaled)"""
+    size = activity_feed.by_kind['trade'].maxlen
+    # Each user's history is in trade order, so only its tail can be among the newest
+    candidates = ((username, transaction) for username, transactions in transaction_history.items()
+                  for transaction in transactions[-size:])
+    newest = heapq.nlargest(size, candidates, key=lambda pair: pair[1]['timestamp'])
+    return [{'username': username, 'timestamp': transaction['timestamp'], 'type': transaction['type'],
+             'coin_id': transaction['coin_id'], 'quantity': float(transaction['quantity']),
+             'amount': float(transaction['amount'])} for username, transaction in newest]
+
+# Write-ahead log and snapshots of the state above (see journal.py)
+journal = Journal(app, capture=capture_state, restore=restore_state)
+journal.register('trade', apply_trade)
+journal.register('add_user', apply_add_user)
+journal.register('delete_user', apply_delete_user)
+journal.register('toggle_favorite', apply_toggle_favorite)
+journal.register('add_coin', apply_add_coin)
+journal.register('remove_coin', apply_remove_coin)
 
 @app.route('/')
 def home():
@@ -391,8 +563,14 @@ def login():
         
         user_data = users_db[email]
         
-        # Verify password
-        if not check_password_hash(user_data['password'], password):
+        # Verify password (runs on the bounded hashing pool)
+        try:
+            password_ok = verify_password(user_data['password'], password)
+        except AuthBusy:
+            flash('Too many login attempts right now. Please try again in a moment.')
+            return redirect(url_for('login'))
+        
+        if not password_ok:
             flash('Invalid email or password')
             return redirect(url_for('login'))
         
@@ -404,6 +582,7 @@ def login():
         session['email'] = email
         session['username'] = username
         session['role'] = user_role
+        activity_feed.record('login', username, role=user_role)
         
         # Initialize portfolio for regular users
         if user_role == 'user':
@@ -453,14 +632,24 @@ def signup():
             flash('Email already registered')
             return redirect(url_for('signup'))
         
+        # Check if username is already taken
+        if users_db.has_username(username):
+            flash('Username already taken')
+            return redirect(url_for('signup'))
+        
+        try:
+            password_hash = hash_password(password)
+        except AuthBusy:
+            flash('Server is busy. Please try again in a moment.')
+            return redirect(url_for('signup'))
+        
         # Create new user account (always as 'user' role for signup)
-        users_db[email] = {
+        journal.apply('add_user', email, {
             'username': username,
-            'password': generate_password_hash(password),
+            'password': password_hash,
             'role': 'user'
-        }
-        
-        initialize_user_portfolio(username)
+        })
+        activity_feed.record('signup', username)
         flash(f'Account created successfully! Please login with {email}')
         return redirect(url_for('login'))
     
@@ -488,13 +677,13 @@ def admin_dashboard():
     # Admin-specific dashboard with enhanced features
     admin_stats = {
         'total_users': len(users_db),
-        'admin_users': len([u for u in users_db.values() if u.get('role') == 'admin']),
-        'regular_users': len([u for u in users_db.values() if u.get('role') == 'user']),
-        'analysts': len([u for u in users_db.values() if u.get('role') == 'analyst']),
-        'moderators': len([u for u in users_db.values() if u.get('role') == 'moderator']),
+        'admin_users': users_db.count_role('admin'),
+        'regular_users': users_db.count_role('user'),
+        'analysts': users_db.count_role('analyst'),
+        'moderators': users_db.count_role('moderator'),
         'tracked_coins': len(tracked_coins),
         'total_portfolios': len(user_portfolios),
-        'total_transactions': sum(len(transactions) for transactions in transaction_history.values())
+        'total_transactions': trade_stats['count']
     }
     
     return render_template('admin_dashboard.html', 
@@ -511,22 +700,16 @@ def analyst_dashboard():
     username = session['username']
     currency = session.get('currency', 'usd')
     
-    # Get market data for analysis
-    prices = get_crypto_prices(tracked_coins, currency)
+    # Market data for analysis: the screener index for the current price
+    # snapshot already holds the summary stats and the coins sorted by change
+    index = screener.get_index(currency, load_screener_prices)
+    prices = index.prices
     
-    # Calculate market statistics
-    analyst_stats = {
-        'total_coins_tracked': len(tracked_coins),
-        'coins_up_24h': len([c for c, p in prices.items() if p.get(f'{currency}_24h_change', 0) > 0]),
-        'coins_down_24h': len([c for c, p in prices.items() if p.get(f'{currency}_24h_change', 0) < 0]),
-        'total_market_cap': sum([p.get(f'{currency}_market_cap', 0) for p in prices.values()]),
-        'avg_24h_change': sum([p.get(f'{currency}_24h_change', 0) for p in prices.values()]) / len(prices) if prices else 0
-    }
+    analyst_stats = dict(index.stats, total_coins_tracked=len(tracked_coins))
     
     # Get top gainers and losers
-    sorted_by_change = sorted(prices.items(), key=lambda x: x[1].get(f'{currency}_24h_change', 0), reverse=True)
-    top_gainers = sorted_by_change[:5]
-    top_losers = sorted_by_change[-5:]
+    top_gainers = [(row['id'], prices[row['id']]) for row in index.top('change', 5)]
+    top_losers = [(row['id'], prices[row['id']]) for row in index.bottom('change', 5)]
     
     return render_template('analyst_dashboard.html',
                          username=username,
@@ -550,30 +733,17 @@ def moderator_dashboard():
     moderator_stats = {
         'total_users': len(users_db),
         'active_portfolios': len(user_portfolios),
-        'total_transactions': sum(len(transactions) for transactions in transaction_history.values()),
+        'total_transactions': trade_stats['count'],
         'users_by_role': {
-            'user': len([u for u in users_db.values() if u.get('role') == 'user']),
-            'admin': len([u for u in users_db.values() if u.get('role') == 'admin']),
-            'analyst': len([u for u in users_db.values() if u.get('role') == 'analyst']),
-            'moderator': len([u for u in users_db.values() if u.get('role') == 'moderator'])
+            'user': users_db.count_role('user'),
+            'admin': users_db.count_role('admin'),
+            'analyst': users_db.count_role('analyst'),
+            'moderator': users_db.count_role('moderator')
         }
     }
     
-    # Get recent transactions for monitoring
-    recent_transactions = []
-    for user, transactions in transaction_history.items():
-        for tx in transactions[-5:]:  # Last 5 transactions per user
-            recent_transactions.append({
-                'username': user,
-                'type': tx['type'],
-                'coin_id': tx['coin_id'],
-                'amount': tx['amount'],
-                'timestamp': tx['timestamp']
-            })
-    
-    # Sort by timestamp
-    recent_transactions.sort(key=lambda x: x['timestamp'], reverse=True)
-    recent_transactions = recent_transactions[:20]  # Top 20 recent
+    # Latest 20 trades straight off the activity ring buffer
+    recent_transactions = activity_feed.recent(20, 'trade')
     
     return render_template('moderator_dashboard.html',
                          username=username,
@@ -581,6 +751,50 @@ def moderator_dashboard():
                          users=users_db,
                          recent_transactions=recent_transactions)
 
+@app.route('/api/leaderboard')
+def api_leaderboard():
+    """
+    Top traders by total portfolio value (USD), plus the caller's rank
+    
+    GET /api/leaderboard?limit=10
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    coins = leaderboard.coins()
+    if coins:
+        leaderboard.update_prices(get_crypto_prices(coins))
+    me = leaderboard.rank(session['username'])
+    return jsonify({'top': leaderboard.top(limit), 'me': me, 'users': len(leaderboard)})
+
+@app.route('/api/activity')
+def api_activity():
+    """
+    Most recent events for moderators and admins, newest first
+    
+    GET /api/activity?n=50&kind=trade|signup|login
+    """
+    if 'username' not in session or session.get('role') not in ('moderator', 'admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    n = min(max(request.args.get('n', 20, type=int), 1), activity_feed.events.maxlen)
+    kind = request.args.get('kind') or None
+    return jsonify({'events': activity_feed.recent(n, kind), 'last_id': activity_feed.last_id})
+
+@app.route('/api/activity/stream')
+def api_activity_stream():
+    """Live activity as server-sent events (resumes from Last-Event-ID)"""
+    if 'username' not in session or session.get('role') not in ('moderator', 'admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_id', type=int)
+    kind = request.args.get('kind') or None
+    return Response(activity_feed.stream(last_id, kind), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/test_chart')
 def test_chart():
     return render_template('test_chart.html')
@@ -678,7 +892,8 @@ def portfolio():
                          total_value=total_value,
                          holdings_value=holdings_value,
                          transactions=recent_transactions,
-                         tracked_coins=tracked_coins)
+                         tracked_coins=tracked_coins,
+                         pnl=user_ledgers[username].summary(prices))
 
 @app.route('/charts')
 @app.route('/charts/<coin_id>')
@@ -724,6 +939,33 @@ def api_prices():
         'currency_symbol': supported_currencies[currency]['symbol']
     })
 
+def load_screener_prices(currency):
+    return get_crypto_prices(tracked_coins, currency)
+
+@app.route('/api/screener')
+def api_screener():
+    """
+    Filter, rank and paginate tracked coins from the current price snapshot
+    
+    GET /api/screener?sort=change|market_cap|volume|price&order=desc|asc
+                     &min_<key>=..&max_<key>=..&q=bit&page=1&per_page=20&currency=usd
+    """
+    currency = request.args.get('currency', 'usd').lower()
+    if currency not in supported_currencies:
+        currency = 'usd'
+    options, page, per_page = screener.parse_query(request.args)
+    total, rows = screener.get_index(currency, load_screener_prices).query(**options)
+    return jsonify({
+        'results': rows,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'sort': options['sort'],
+        'order': 'desc' if options['descending'] else 'asc',
+        'currency': currency,
+        'currency_symbol': supported_currencies[currency]['symbol']
+    })
+
 @app.route('/api/currencies')
 def api_currencies():
     """API endpoint for supported currencies"""
@@ -753,7 +995,9 @@ def add_coin():
     
     coin_id = request.json.get('coin_id')
     if coin_id and coin_id not in tracked_coins:
-        tracked_coins.append(coin_id)
+        journal.apply('add_coin', coin_id)
+        market_plane.publish_coins(tracked_coins)
+        invalidate_coin_caches()
         return jsonify({'success': True})
     return jsonify({'error': 'Invalid coin ID'}), 400
 
@@ -764,10 +1008,59 @@ def remove_coin():
     
     coin_id = request.json.get('coin_id')
     if coin_id in tracked_coins:
-        tracked_coins.remove(coin_id)
+        journal.apply('remove_coin', coin_id)
+        market_plane.publish_coins(tracked_coins)
+        invalidate_coin_caches()
         return jsonify({'success': True})
     return jsonify({'error': 'Coin not found'}), 400
 
+# Admin API Routes
+@app.route('/api/admin/create_user', methods=['POST'])
+def admin_create_user():
+    if 'username' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    username = (request.json.get('username') or '').strip()
+    email = (request.json.get('email') or '').lower().strip()
+    password = request.json.get('password') or ''
+    role = request.json.get('role', 'user')
+    
+    if not username or not email or not password:
+        return jsonify({'error': 'Username, email and password are required'}), 400
+    if role not in ('user', 'admin', 'analyst', 'moderator'):
+        return jsonify({'error': 'Invalid role'}), 400
+    if email in users_db:
+        return jsonify({'error': 'Email already registered'}), 400
+    if users_db.has_username(username):
+        return jsonify({'error': 'Username already taken'}), 400
+    
+    try:
+        password_hash = hash_password(password)
+    except AuthBusy:
+        return jsonify({'error': 'Server is busy, try again'}), 503
+    
+    journal.apply('add_user', email, {
+        'username': username,
+        'password': password_hash,
+        'role': role
+    })
+    
+    return jsonify({'success': True})
+
+@app.route('/api/admin/delete_user', methods=['POST'])
+def admin_delete_user():
+    if 'username' not in session or session.get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    email = (request.json.get('email') or '').lower().strip()
+    if email not in users_db:
+        return jsonify({'error': 'User not found'}), 404
+    if email == session.get('email'):
+        return jsonify({'error': 'You cannot delete your own account'}), 400
+    
+    journal.apply('delete_user', email)
+    return jsonify({'success': True})
+
 @app.route('/api/buy_coin', methods=['POST'])
 def buy_coin():
     try:
@@ -810,7 +1103,7 @@ def buy_coin():
         
         # Get current price
         print(f"Fetching price for {coin_id}...")
-        prices = get_crypto_prices([coin_id])
+        prices = get_crypto_prices([coin_id], priority='trade')
         print(f"Prices fetched: {prices}")
         
         if not prices or coin_id not in prices:
@@ -830,23 +1123,16 @@ def buy_coin():
             print(f"ERROR: Insufficient balance")
             return jsonify({'error': 'Insufficient balance'}), 400
         
-        # Execute trade
-        portfolio['balance'] -= amount_usd
-        if coin_id in portfolio['holdings']:
-            portfolio['holdings'][coin_id] += quantity
-        else:
-            portfolio['holdings'][coin_id] = quantity
-        
-        # Record transaction
-        transaction = {
+        # Execute and record the trade
+        transaction = journal.apply('trade', username, {
             'type': 'buy',
             'coin_id': coin_id,
             'quantity': quantity,
             'price': current_price,
             'amount': amount_usd,
             'timestamp': datetime.now().isoformat()
-        }
-        transaction_history[username].append(transaction)
+        })
+        activity_feed.record_trade(username, transaction)
         
         print(f"✅ Transaction successful!")
         print(f"New balance: ${portfolio['balance']}")
@@ -887,29 +1173,23 @@ def sell_coin():
         return jsonify({'error': 'Insufficient holdings'}), 400
     
     # Get current price
-    prices = get_crypto_prices([coin_id])
+    prices = get_crypto_prices([coin_id], priority='trade')
     if coin_id not in prices:
         return jsonify({'error': 'Coin not found'}), 400
     
     current_price = prices[coin_id]['usd']
     amount_usd = quantity * current_price
     
-    # Execute trade
-    portfolio['holdings'][coin_id] -= quantity
-    if portfolio['holdings'][coin_id] == 0:
-        del portfolio['holdings'][coin_id]
-    portfolio['balance'] += amount_usd
-    
-    # Record transaction
-    transaction = {
+    # Execute and record the trade (realized P&L is filled in from the cost basis)
+    transaction = journal.apply('trade', username, {
         'type': 'sell',
         'coin_id': coin_id,
         'quantity': quantity,
         'price': current_price,
         'amount': amount_usd,
         'timestamp': datetime.now().isoformat()
-    }
-    transaction_history[username].append(transaction)
+    })
+    activity_feed.record_trade(username, transaction)
     
     # Send SNS email notification
     subject, message = format_transaction_email(
@@ -919,6 +1199,18 @@ def sell_coin():
     
     return jsonify({'success': True, 'transaction': transaction})
 
+@app.route('/api/pnl')
+def api_pnl():
+    """Realized and unrealized P&L per coin from the user's cost-basis lots"""
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    username = session['username']
+    initialize_user_portfolio(username)
+    ledger = user_ledgers[username]
+    prices = get_crypto_prices(list(ledger.positions)) if ledger.positions else {}
+    return jsonify(ledger.summary(prices))
+
 @app.route('/api/historical/<coin_id>')
 def api_historical(coin_id):
     """API endpoint for historical price data"""
@@ -989,69 +1281,261 @@ def toggle_favorite():
     username = session['username']
     coin_id = request.json.get('coin_id')
     
-    if username not in user_favorites:
-        user_favorites[username] = []
-    
-    if coin_id in user_favorites[username]:
-        user_favorites[username].remove(coin_id)
-        return jsonify({'success': True, 'action': 'removed'})
-    else:
-        user_favorites[username].append(coin_id)
-        return jsonify({'success': True, 'action': 'added'})
+    action = journal.apply('toggle_favorite', username, coin_id)
+    return jsonify({'success': True, 'action': action})
 
 @app.route('/api/market_stats')
 def market_stats():
     """Get market statistics"""
     try:
-        # Fetch global market data
-        url = 'https://api.coingecko.com/api/v3/global'
-        response = requests.get(url, timeout=10)
-        data = response.json()
-        
-        return jsonify({
-            'total_market_cap': data['data']['total_market_cap']['usd'],
-            'total_volume': data['data']['total_volume']['usd'],
-            'market_cap_change_24h': data['data']['market_cap_change_percentage_24h_usd'],
-            'active_cryptocurrencies': data['data']['active_cryptocurrencies'],
-            'bitcoin_dominance': data['data']['market_cap_percentage']['btc']
-        })
+        return jsonify(get_market_stats())
     except:
         return jsonify({'error': 'Failed to fetch market stats'}), 500
 
 @app.route('/api/trending')
 def trending():
     """Get trending cryptocurrencies"""
-    try:
-        url = 'https://api.coingecko.com/api/v3/search/trending'
-        response = requests.get(url, timeout=10)
-        data = response.json()
-        
-        trending_coins = []
-        for coin in data['coins'][:5]:  # Top 5 trending
-            trending_coins.append({
-                'id': coin['item']['id'],
-                'name': coin['item']['name'],
-                'symbol': coin['item']['symbol'],
-                'market_cap_rank': coin['item']['market_cap_rank']
-            })
-        
-        return jsonify(trending_coins)
-    except:
-        return jsonify([])
+    return jsonify(get_trending_coins())
 
 @app.route('/api/fear_greed')
 def fear_greed():
     """Get Fear & Greed Index"""
     try:
-        # This would typically use the Alternative.me API
-        # For demo, returning mock data
-        return jsonify({
-            'value': 65,
-            'value_classification': 'Greed',
-            'timestamp': datetime.now().isoformat()
-        })
+        return jsonify(get_fear_greed())
     except:
         return jsonify({'error': 'Failed to fetch Fear & Greed Index'}), 500
 
+@app.route('/api/upstream_status')
+def upstream_status():
+    """CoinGecko client health: circuit breaker state and pool settings"""
+    return jsonify(dict(upstream.status(), market_plane=market_plane.status()))
+
+# Async variants: independent upstream calls are gathered concurrently, so the
+# response takes as long as the slowest call rather than the sum of all of them
+
+@app.route('/api/market_overview')
+async def market_overview():
+    """Market stats and trending coins fetched concurrently, plus the (local) Fear & Greed index"""
+    results = await upstream.gather(
+        market_stats=upstream.run_async(get_market_stats),
+        trending=upstream.run_async(get_trending_coins)
+    )
+    market = results['market_stats']
+    return jsonify({
+        'market_stats': None if isinstance(market, Exception) else market,
+        'trending': results['trending'] if isinstance(results['trending'], list) else [],
+        'fear_greed': get_fear_greed()
+    })
+
+# Widgets served by /api/dashboard_bundle: name -> (cache TTL in seconds, resolver)
+BUNDLE_WIDGETS = {
+    'market_stats': (60, lambda currency: get_market_stats()),
+    'trending': (300, lambda currency: get_trending_coins()),
+    'fear_greed': (300, lambda currency: get_fear_greed()),
+    'prices': (30, lambda currency: {
+        'prices': get_crypto_prices(tracked_coins, currency),
+        'currency': currency,
+        'currency_symbol': supported_currencies[currency]['symbol']
+    }),
+    'historical': (300, lambda currency, coin_id, days='7': get_market_series(coin_id, history_days(days), currency))
+}
+
+@app.route('/api/dashboard_bundle', methods=['GET', 'POST'])
+async def dashboard_bundle():
+    """
+    Several dashboard widgets in one request
+    
+    GET  /api/dashboard_bundle?widgets=market_stats,trending,historical:bitcoin:7&currency=usd
+    POST /api/dashboard_bundle  {"widgets": [...], "currency": "usd"}
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        raw_widgets = body.get('widgets', [])
+        currency = str(body.get('currency', 'usd')).lower()
+    else:
+        raw_widgets = request.args.get('widgets', '')
+        currency = request.args.get('currency', 'usd').lower()
+    if currency not in supported_currencies:
+        currency = 'usd'
+    
+    data, errors = await resolve_bundle(parse_widgets(raw_widgets), BUNDLE_WIDGETS, currency)
+    return bundle_response({
+        'widgets': data,
+        'errors': errors,
+        'currency': currency,
+        'currency_symbol': supported_currencies[currency]['symbol']
+    })
+
+@app.route('/api/prices_multi')
+async def api_prices_multi():
+    """Prices for the tracked coins in several currencies, fetched concurrently"""
+    currencies = [c for c in request.args.get('currencies', 'usd').lower().split(',')
+                  if c in supported_currencies][:len(supported_currencies)] or ['usd']
+    results = await upstream.gather(**{
+        currency: upstream.run_async(get_crypto_prices, tracked_coins, currency)
+        for currency in currencies
+    })
+    return jsonify({
+        currency: prices if isinstance(prices, dict) else {}
+        for currency, prices in results.items()
+    })
+
+@app.route('/api/historical_multi')
+async def api_historical_multi():
+    """Historical series for several coins (?coins=a,b&days=7), fetched concurrently"""
+    days = request.args.get('days', 7, type=int)
+    currency = request.args.get('currency', 'usd').lower()
+    if currency not in supported_currencies:
+        currency = 'usd'
+    coins = [c for c in request.args.get('coins', '').split(',') if c][:len(tracked_coins)]
+    
+    results = await upstream.gather(**{
+        coin_id: upstream.run_async(get_historical_data, coin_id, days, currency)
+        for coin_id in coins
+    })
+    return jsonify({
+        'data': {coin_id: series if isinstance(series, list) else [] for coin_id, series in results.items()},
+        'currency': currency,
+        'currency_symbol': supported_currencies[currency]['symbol']
+    })
+
+@app.route('/api/analytics')
+async def api_analytics():
+    """
+    Volatility, moving average, RSI, drawdowns and correlations for tracked coins
+    
+    GET /api/analytics?days=30&window=24&coins=bitcoin,ethereum&currency=usd
+    """
+    days = min(max(request.args.get('days', 30, type=int), 2), 365)
+    window = min(max(request.args.get('window', 24, type=int), 2), 24 * 30)
+    currency = request.args.get('currency', 'usd').lower()
+    if currency not in supported_currencies:
+        currency = 'usd'
+    coins = [c for c in request.args.get('coins', '').split(',') if c in tracked_coins] or tracked_coins
+    
+    import analytics  # NumPy is only loaded once analytics are first requested
+    result = await analytics.market_analytics(coins, days, window, currency, get_market_series)
+    return jsonify(result)
+
+@app.route('/api/backtest')
+async def api_backtest():
+    """
+    Backtest a strategy, or sweep its parameters, over tracked coins
+    
+    GET /api/backtest?strategy=momentum&lookback=12,24,48&threshold=0&days=90&coins=bitcoin,ethereum
+    GET /api/backtest?strategy=dca&sweep=1   (the strategy's default parameter grid)
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    import backtest
+    strategy = request.args.get('strategy', 'momentum')
+    if strategy not in backtest.STRATEGIES:
+        return jsonify({'error': f"Unknown strategy, use one of: {', '.join(sorted(backtest.STRATEGIES))}"}), 400
+    days = min(max(request.args.get('days', 90, type=int), 2), 365)
+    currency = request.args.get('currency', 'usd').lower()
+    if currency not in supported_currencies:
+        currency = 'usd'
+    coins = [c for c in request.args.get('coins', '').split(',') if c in tracked_coins] or tracked_coins
+    try:
+        grid = backtest.parse_grid(strategy, None if request.args.get('sweep') else request.args)
+    except (ValueError, OverflowError) as e:
+        return jsonify({'error': f'Invalid parameter value: {e}'}), 400
+    if len(grid) > backtest.BACKTEST_MAX_SWEEP:
+        return jsonify({'error': f'Too many parameter combinations (max {backtest.BACKTEST_MAX_SWEEP})'}), 400
+    
+    result = await backtest.run_backtest(strategy, grid, coins, days, currency, get_market_series)
+    return jsonify(result)
+
+@app.route('/api/risk')
+async def api_risk():
+    """
+    Monte Carlo VaR and expected shortfall (1 and 7 days) for a portfolio
+    
+    GET /api/risk?paths=100000                   the signed-in user's portfolio
+    GET /api/risk?username=alice&paths=100000    any portfolio (analysts and admins)
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    username = request.args.get('username') or session['username']
+    if username != session['username'] and session.get('role') not in ('analyst', 'admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    import risk
+    paths = min(max(request.args.get('paths', risk.DEFAULT_PATHS, type=int), 1000), risk.MAX_PATHS)
+    if username == session['username']:
+        initialize_user_portfolio(username)
+    portfolio = user_portfolios.get(username)
+    if portfolio is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+    
+    holdings = portfolio['holdings']
+    prices = get_crypto_prices(list(holdings)) if holdings else {}
+    result = await risk.portfolio_risk(holdings, prices, get_market_series, paths)
+    return jsonify(dict(result, username=username, cash=portfolio['balance']))
+
+portfolio_curves = None
+
+def get_portfolio_curves():
+    """Per-user portfolio value curves, created on first use so NumPy loads lazily"""
+    global portfolio_curves
+    if portfolio_curves is None:
+        from portfolio_history import PortfolioCurves
+        portfolio_curves = PortfolioCurves(lambda username: list(transaction_history.get(username, [])),
+                                           get_market_series)
+    return portfolio_curves
+
+@app.route('/api/portfolio_history')
+async def api_portfolio_history():
+    """
+    Portfolio value over time from the user's trades and cached price history
+    
+    GET /api/portfolio_history?days=30   (days: 1, 7, 30, 90 or 365)
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    from portfolio_history import ALLOWED_DAYS
+    days = request.args.get('days', 30, type=int)
+    if days not in ALLOWED_DAYS:
+        days = 30
+    return jsonify(await get_portfolio_curves().curve(session['username'], days))
+
+def warm_up():
+    """Compile every template and load the analytics engine up front so the first request doesn't pay for it"""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    importlib.import_module('analytics')
+    importlib.import_module('fx')
+    get_portfolio_curves()
+
+def create_app(config=None):
+    """
+    Application factory used by serve.py
+    
+    Args:
+        config: Optional dict or config object applied on top of the defaults;
+                CRYPTOPULSE_* environment variables are applied last
+    
+    Returns:
+        Flask: The configured application
+    """
+    if config is not None:
+        if isinstance(config, dict):
+            app.config.from_mapping(config)
+        else:
+            app.config.from_object(config)
+    app.config.from_prefixed_env('CRYPTOPULSE')
+    
+    # Read-only, so it can run in serve.py's preloading master; the log is
+    # opened by the worker that serves the first request
+    journal.recover()
+    activity_feed.backfill('trade', recovered_trades)
+    if app.config.get('WARM_UP', True):
+        warm_up()
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Development server; use serve.py for production
+    create_app().run(debug=True)
\ No newline at end of file
@@ -1,29 +1,67 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify
+import importlib
 import os
-import boto3
+import threading
+import time
 import uuid
-import requests
+import upstream
+import screener
+from market_data import get_market_stats, get_trending_coins, get_fear_greed
+from dashboard_bundle import bundle_response, history_days, parse_widgets, resolve_bundle
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
-import json
 from decimal import Decimal
+from auth import AuthBusy, hash_password, verify_password
+from activity import ActivityFeed
+from aws_clients import LazyClient, LazyResource, LazyTable
+from dynamo_json import DecimalJSONProvider, dynamo_value, plain_item, plain_items
+from fragments import FragmentCache
+from leaderboard import Leaderboard
+from market_plane import MARKET_PLANE_NAME, MarketPlane
+from http_cache import HttpCache
+from pnl import Ledger, average_buy_costs
+from rate_limit import RateLimiter
+from transaction_archive import archive_cutoff, get_archived_transactions
 
 app = Flask(__name__)
+app.json = DecimalJSONProvider(app)
+
+# Per-user / per-IP token buckets for /api/* and login (see rate_limit.py)
+rate_limiter = RateLimiter(app)
+http_cache = HttpCache(app)
+fragment_cache = FragmentCache(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'your_secret_key_here')
 
 # AWS Configuration
+# Clients are created lazily on first use and shared per process (see aws_clients.py)
 REGION = os.environ.get('AWS_REGION', 'us-east-1')
-dynamodb = boto3.resource('dynamodb', region_name=REGION)
-sns = boto3.client('sns', region_name=REGION)
-s3 = boto3.client('s3', region_name=REGION)
+dynamodb = LazyResource('dynamodb')
+sns = LazyClient('sns')
+s3 = LazyClient('s3')
 
 # DynamoDB Tables
-users_table = dynamodb.Table('CryptoPulse_Users')
-portfolios_table = dynamodb.Table('CryptoPulse_Portfolios')
-transactions_table = dynamodb.Table('CryptoPulse_Transactions')
-price_alerts_table = dynamodb.Table('CryptoPulse_PriceAlerts')
+users_table = LazyTable('CryptoPulse_Users')
+portfolios_table = LazyTable('CryptoPulse_Portfolios')
+transactions_table = LazyTable('CryptoPulse_Transactions')
+price_alerts_table = LazyTable('CryptoPulse_PriceAlerts')
+
+# Recent trades, signups and logins for the admin feed (backfilled from DynamoDB on first read)
+activity_feed = ActivityFeed()
+
+# Trades carry feed='trade' so the RecentTrades index (feed, timestamp) lists the newest
+# without a scan; the running trade count lives on a reserved item in the same table
+RECENT_TRADES_INDEX = 'RecentTrades'
+RECENT_TRADES_FEED = 'trade'
+STATS_KEY = {'username': '#stats', 'timestamp': 'counters'}
+
+# Users ranked by total portfolio value; rebuilt from CryptoPulse_Portfolios every
+# LEADERBOARD_SYNC_SECONDS by a background thread so trades served by other workers
+# show up (0 disables the rebuild)
+leaderboard = Leaderboard()
+LEADERBOARD_SYNC_SECONDS = int(os.environ.get('LEADERBOARD_SYNC_SECONDS', 300))
+_leaderboard_sync = {'pid': None}
+_leaderboard_sync_lock = threading.Lock()
 
 # SNS Topic ARN
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', 'arn:aws:sns:us-east-1:216989138822:capestone_project')
@@ -52,6 +90,16 @@ tracked_coins = [
     'internet-computer', 'vechain', 'theta-token', 'elrond-erd-2'
 ]
 
+def invalidate_coin_caches():
+    """Drop everything rendered for the old tracked coin list"""
+    fragment_cache.invalidate()
+    screener.index_cache.invalidate()
+
+# Prices and the tracked coin list shared by every worker (see market_plane.py)
+market_plane = MarketPlane(app, tracked_coins, name=f'{MARKET_PLANE_NAME}_aws',
+                           fetch_prices=lambda coin_ids: fetch_usd_prices(coin_ids),
+                           on_coins_changed=invalidate_coin_caches)
+
 def send_notification(subject, message):
     """Send SNS notification"""
     try:
@@ -63,37 +111,39 @@ def send_notification(subject, message):
     except ClientError as e:
         print(f"Error sending notification: {e}")
 
-def decimal_default(obj):
-    """JSON serializer for DynamoDB Decimal types"""
-    if isinstance(obj, Decimal):
-        return float(obj)
-    raise TypeError
-
-def get_crypto_prices(coin_ids=None, currency='usd'):
-    """Fetch cryptocurrency prices from CoinGecko API"""
+def get_crypto_prices(coin_ids=None, currency='usd', priority='prices'):
+    """
+    Cryptocurrency prices, from the shared market plane snapshot while it is
+    fresh, otherwise from CoinGecko (trades use priority='trade' and always
+    go to CoinGecko)
+    """
     if coin_ids is None:
         coin_ids = tracked_coins
+    if priority != 'trade':
+        shared = market_plane.prices(coin_ids, currency)
+        if shared is not None:
+            return shared
     
     try:
-        coins_str = ','.join(coin_ids)
-        url = f"https://api.coingecko.com/api/v3/simple/price"
-        params = {
-            'ids': coins_str,
-            'vs_currencies': currency,
-            'include_24hr_change': 'true',
-            'include_market_cap': 'true'
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"API Error: {response.status_code}")
-            return generate_mock_prices(coin_ids, currency)
+        return upstream.fetch_json('/simple/price', params=price_params(coin_ids, currency), priority=priority,
+                                   fallback=lambda: generate_mock_prices(coin_ids, currency))
     except Exception as e:
         print(f"Error fetching prices: {e}")
         return generate_mock_prices(coin_ids, currency)
 
+def price_params(coin_ids, currency):
+    return {
+        'ids': ','.join(coin_ids),
+        'vs_currencies': currency,
+        'include_24hr_change': 'true',
+        'include_market_cap': 'true',
+        'include_24hr_vol': 'true'
+    }
+
+def fetch_usd_prices(coin_ids):
+    """Live USD prices for the market plane; no mock fallback, so mock prices are never shared"""
+    return upstream.fetch_json('/simple/price', params=price_params(coin_ids, 'usd'))
+
 def generate_mock_prices(coin_ids, currency='usd'):
     """Generate mock prices for testing"""
     import random
@@ -113,7 +163,8 @@ def generate_mock_prices(coin_ids, currency='usd'):
         mock_prices[coin_id] = {
             currency: price,
             f'{currency}_24h_change': change_24h,
-            f'{currency}_market_cap': price * random.randint(1000000, 100000000)
+            f'{currency}_market_cap': price * random.randint(1000000, 100000000),
+            f'{currency}_24h_vol': price * random.randint(10000, 1000000)
         }
     
     return mock_prices
@@ -132,31 +183,107 @@ def initialize_user_portfolio(username):
         })
 
 def get_user_portfolio(username):
-    """Get user portfolio from DynamoDB"""
+    """Get user portfolio from DynamoDB (numbers converted to int/float)"""
     try:
         response = portfolios_table.get_item(Key={'username': username})
         if 'Item' in response:
-            return response['Item']
+            return plain_item(response['Item'])
         else:
             initialize_user_portfolio(username)
             return get_user_portfolio(username)
     except ClientError as e:
         print(f"Error getting portfolio: {e}")
-        return {'balance': Decimal('10000.00'), 'holdings': {}}
+        return {'balance': 10000.0, 'holdings': {}}
 
 def get_user_transactions(username, limit=10):
-    """Get user transactions from DynamoDB"""
+    """Get user transactions from DynamoDB (numbers converted to int/float)"""
     try:
         response = transactions_table.query(
             KeyConditionExpression=Key('username').eq(username),
             ScanIndexForward=False,  # Sort by timestamp descending
             Limit=limit
         )
-        return response.get('Items', [])
+        return plain_items(response.get('Items', []))
     except ClientError as e:
         print(f"Error getting transactions: {e}")
         return []
 
+def get_transaction_history(username, start=None, end=None, limit=None):
+    """
+    Get a user's transactions in a timestamp range, newest first
+
+    Ranges reaching past the archive cutoff are also read from the
+    S3 archive (see transaction_archive.py) and merged with DynamoDB.
+    """
+    key_condition = Key('username').eq(username)
+    if start and end:
+        key_condition = key_condition & Key('timestamp').between(start, end)
+    elif start:
+        key_condition = key_condition & Key('timestamp').gte(start)
+    elif end:
+        key_condition = key_condition & Key('timestamp').lte(end)
+
+    transactions = []
+    try:
+        query_kwargs = {'KeyConditionExpression': key_condition, 'ScanIndexForward': False}
+        while True:
+            response = transactions_table.query(**query_kwargs)
+            transactions.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response or (limit and len(transactions) >= limit):
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except ClientError as e:
+        print(f"Error getting transactions: {e}")
+
+    if (not limit or len(transactions) < limit) and (not start or start < archive_cutoff()):
+        try:
+            seen = {tx.get('transaction_id') for tx in transactions}
+            archived = get_archived_transactions(username, start, end)
+            transactions.extend(tx for tx in archived if tx.get('transaction_id') not in seen)
+            transactions.sort(key=lambda tx: tx['timestamp'], reverse=True)
+        except ClientError as e:
+            print(f"Error reading archived transactions: {e}")
+
+    return plain_items(transactions[:limit] if limit else transactions)
+
+def get_ledger(username, portfolio, persist=False):
+    """
+    The user's cost-basis ledger from the portfolio item
+
+    Holdings bought before lots were tracked get an opening lot at the
+    quantity-weighted average price of the user's buys of that coin (the
+    current price when no buy is on record, zero cost when there is no
+    price either). With persist, a portfolio item without any cost_basis
+    gets the seeded lots written back once, so the history is read at
+    most once per user.
+    """
+    ledger = Ledger.from_dict(portfolio.get('cost_basis'))
+    missing = ledger.uncovered(portfolio.get('holdings', {}))
+    if not missing:
+        return ledger
+    
+    costs = average_buy_costs(get_transaction_history(username))
+    unpriced = [coin_id for coin_id in missing if coin_id not in costs]
+    if unpriced:
+        prices = get_crypto_prices(unpriced)
+        costs.update((coin_id, prices[coin_id]['usd']) for coin_id in unpriced if coin_id in prices)
+    for coin_id, quantity in missing.items():
+        # Unknown cost is seeded as zero rather than left out, or every read would replay history
+        ledger.seed(coin_id, quantity, costs.get(coin_id, 0.0))
+    
+    if persist and 'cost_basis' not in portfolio:
+        try:
+            portfolios_table.update_item(
+                Key={'username': username},
+                UpdateExpression='SET cost_basis = :cost_basis',
+                ConditionExpression='attribute_not_exists(cost_basis)',
+                ExpressionAttributeValues={':cost_basis': dynamo_value(ledger.to_dict())}
+            )
+        except ClientError as e:
+            # A trade wrote its own lots first; they are seeded again next read
+            print(f"Cost basis migration skipped for {username}: {e}")
+    return ledger
+
 @app.route('/')
 def index():
     if 'username' in session:
@@ -174,12 +301,13 @@ def login():
             response = users_table.get_item(Key={'username': username})
             if 'Item' in response:
                 user = response['Item']
-                if check_password_hash(user['password'], password):
+                if verify_password(user['password'], password):
                     if user_type == 'admin' and user.get('role') != 'admin':
                         return render_template('login.html', error='Access denied. Admin credentials required.')
                     
                     session['username'] = username
                     session['role'] = user.get('role', 'user')
+                    activity_feed.record('login', username, role=session['role'])
                     
                     # Initialize portfolio for regular users
                     if user.get('role') != 'admin':
@@ -194,6 +322,8 @@ def login():
                     return render_template('login.html', error='Invalid credentials')
             else:
                 return render_template('login.html', error='User not found')
+        except AuthBusy:
+            return render_template('login.html', error='Too many login attempts right now. Please try again in a moment.')
         except ClientError as e:
             print(f"Login error: {e}")
             return render_template('login.html', error='Login failed')
@@ -206,6 +336,8 @@ def signup():
         username = request.form['username']
         password = request.form['password']
         email = request.form.get('email', '')
+        if username.startswith('#'):
+            return render_template('signup.html', error='Username cannot start with #')
         
         try:
             # Check if user exists
@@ -214,7 +346,7 @@ def signup():
                 return render_template('signup.html', error='Username already exists')
             
             # Create new user
-            hashed_password = generate_password_hash(password)
+            hashed_password = hash_password(password)
             users_table.put_item(Item={
                 'username': username,
                 'password': hashed_password,
@@ -225,10 +357,13 @@ def signup():
             
             # Initialize portfolio
             initialize_user_portfolio(username)
+            activity_feed.record('signup', username)
             
             send_notification("New User Signup", f"User {username} has signed up")
             return redirect(url_for('login'))
             
+        except AuthBusy:
+            return render_template('signup.html', error='Server is busy. Please try again in a moment.')
         except ClientError as e:
             print(f"Signup error: {e}")
             return render_template('signup.html', error='Signup failed')
@@ -250,13 +385,13 @@ def home():
     portfolio = get_user_portfolio(username)
     
     # Calculate portfolio value
-    total_value = float(portfolio['balance'])
+    total_value = portfolio['balance']
     holdings_value = 0
     
     for coin_id, quantity in portfolio.get('holdings', {}).items():
         if coin_id in prices:
             coin_price = prices[coin_id][currency]
-            holdings_value += float(quantity) * coin_price
+            holdings_value += quantity * coin_price
     
     total_value += holdings_value
     
@@ -283,16 +418,20 @@ def portfolio():
     prices = get_crypto_prices(tracked_coins, currency)
     
     # Calculate portfolio metrics
-    total_value = float(portfolio['balance'])
+    total_value = portfolio['balance']
     holdings_value = 0
     
     for coin_id, quantity in portfolio.get('holdings', {}).items():
         if coin_id in prices:
             coin_price = prices[coin_id][currency]
-            holdings_value += float(quantity) * coin_price
+            holdings_value += quantity * coin_price
     
     total_value += holdings_value
     
+    # Lots are priced in USD
+    ledger = get_ledger(username, portfolio, persist=True)
+    usd_prices = prices if currency == 'usd' else get_crypto_prices(tracked_coins, 'usd')
+    
     return render_template('portfolio.html',
                          portfolio=portfolio,
                          transactions=transactions,
@@ -300,6 +439,7 @@ def portfolio():
                          tracked_coins=tracked_coins,
                          total_value=total_value,
                          holdings_value=holdings_value,
+                         pnl=ledger.summary(usd_prices),
                          currency=currency,
                          currency_symbol=supported_currencies[currency]['symbol'])
 
@@ -354,22 +494,19 @@ def admin_dashboard():
         # Get system statistics
         users_response = users_table.scan()
         portfolios_response = portfolios_table.scan()
-        transactions_response = transactions_table.scan()
         
-        users = users_response.get('Items', [])
-        portfolios = portfolios_response.get('Items', [])
-        transactions = transactions_response.get('Items', [])
+        users = plain_items(users_response.get('Items', []))
+        portfolios = plain_items(portfolios_response.get('Items', []))
         
         # Calculate statistics
         total_users = len([u for u in users if u.get('role') != 'admin'])
         total_admins = len([u for u in users if u.get('role') == 'admin'])
-        total_transactions = len(transactions)
-        total_portfolio_value = sum(float(p.get('balance', 0)) for p in portfolios)
+        total_transactions = transaction_count()
+        total_portfolio_value = sum(p.get('balance', 0) for p in portfolios)
         
-        # Recent activity
-        recent_transactions = sorted(transactions, 
-                                   key=lambda x: x.get('timestamp', ''), 
-                                   reverse=True)[:10]
+        # Recent activity straight off the ring buffer
+        activity_feed.backfill('trade', load_recent_trades)
+        recent_transactions = activity_feed.recent(10, 'trade')
         
         return render_template('admin_dashboard.html',
                              total_users=total_users,
@@ -383,6 +520,136 @@ def admin_dashboard():
         print(f"Admin dashboard error: {e}")
         return render_template('admin_dashboard.html', error='Failed to load dashboard data')
 
+def store_transaction(transaction):
+    """Write a trade (tagged for the RecentTrades index) and count it"""
+    transactions_table.put_item(Item=dict(transaction, feed=RECENT_TRADES_FEED))
+    try:
+        transactions_table.update_item(Key=STATS_KEY, UpdateExpression='ADD trade_count :one',
+                                       ExpressionAttributeValues={':one': 1})
+    except ClientError as e:
+        print(f"Error counting transaction: {e}")
+
+def transaction_count():
+    """
+    Trades ever recorded, from the counter item (archived ones included)
+
+    The first call on a table without a seeded counter counts the stored
+    trades once and seeds it; after that this is a single get_item.
+    """
+    item = transactions_table.get_item(Key=STATS_KEY).get('Item') or {}
+    if 'seeded' in item:
+        return int(item.get('trade_count', 0))
+    counted = 0
+    scan_kwargs = {'Select': 'COUNT', 'FilterExpression': Attr('username').ne(STATS_KEY['username'])}
+    while True:
+        response = transactions_table.scan(**scan_kwargs)
+        counted += response.get('Count', 0)
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    try:
+        transactions_table.update_item(Key=STATS_KEY, UpdateExpression='SET trade_count = :count, seeded = :seeded',
+                                       ConditionExpression='attribute_not_exists(seeded)',
+                                       ExpressionAttributeValues={':count': counted, ':seeded': True})
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return transaction_count()
+    return counted
+
+def load_recent_trades():
+    """Newest stored trades as activity events, to backfill the feed once per process"""
+    try:
+        response = transactions_table.query(IndexName=RECENT_TRADES_INDEX,
+                                            KeyConditionExpression=Key('feed').eq(RECENT_TRADES_FEED),
+                                            ScanIndexForward=False, Limit=activity_feed.by_kind['trade'].maxlen)
+    except ClientError as e:
+        print(f"Error loading recent trades: {e}")
+        return []
+    fields = ('transaction_id', 'username', 'timestamp', 'type', 'coin_id', 'quantity', 'amount')
+    return [{field: tx.get(field) for field in fields} for tx in plain_items(response.get('Items', []))]
+
+def sync_leaderboard():
+    """Rebuild the leaderboard from every stored portfolio"""
+    portfolios = {}
+    try:
+        scan_kwargs = {'ProjectionExpression': 'username, balance, holdings'}
+        while True:
+            response = portfolios_table.scan(**scan_kwargs)
+            for item in plain_items(response.get('Items', [])):
+                portfolios[item['username']] = (item.get('balance', 0), item.get('holdings', {}))
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except ClientError as e:
+        print(f"Error loading portfolios for the leaderboard: {e}")
+        return
+    leaderboard.rebuild(portfolios)
+
+def _leaderboard_sync_loop():
+    while True:
+        try:
+            sync_leaderboard()
+        except Exception as e:
+            print(f"Leaderboard sync failed: {e}")
+        time.sleep(LEADERBOARD_SYNC_SECONDS)
+
+@app.before_request
+def start_leaderboard_sync():
+    """Start this process's leaderboard rebuild thread, so no request pays for the scan"""
+    if LEADERBOARD_SYNC_SECONDS <= 0 or _leaderboard_sync['pid'] == os.getpid():
+        return
+    with _leaderboard_sync_lock:
+        if _leaderboard_sync['pid'] == os.getpid():
+            return
+        _leaderboard_sync['pid'] = os.getpid()
+    threading.Thread(target=_leaderboard_sync_loop, name='leaderboard-sync', daemon=True).start()
+
+@app.route('/api/leaderboard')
+def api_leaderboard():
+    """
+    Top traders by total portfolio value (USD), plus the caller's rank
+    
+    GET /api/leaderboard?limit=10
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    coins = leaderboard.coins()
+    if coins:
+        leaderboard.update_prices(get_crypto_prices(coins))
+    me = leaderboard.rank(session['username'])
+    return jsonify({'top': leaderboard.top(limit), 'me': me, 'users': len(leaderboard)})
+
+@app.route('/api/activity')
+def api_activity():
+    """
+    Most recent events for moderators and admins, newest first
+    
+    GET /api/activity?n=50&kind=trade|signup|login
+    """
+    if 'username' not in session or session.get('role') not in ('moderator', 'admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    activity_feed.backfill('trade', load_recent_trades)
+    n = min(max(request.args.get('n', 20, type=int), 1), activity_feed.events.maxlen)
+    kind = request.args.get('kind') or None
+    return jsonify({'events': activity_feed.recent(n, kind), 'last_id': activity_feed.last_id})
+
+@app.route('/api/activity/stream')
+def api_activity_stream():
+    """Live activity as server-sent events (resumes from Last-Event-ID)"""
+    if 'username' not in session or session.get('role') not in ('moderator', 'admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_id', type=int)
+    kind = request.args.get('kind') or None
+    return Response(activity_feed.stream(last_id, kind), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # API Routes
 @app.route('/api/buy_coin', methods=['POST'])
 def buy_coin():
@@ -398,35 +665,40 @@ def buy_coin():
     
     try:
         # Get current price
-        prices = get_crypto_prices([coin_id])
+        prices = get_crypto_prices([coin_id], priority='trade')
         if coin_id not in prices:
             return jsonify({'error': 'Coin not found'}), 400
         
         current_price = prices[coin_id]['usd']
         quantity = amount_usd / current_price
         
-        # Get current portfolio
+        # Get current portfolio (lots first, before holdings change)
         portfolio = get_user_portfolio(username)
+        ledger = get_ledger(username, portfolio)
         
-        if float(portfolio['balance']) < amount_usd:
+        if portfolio['balance'] < amount_usd:
             return jsonify({'error': 'Insufficient balance'}), 400
         
         # Update portfolio
-        new_balance = float(portfolio['balance']) - amount_usd
+        new_balance = portfolio['balance'] - amount_usd
         holdings = portfolio.get('holdings', {})
         
         if coin_id in holdings:
-            holdings[coin_id] = float(holdings[coin_id]) + quantity
+            holdings[coin_id] = holdings[coin_id] + quantity
         else:
             holdings[coin_id] = quantity
         
+        # Cost-basis lots travel with the portfolio item
+        ledger.record_trade('buy', coin_id, quantity, current_price)
+        
         # Update in DynamoDB
         portfolios_table.update_item(
             Key={'username': username},
-            UpdateExpression='SET balance = :balance, holdings = :holdings',
+            UpdateExpression='SET balance = :balance, holdings = :holdings, cost_basis = :cost_basis',
             ExpressionAttributeValues={
                 ':balance': Decimal(str(new_balance)),
-                ':holdings': {k: Decimal(str(v)) for k, v in holdings.items()}
+                ':holdings': {k: Decimal(str(v)) for k, v in holdings.items()},
+                ':cost_basis': dynamo_value(ledger.to_dict())
             }
         )
         
@@ -443,12 +715,16 @@ def buy_coin():
             'timestamp': datetime.now().isoformat()
         }
         
-        transactions_table.put_item(Item=transaction)
+        store_transaction(transaction)
+        activity_feed.record_trade(username, transaction)
+        leaderboard.update_user(username, new_balance, holdings)
+        if portfolio_curves is not None:
+            portfolio_curves.record_trade(username, transaction)
         
         send_notification("Crypto Purchase", 
                          f"User {username} bought {quantity:.6f} {coin_id.upper()} for ${amount_usd:.2f}")
         
-        return jsonify({'success': True, 'transaction': json.loads(json.dumps(transaction, default=decimal_default))})
+        return jsonify({'success': True, 'transaction': transaction})
         
     except ClientError as e:
         print(f"Buy coin error: {e}")
@@ -467,15 +743,16 @@ def sell_coin():
         return jsonify({'error': 'Invalid quantity'}), 400
     
     try:
-        # Get current portfolio
+        # Get current portfolio (lots first, before holdings change)
         portfolio = get_user_portfolio(username)
         holdings = portfolio.get('holdings', {})
+        ledger = get_ledger(username, portfolio)
         
-        if coin_id not in holdings or float(holdings[coin_id]) < quantity:
+        if coin_id not in holdings or holdings[coin_id] < quantity:
             return jsonify({'error': 'Insufficient holdings'}), 400
         
         # Get current price
-        prices = get_crypto_prices([coin_id])
+        prices = get_crypto_prices([coin_id], priority='trade')
         if coin_id not in prices:
             return jsonify({'error': 'Coin not found'}), 400
         
@@ -483,19 +760,22 @@ def sell_coin():
         amount_usd = quantity * current_price
         
         # Update portfolio
-        new_balance = float(portfolio['balance']) + amount_usd
-        holdings[coin_id] = float(holdings[coin_id]) - quantity
+        new_balance = portfolio['balance'] + amount_usd
+        holdings[coin_id] = holdings[coin_id] - quantity
         
         if holdings[coin_id] <= 0:
             del holdings[coin_id]
         
+        realized_pnl = ledger.record_trade('sell', coin_id, quantity, current_price)
+        
         # Update in DynamoDB
         portfolios_table.update_item(
             Key={'username': username},
-            UpdateExpression='SET balance = :balance, holdings = :holdings',
+            UpdateExpression='SET balance = :balance, holdings = :holdings, cost_basis = :cost_basis',
             ExpressionAttributeValues={
                 ':balance': Decimal(str(new_balance)),
-                ':holdings': {k: Decimal(str(v)) for k, v in holdings.items()}
+                ':holdings': {k: Decimal(str(v)) for k, v in holdings.items()},
+                ':cost_basis': dynamo_value(ledger.to_dict())
             }
         )
         
@@ -509,20 +789,36 @@ def sell_coin():
             'quantity': Decimal(str(quantity)),
             'price': Decimal(str(current_price)),
             'amount': Decimal(str(amount_usd)),
+            'realized_pnl': Decimal(str(realized_pnl)),
             'timestamp': datetime.now().isoformat()
         }
         
-        transactions_table.put_item(Item=transaction)
+        store_transaction(transaction)
+        activity_feed.record_trade(username, transaction)
+        leaderboard.update_user(username, new_balance, holdings)
+        if portfolio_curves is not None:
+            portfolio_curves.record_trade(username, transaction)
         
         send_notification("Crypto Sale", 
                          f"User {username} sold {quantity:.6f} {coin_id.upper()} for ${amount_usd:.2f}")
         
-        return jsonify({'success': True, 'transaction': json.loads(json.dumps(transaction, default=decimal_default))})
+        return jsonify({'success': True, 'transaction': transaction})
         
     except ClientError as e:
         print(f"Sell coin error: {e}")
         return jsonify({'error': 'Transaction failed'}), 500
 
+@app.route('/api/pnl')
+def api_pnl():
+    """Realized and unrealized P&L per coin from the cost-basis lots on the portfolio item"""
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    username = session['username']
+    ledger = get_ledger(username, get_user_portfolio(username), persist=True)
+    prices = get_crypto_prices(list(ledger.positions)) if ledger.positions else {}
+    return jsonify(ledger.summary(prices))
+
 @app.route('/api/set_currency', methods=['POST'])
 def set_currency():
     if 'username' not in session:
@@ -539,6 +835,19 @@ def set_currency():
         'currency_symbol': supported_currencies[currency]['symbol']
     })
 
+@app.route('/api/transactions')
+def api_transactions():
+    """Transaction history for the logged-in user, including archived ranges"""
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    start = request.args.get('start')
+    end = request.args.get('end')
+    limit = request.args.get('limit', 100, type=int)
+    
+    transactions = get_transaction_history(session['username'], start, end, limit)
+    return jsonify({'transactions': transactions})
+
 @app.route('/api/historical/<coin_id>')
 def api_historical(coin_id):
     """API endpoint for historical price data"""
@@ -548,26 +857,23 @@ def api_historical(coin_id):
     if currency not in supported_currencies:
         currency = 'usd'
     
+    interval = 'daily' if days > 30 else 'hourly'
+    import fx  # NumPy is only loaded once history is first requested
+    chart = fx.usd_chart(coin_id, days, lambda: fetch_usd_history(coin_id, days, interval), interval)
+    if chart is None:
+        return jsonify(generate_mock_historical_data(days))
+    return jsonify(fx.chart_json(chart, currency))
+
+def fetch_usd_history(coin_id, days, interval=None):
+    """Raw /market_chart data in USD, or None when the upstream call fails"""
+    params = {'vs_currency': 'usd', 'days': days}
+    if interval:
+        params['interval'] = interval
     try:
-        url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-        params = {
-            'vs_currency': currency,
-            'days': days,
-            'interval': 'daily' if days > 30 else 'hourly'
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            return jsonify(data)
-        else:
-            # Return mock data if API fails
-            mock_data = generate_mock_historical_data(days)
-            return jsonify(mock_data)
+        return upstream.fetch_json(f'/coins/{coin_id}/market_chart', params=params)
     except Exception as e:
         print(f"Error fetching historical data: {e}")
-        mock_data = generate_mock_historical_data(days)
-        return jsonify(mock_data)
+        return None
 
 def generate_mock_historical_data(days):
     """Generate mock historical data for charts"""
@@ -589,6 +895,104 @@ def generate_mock_historical_data(days):
         'total_volumes': [[p[0], p[1] * random.randint(10000, 1000000)] for p in prices]
     }
 
+def get_market_series(coin_id, days=7, currency='usd'):
+    """
+    Real historical prices for analytics, backtests, risk and portfolio curves
+    
+    Returns None when CoinGecko has no data, so mock series are never
+    cached or modelled (the coin is reported as missing instead).
+    """
+    import fx
+    chart = fx.usd_chart(coin_id, days, lambda: fetch_usd_history(coin_id, days))
+    if chart is None:
+        return None
+    return fx.chart_points(chart, currency)
+
+def load_screener_prices(currency):
+    return get_crypto_prices(tracked_coins, currency)
+
+@app.route('/api/screener')
+def api_screener():
+    """
+    Filter, rank and paginate tracked coins from the current price snapshot
+    
+    GET /api/screener?sort=change|market_cap|volume|price&order=desc|asc
+                     &min_<key>=..&max_<key>=..&q=bit&page=1&per_page=20&currency=usd
+    """
+    currency = request.args.get('currency', 'usd').lower()
+    if currency not in supported_currencies:
+        currency = 'usd'
+    options, page, per_page = screener.parse_query(request.args)
+    total, rows = screener.get_index(currency, load_screener_prices).query(**options)
+    return jsonify({
+        'results': rows,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'sort': options['sort'],
+        'order': 'desc' if options['descending'] else 'asc',
+        'currency': currency,
+        'currency_symbol': supported_currencies[currency]['symbol']
+    })
+
+@app.route('/api/market_stats')
+def market_stats():
+    """Get market statistics"""
+    try:
+        return jsonify(get_market_stats())
+    except Exception as e:
+        print(f"Error fetching market stats: {e}")
+        return jsonify({'error': 'Failed to fetch market stats'}), 500
+
+@app.route('/api/trending')
+def trending():
+    """Get trending cryptocurrencies"""
+    return jsonify(get_trending_coins())
+
+@app.route('/api/fear_greed')
+def fear_greed():
+    """Get Fear & Greed Index"""
+    return jsonify(get_fear_greed())
+
+@app.route('/api/upstream_status')
+def upstream_status():
+    """CoinGecko client health: circuit breaker state and pool settings"""
+    return jsonify(dict(upstream.status(), market_plane=market_plane.status()))
+
+# Widgets served by /api/dashboard_bundle: name -> (cache TTL in seconds, resolver)
+BUNDLE_WIDGETS = {
+    'market_stats': (60, lambda currency: get_market_stats()),
+    'trending': (300, lambda currency: get_trending_coins()),
+    'fear_greed': (300, lambda currency: get_fear_greed()),
+    'prices': (30, lambda currency: {
+        'prices': get_crypto_prices(tracked_coins, currency),
+        'currency': currency,
+        'currency_symbol': supported_currencies[currency]['symbol']
+    }),
+    'historical': (300, lambda currency, coin_id, days='7': get_market_series(coin_id, history_days(days), currency))
+}
+
+@app.route('/api/dashboard_bundle', methods=['GET', 'POST'])
+async def dashboard_bundle():
+    """Several dashboard widgets in one request (see dashboard_bundle.py)"""
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        raw_widgets = body.get('widgets', [])
+        currency = str(body.get('currency', 'usd')).lower()
+    else:
+        raw_widgets = request.args.get('widgets', '')
+        currency = request.args.get('currency', 'usd').lower()
+    if currency not in supported_currencies:
+        currency = 'usd'
+    
+    data, errors = await resolve_bundle(parse_widgets(raw_widgets), BUNDLE_WIDGETS, currency)
+    return bundle_response({
+        'widgets': data,
+        'errors': errors,
+        'currency': currency,
+        'currency_symbol': supported_currencies[currency]['symbol']
+    })
+
 # Admin API Routes
 @app.route('/api/admin/create_user', methods=['POST'])
 def admin_create_user():
@@ -599,6 +1003,8 @@ def admin_create_user():
         username = request.json.get('username')
         password = request.json.get('password')
         role = request.json.get('role', 'user')
+        if not username or username.startswith('#'):
+            return jsonify({'error': 'Invalid username'}), 400
         
         # Check if user exists
         response = users_table.get_item(Key={'username': username})
@@ -606,7 +1012,7 @@ def admin_create_user():
             return jsonify({'error': 'User already exists'}), 400
         
         # Create user
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
         users_table.put_item(Item={
             'username': username,
             'password': hashed_password,
@@ -620,9 +1026,147 @@ def admin_create_user():
         send_notification("Admin User Creation", f"Admin created user: {username}")
         return jsonify({'success': True})
         
+    except AuthBusy:
+        return jsonify({'error': 'Server is busy, try again'}), 503
     except ClientError as e:
         print(f"Admin create user error: {e}")
         return jsonify({'error': 'Failed to create user'}), 500
 
+@app.route('/api/analytics')
+async def api_analytics():
+    """
+    Volatility, moving average, RSI, drawdowns and correlations for tracked coins
+    
+    GET /api/analytics?days=30&window=24&coins=bitcoin,ethereum&currency=usd
+    """
+    days = min(max(request.args.get('days', 30, type=int), 2), 365)
+    window = min(max(request.args.get('window', 24, type=int), 2), 24 * 30)
+    currency = request.args.get('currency', 'usd').lower()
+    if currency not in supported_currencies:
+        currency = 'usd'
+    coins = [c for c in request.args.get('coins', '').split(',') if c in tracked_coins] or tracked_coins
+    
+    import analytics  # NumPy is only loaded once analytics are first requested
+    result = await analytics.market_analytics(coins, days, window, currency, get_market_series)
+    return jsonify(result)
+
+@app.route('/api/backtest')
+async def api_backtest():
+    """
+    Backtest a strategy, or sweep its parameters, over tracked coins
+    
+    GET /api/backtest?strategy=momentum&lookback=12,24,48&threshold=0&days=90&coins=bitcoin,ethereum
+    GET /api/backtest?strategy=dca&sweep=1   (the strategy's default parameter grid)
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    import backtest
+    strategy = request.args.get('strategy', 'momentum')
+    if strategy not in backtest.STRATEGIES:
+        return jsonify({'error': f"Unknown strategy, use one of: {', '.join(sorted(backtest.STRATEGIES))}"}), 400
+    days = min(max(request.args.get('days', 90, type=int), 2), 365)
+    currency = request.args.get('currency', 'usd').lower()
+    if currency not in supported_currencies:
+        currency = 'usd'
+    coins = [c for c in request.args.get('coins', '').split(',') if c in tracked_coins] or tracked_coins
+    try:
+        grid = backtest.parse_grid(strategy, None if request.args.get('sweep') else request.args)
+    except (ValueError, OverflowError) as e:
+        return jsonify({'error': f'Invalid parameter value: {e}'}), 400
+    if len(grid) > backtest.BACKTEST_MAX_SWEEP:
+        return jsonify({'error': f'Too many parameter combinations (max {backtest.BACKTEST_MAX_SWEEP})'}), 400
+    
+    result = await backtest.run_backtest(strategy, grid, coins, days, currency, get_market_series)
+    return jsonify(result)
+
+@app.route('/api/risk')
+async def api_risk():
+    """
+    Monte Carlo VaR and expected shortfall (1 and 7 days) for a portfolio
+    
+    GET /api/risk?paths=100000                   the signed-in user's portfolio
+    GET /api/risk?username=alice&paths=100000    any portfolio (analysts and admins)
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    username = request.args.get('username') or session['username']
+    if username != session['username'] and session.get('role') not in ('analyst', 'admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    import risk
+    paths = min(max(request.args.get('paths', risk.DEFAULT_PATHS, type=int), 1000), risk.MAX_PATHS)
+    try:
+        item = portfolios_table.get_item(Key={'username': username}).get('Item')
+    except ClientError as e:
+        print(f"Error getting portfolio: {e}")
+        return jsonify({'error': 'Failed to load portfolio'}), 500
+    if item is None:
+        return jsonify({'error': 'Portfolio not found'}), 404
+    
+    portfolio = plain_item(item)
+    holdings = portfolio.get('holdings', {})
+    prices = get_crypto_prices(list(holdings)) if holdings else {}
+    result = await risk.portfolio_risk(holdings, prices, get_market_series, paths)
+    return jsonify(dict(result, username=username, cash=portfolio.get('balance', 0)))
+
+portfolio_curves = None
+
+def get_portfolio_curves():
+    """Per-user portfolio value curves, created on first use so NumPy loads lazily"""
+    global portfolio_curves
+    if portfolio_curves is None:
+        from portfolio_history import PortfolioCurves
+        portfolio_curves = PortfolioCurves(get_transaction_history, get_market_series)
+    return portfolio_curves
+
+@app.route('/api/portfolio_history')
+async def api_portfolio_history():
+    """
+    Portfolio value over time from the user's trades and cached price history
+    
+    GET /api/portfolio_history?days=30   (days: 1, 7, 30, 90 or 365)
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    from portfolio_history import ALLOWED_DAYS
+    days = request.args.get('days', 30, type=int)
+    if days not in ALLOWED_DAYS:
+        days = 30
+    return jsonify(await get_portfolio_curves().curve(session['username'], days))
+
+def warm_up():
+    """Compile every template and load the analytics engine up front so the first request doesn't pay for it"""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    importlib.import_module('analytics')
+    importlib.import_module('fx')
+    get_portfolio_curves()
+
+def create_app(config=None):
+    """
+    Application factory used by serve.py
+    
+    Args:
+        config: Optional dict or config object applied on top of the defaults;
+                CRYPTOPULSE_* environment variables are applied last
+    
+    Returns:
+        Flask: The configured application
+    """
+    if config is not None:
+        if isinstance(config, dict):
+            app.config.from_mapping(config)
+        else:
+            app.config.from_object(config)
+    app.config.from_prefixed_env('CRYPTOPULSE')
+    
+    if app.config.get('WARM_UP', True):
+        warm_up()
+    return app
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server; use serve.py for production
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,110 @@
+"""
+Password hashing subsystem for CryptoPulse
+
+Werkzeug password hashes are deliberately slow (~0.5s for pbkdf2 with
+600k iterations). Running them on request threads lets a burst of
+logins starve trading requests of CPU, and hashing the demo accounts at
+import slowed every worker start. This module:
+
+- ships precomputed hashes for the seed users (password: demo123),
+  optionally overridden from a JSON file (SEED_HASHES_FILE)
+- runs hashing and verification on a bounded process pool with a cap on
+  queued work; when the queue is full callers get AuthBusy instead of
+  piling up behind it
+- makes the hash method and cost configurable
+
+Environment:
+    AUTH_HASH_METHOD   pbkdf2:sha256 (default) or scrypt
+    AUTH_HASH_COST     pbkdf2 iterations / scrypt N (default: Werkzeug's)
+    AUTH_WORKERS       hashing processes (default 2, 0 = run inline)
+    AUTH_MAX_PENDING   max queued + running hash jobs (default 32)
+    AUTH_WAIT_TIMEOUT  seconds to wait for a queue slot (default 2)
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+AUTH_HASH_METHOD = os.environ.get('AUTH_HASH_METHOD', 'pbkdf2:sha256')
+AUTH_HASH_COST = os.environ.get('AUTH_HASH_COST')
+AUTH_WORKERS = int(os.environ.get('AUTH_WORKERS', 2))
+AUTH_MAX_PENDING = int(os.environ.get('AUTH_MAX_PENDING', 32))
+AUTH_WAIT_TIMEOUT = float(os.environ.get('AUTH_WAIT_TIMEOUT', 2))
+
+# Precomputed hashes for the built-in demo accounts (password: demo123)
+SEED_PASSWORD_HASHES = {
+    'demo@user.com': 'pbkdf2:sha256:600000$dxnxoiLuqShWhquP$f22329982584462c16e9452b3e9ba1dfe665c520f61bb5935f7f6dfc3ecc53cb',
+    'admin@crypto.com': 'pbkdf2:sha256:600000$ATOVlNbVQoxeeAJ3$91eab0d2ae51cc84f7c9e1b37cf1edb7c2b05d3a96872e15751d40a2590d37b8',
+    'analyst@crypto.com': 'pbkdf2:sha256:600000$wPiKOx2Tt442RegW$54a44227ea8d8f19880302d8ed75b5fecb5e73976bc931e363a7028cb05a9195',
+    'mod@crypto.com': 'pbkdf2:sha256:600000$yfOIF3BOtpftAs0a$4fcbdab327121d036c901e57cef62f459ee52fa63f896ba26c50fb76c4d6bd48'
+}
+
+if os.environ.get('SEED_HASHES_FILE'):
+    with open(os.environ['SEED_HASHES_FILE']) as f:
+        SEED_PASSWORD_HASHES.update(json.load(f))
+
+
+class AuthBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_slots = threading.BoundedSemaphore(AUTH_MAX_PENDING)
+
+
+def hash_method():
+    """Werkzeug method string built from AUTH_HASH_METHOD and AUTH_HASH_COST"""
+    if not AUTH_HASH_COST:
+        return AUTH_HASH_METHOD
+    if AUTH_HASH_METHOD.startswith('scrypt'):
+        return f"scrypt:{AUTH_HASH_COST}:8:1"
+    return f"{AUTH_HASH_METHOD}:{AUTH_HASH_COST}"
+
+
+def _get_pool():
+    """Process pool for hashing, created on first use and recreated after fork"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ProcessPoolExecutor(max_workers=AUTH_WORKERS)
+            _pool_pid = pid
+        return _pool
+
+
+def _run(fn, *args):
+    """Run fn on the hashing pool, bounded by AUTH_MAX_PENDING"""
+    if AUTH_WORKERS <= 0:
+        return fn(*args)
+    if not _slots.acquire(timeout=AUTH_WAIT_TIMEOUT):
+        raise AuthBusy('Too many authentication requests in progress')
+    try:
+        return _get_pool().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    """Hash a password off the request thread"""
+    return _run(generate_password_hash, password, hash_method())
+
+
+def verify_password(password_hash, password):
+    """Check a password against its hash off the request thread"""
+    return _run(check_password_hash, password_hash, password)
+
+
+def shutdown():
+    """Stop the hashing pool (e.g. on worker exit)"""
+    global _pool
+    with _lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
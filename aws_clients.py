@@ -0,0 +1,156 @@
+"""
+Lazy AWS client factory for CryptoPulse
+
+boto3 clients and resources are expensive to build (service models are
+loaded from disk and parsed), so nothing is created at import time.
+Each client is built on first use, shared by every thread in the
+process, and rebuilt after a fork so gunicorn workers never share
+sockets with the master.
+"""
+
+import os
+import threading
+
+AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+
+# Connection pool / retry tuning (override via environment)
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 50))
+CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', 2))
+READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', 5))
+MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', 4))
+
+# Optional endpoint overrides for local stand-ins (LocalStack, MinIO, moto_server)
+ENDPOINT_URLS = {
+    'dynamodb': os.environ.get('DYNAMODB_ENDPOINT_URL'),
+    's3': os.environ.get('S3_ENDPOINT_URL'),
+    'sns': os.environ.get('SNS_ENDPOINT_URL'),
+}
+
+_lock = threading.Lock()
+_clients = {}
+_resources = {}
+_tables = {}
+_config = None
+_owner_pid = None
+
+
+def _reset_if_forked():
+    """Drop cached clients inherited from a parent process"""
+    global _owner_pid, _config
+    pid = os.getpid()
+    if _owner_pid != pid:
+        _clients.clear()
+        _resources.clear()
+        _tables.clear()
+        _config = None
+        _owner_pid = pid
+
+
+def get_config():
+    """Shared botocore Config: larger pool, keep-alive, adaptive retries, tight timeouts"""
+    global _config
+    if _config is None:
+        from botocore.config import Config
+        _config = Config(
+            region_name=AWS_REGION,
+            max_pool_connections=MAX_POOL_CONNECTIONS,
+            tcp_keepalive=True,
+            connect_timeout=CONNECT_TIMEOUT,
+            read_timeout=READ_TIMEOUT,
+            retries={'mode': 'adaptive', 'max_attempts': MAX_ATTEMPTS}
+        )
+    return _config
+
+
+def get_client(service_name):
+    """Return the process-wide boto3 client for a service, creating it on first use"""
+    client = _clients.get(service_name)
+    if client is not None and _owner_pid == os.getpid():
+        return client
+
+    with _lock:
+        _reset_if_forked()
+        client = _clients.get(service_name)
+        if client is None:
+            import boto3
+            client = boto3.client(
+                service_name,
+                config=get_config(),
+                endpoint_url=ENDPOINT_URLS.get(service_name)
+            )
+            _clients[service_name] = client
+        return client
+
+
+def get_resource(service_name):
+    """Return the process-wide boto3 resource for a service, creating it on first use"""
+    resource = _resources.get(service_name)
+    if resource is not None and _owner_pid == os.getpid():
+        return resource
+
+    with _lock:
+        _reset_if_forked()
+        resource = _resources.get(service_name)
+        if resource is None:
+            import boto3
+            resource = boto3.resource(
+                service_name,
+                config=get_config(),
+                endpoint_url=ENDPOINT_URLS.get(service_name)
+            )
+            _resources[service_name] = resource
+        return resource
+
+
+def get_table(table_name):
+    """Return a shared DynamoDB Table object"""
+    table = _tables.get(table_name)
+    if table is not None and _owner_pid == os.getpid():
+        return table
+
+    dynamodb = get_resource('dynamodb')
+    with _lock:
+        table = _tables.get(table_name)
+        if table is None:
+            table = dynamodb.Table(table_name)
+            _tables[table_name] = table
+        return table
+
+
+class LazyClient:
+    """Module-level stand-in for a boto3 client that is only built when first used"""
+
+    def __init__(self, service_name):
+        self._service_name = service_name
+
+    def __getattr__(self, name):
+        return getattr(get_client(self._service_name), name)
+
+    def __repr__(self):
+        return f"<LazyClient {self._service_name}>"
+
+
+class LazyResource:
+    """Module-level stand-in for a boto3 resource that is only built when first used"""
+
+    def __init__(self, service_name):
+        self._service_name = service_name
+
+    def __getattr__(self, name):
+        return getattr(get_resource(self._service_name), name)
+
+    def __repr__(self):
+        return f"<LazyResource {self._service_name}>"
+
+
+class LazyTable:
+    """Module-level stand-in for a DynamoDB Table that is only built when first used"""
+
+    def __init__(self, table_name):
+        self.name = table_name
+
+    def __getattr__(self, name):
+        return getattr(get_table(self.name), name)
+
+    def __repr__(self):
+        return f"<LazyTable {self.name}>"
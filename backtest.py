@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Vectorized strategy backtesting over historical price series
+
+Strategies run on the same series the app charts (get_market_series)
+or, offline, on seeded random walks from mock_series(). Series are
+aligned into one (coins x points) matrix and every strategy trades all
+coins at once with buy_coin / sell_coin semantics: buys spend a dollar
+amount from a $10,000 cash balance at the current price, sells return
+quantity x price, no fees.
+
+    dca        buy `amount` every `interval` points until cash runs out
+    momentum   all-in while price > SMA(lookback) x (1 + threshold), else cash
+    rebalance  hold `target` weight in the coin, rebalance when the weight
+               drifts more than `threshold` away from it
+
+DCA and momentum are closed-form over the time axis (cumulative sums and
+products); rebalance is path-dependent and steps through time with every
+coin in one vector.
+
+Parameter sweeps are spread across a process pool. The price matrix is
+copied once into shared memory; workers map it read-only instead of
+receiving a pickled copy per task.
+
+Environment:
+    BACKTEST_WORKERS   sweep processes (default: CPU count, 0 = run inline)
+    BACKTEST_MAX_SWEEP max parameter combinations per API request (default 200)
+
+Usage:
+    python backtest.py --strategy momentum --param lookback=12,24,48 --offline
+    python backtest.py --strategy dca --coins bitcoin,ethereum --days 90 --json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import upstream
+from analytics import MS_PER_YEAR, align_series, cached_series
+from cache import TTLCache
+
+BACKTEST_WORKERS = int(os.environ.get('BACKTEST_WORKERS', os.cpu_count() or 1))
+BACKTEST_MAX_SWEEP = int(os.environ.get('BACKTEST_MAX_SWEEP', 200))
+STARTING_BALANCE = 10000.0
+MAX_CURVE_POINTS = 500
+RESULT_TTL = 300
+
+result_cache = TTLCache(max_entries=128)
+
+
+def dca(prices, interval=24, amount=100.0, cash=STARTING_BALANCE):
+    """Buy `amount` dollars every `interval` points while cash lasts"""
+    interval = max(int(interval), 1)
+    schedule = np.zeros(prices.shape[1])
+    schedule[::interval] = amount
+    spent = np.minimum(np.cumsum(schedule), cash)
+    spend = np.diff(spent, prepend=0.0)
+    quantity = np.cumsum(spend / prices, axis=1)
+    equity = cash - spent + quantity * prices
+    trades = np.full(prices.shape[0], int(np.count_nonzero(spend)))
+    return equity, trades
+
+
+def momentum(prices, lookback=24, threshold=0.0, cash=STARTING_BALANCE):
+    """Fully invested while the price is above its moving average, in cash otherwise"""
+    lookback = max(int(lookback), 1)
+    coins, points = prices.shape
+    sma = np.full((coins, points), np.inf)
+    csum = np.zeros((coins, points + 1))
+    np.cumsum(prices, axis=1, out=csum[:, 1:])
+    if points >= lookback:
+        sma[:, lookback - 1:] = (csum[:, lookback:] - csum[:, :-lookback]) / lookback
+    invested = prices > sma * (1 + threshold)
+
+    # A signal at t holds the coin over (t, t+1]
+    growth = np.where(invested[:, :-1], prices[:, 1:] / prices[:, :-1], 1.0)
+    equity = np.empty((coins, points))
+    equity[:, 0] = cash
+    np.cumprod(growth, axis=1, out=equity[:, 1:])
+    equity[:, 1:] *= cash
+    trades = np.count_nonzero(np.diff(invested[:, :-1].astype(np.int8), axis=1, prepend=0), axis=1)
+    return equity, trades
+
+
+def rebalance(prices, target=0.5, threshold=0.05, cash=STARTING_BALANCE):
+    """Hold `target` of the value in the coin, rebalancing on drift beyond `threshold`"""
+    coins, points = prices.shape
+    quantity = cash * target / prices[:, 0]
+    balance = np.full(coins, cash * (1 - target))
+    trades = np.ones(coins, dtype=np.int64)
+    equity = np.empty((coins, points))
+    equity[:, 0] = cash
+    for t in range(1, points):
+        price = prices[:, t]
+        held = quantity * price
+        value = balance + held
+        drifted = np.abs(held / value - target) > threshold
+        if drifted.any():
+            quantity = np.where(drifted, value * target / price, quantity)
+            balance = np.where(drifted, value * (1 - target), balance)
+            trades += drifted
+        equity[:, t] = value
+    return equity, trades
+
+
+# name -> (function, default sweep grid)
+STRATEGIES = {
+    'dca': (dca, {'interval': [24, 72, 168], 'amount': [50.0, 100.0, 250.0]}),
+    'momentum': (momentum, {'lookback': [12, 24, 48, 96], 'threshold': [0.0, 0.01]}),
+    'rebalance': (rebalance, {'target': [0.25, 0.5, 0.75], 'threshold': [0.02, 0.05, 0.1]}),
+}
+
+# strategy -> {param: (min, max)}; values outside (or NaN/inf) are rejected
+PARAM_RANGES = {
+    'dca': {'interval': (1, 24 * 365), 'amount': (0.0, STARTING_BALANCE)},
+    'momentum': {'lookback': (1, 24 * 365), 'threshold': (0.0, 1.0)},
+    'rebalance': {'target': (0.0, 1.0), 'threshold': (0.0, 1.0)},
+}
+
+
+def summarize(equity, trades, prices, step_ms):
+    """Return, drawdown, volatility and Sharpe per coin from equity curves"""
+    periods_per_year = MS_PER_YEAR / step_ms
+    returns = np.diff(equity, axis=1) / equity[:, :-1]
+    volatility = returns.std(axis=1) * np.sqrt(periods_per_year)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(volatility > 0, returns.mean(axis=1) * periods_per_year / volatility, 0.0)
+    max_drawdown = (equity / np.maximum.accumulate(equity, axis=1)).min(axis=1) - 1
+    total_return = equity[:, -1] / equity[:, 0] - 1
+    hold_return = prices[:, -1] / prices[:, 0] - 1
+    return [{
+        'final_value': round(float(equity[i, -1]), 2),
+        'return_pct': round(float(total_return[i]) * 100, 2),
+        'buy_and_hold_pct': round(float(hold_return[i]) * 100, 2),
+        'max_drawdown_pct': round(float(max_drawdown[i]) * 100, 2),
+        'volatility_pct': round(float(volatility[i]) * 100, 2),
+        'sharpe': round(float(sharpe[i]), 3),
+        'trades': int(trades[i])
+    } for i in range(len(equity))]
+
+
+def parse_grid(strategy, values):
+    """
+    Expand {'param': '1,2,3'} (or lists) into parameter combinations
+
+    Unknown parameters are ignored and parameters not given keep the
+    strategy function's default; `values=None` selects the strategy's
+    default sweep grid. Raises ValueError for a value outside
+    PARAM_RANGES.
+    """
+    defaults = STRATEGIES[strategy][1]
+    if values is None:
+        axes = defaults
+    else:
+        axes = {}
+        for name, default in defaults.items():
+            raw = values.get(name)
+            if raw is None or raw == '':
+                continue
+            items = raw.split(',') if isinstance(raw, str) else list(raw)
+            low, high = PARAM_RANGES[strategy][name]
+            axes[name] = []
+            for item in items:
+                value = float(item)
+                if not low <= value <= high:
+                    raise ValueError(f"{name} must be between {low:g} and {high:g}")
+                axes[name].append(type(default[0])(value))
+    names = list(axes)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(axes[n] for n in names))]
+
+
+# Worker side: the shared matrix most recently attached by this process
+_attached = {'name': None, 'shm': None, 'prices': None}
+
+
+def _shared_prices(name, shape):
+    if _attached['name'] != name:
+        if _attached['shm'] is not None:
+            _attached['prices'] = None  # release the view before unmapping
+            _attached['shm'].close()
+        # Pool workers share the parent's resource tracker; the parent unlinks the block
+        shm = shared_memory.SharedMemory(name=name)
+        prices = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        prices.flags.writeable = False
+        _attached.update(name=name, shm=shm, prices=prices)
+    return _attached['prices']
+
+
+def _run_shared(name, shape, step_ms, strategy, params):
+    prices = _shared_prices(name, shape)
+    equity, trades = STRATEGIES[strategy][0](prices, **params)
+    return summarize(equity, trades, prices, step_ms)
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def _get_pool(workers):
+    """Sweep process pool, created on first use and recreated after fork"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    with _lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_pid = pid
+        return _pool
+
+
+def sweep(prices, step_ms, strategy, grid, workers=None):
+    """
+    Summary stats for every parameter combination in `grid`
+
+    Args:
+        prices: (coins x points) price matrix
+        step_ms: Spacing of the price points
+        workers: Processes to spread the grid over (default BACKTEST_WORKERS,
+                 0 or a single combination runs inline)
+
+    Returns:
+        list: per combination, per-coin stats in the row order of `prices`
+    """
+    workers = BACKTEST_WORKERS if workers is None else workers
+    if workers <= 0 or len(grid) <= 1:
+        fn = STRATEGIES[strategy][0]
+        return [summarize(*fn(prices, **params), prices, step_ms) for params in grid]
+
+    shm = shared_memory.SharedMemory(create=True, size=max(prices.nbytes, 1))
+    try:
+        np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)[:] = prices
+        pool = _get_pool(workers)
+        futures = [pool.submit(_run_shared, shm.name, prices.shape, step_ms, strategy, params)
+                   for params in grid]
+        return [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def backtest(arrays_by_coin, strategy, grid, workers=None):
+    """
+    Run a strategy (or a sweep) over aligned series
+
+    Args:
+        arrays_by_coin: {coin_id: (timestamps, prices)} as from analytics.series_arrays()
+        strategy: One of STRATEGIES
+        grid: Parameter combinations (see parse_grid)
+
+    Returns:
+        dict: every combination ranked by mean return, plus equity curves
+        and per-coin stats for the best one
+    """
+    started = time.perf_counter()
+    coins, timestamps, prices = align_series(arrays_by_coin)
+    if len(timestamps) < 3:
+        return {'strategy': strategy, 'coins': [], 'missing': list(arrays_by_coin), 'runs': [], 'best': None}
+    step_ms = float(timestamps[1] - timestamps[0])
+
+    stats = sweep(prices, step_ms, strategy, grid, workers)
+    runs = sorted(({
+        'params': params,
+        'mean_return_pct': round(sum(s['return_pct'] for s in per_coin) / len(per_coin), 2),
+        'coins': dict(zip(coins, per_coin))
+    } for params, per_coin in zip(grid, stats)), key=lambda run: run['mean_return_pct'], reverse=True)
+
+    best = runs[0]
+    equity, _ = STRATEGIES[strategy][0](prices, **best['params'])
+    stride = max(1, -(-len(timestamps) // MAX_CURVE_POINTS))
+    curves = {coin_id: [{'x': int(x), 'y': round(float(y), 2)}
+                        for x, y in zip(timestamps[::stride], equity[i, ::stride])]
+              for i, coin_id in enumerate(coins)}
+
+    return {
+        'strategy': strategy,
+        'coins': coins,
+        'missing': [coin_id for coin_id in arrays_by_coin if coin_id not in coins],
+        'points': len(timestamps),
+        'starting_balance': STARTING_BALANCE,
+        'runs': runs,
+        'best': {'params': best['params'], 'mean_return_pct': best['mean_return_pct'],
+                 'coins': best['coins'], 'equity': curves},
+        'compute_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def mock_series(coin_id, days=30, seed=0):
+    """Seeded hourly random walk in get_historical_data's format, for offline runs"""
+    rng = np.random.default_rng([seed, zlib.crc32(coin_id.encode())])
+    points = days * 24
+    end = int(time.time() // 3600 * 3600 * 1000)
+    timestamps = end - np.arange(points)[::-1] * 3600 * 1000
+    prices = rng.uniform(1, 1000) * np.exp(np.cumsum(rng.normal(0, 0.01, points)))
+    return [{'x': int(t), 'y': round(float(p), 6)} for t, p in zip(timestamps, prices)]
+
+
+async def run_backtest(strategy, grid, coins, days, currency, loader):
+    """
+    Backtest over cached series, cached per (strategy, grid, coins, days, currency)
+
+    Args:
+        loader: fn(coin_id, days, currency) -> [{'x': ms, 'y': price}], None
+                without real data (never mock series)
+    """
+    key = (strategy, json.dumps(grid, sort_keys=True), tuple(sorted(coins)), days, currency)
+    result = result_cache.get(key, RESULT_TTL)
+    if result is not None:
+        return result
+
+    results = await upstream.gather(**{
+        coin_id: upstream.run_async(cached_series, loader, coin_id, days, currency)
+        for coin_id in coins
+    })
+    series = {coin_id: data for coin_id, data in results.items() if isinstance(data, tuple)}
+    result = backtest(series, strategy, grid)
+    result['missing'] = sorted(set(result['missing']) | (set(coins) - set(series)))
+    result.update({'days': days, 'currency': currency})
+    if result['runs'] and not result['missing']:
+        result_cache.set(key, result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest a strategy over historical prices')
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='momentum')
+    parser.add_argument('--coins', help='Comma-separated coin ids (default: all tracked coins)')
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--currency', default='usd')
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=V1,V2',
+                        help="Parameter values to sweep; omit for the strategy's default grid")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--offline', action='store_true', help='Use seeded mock series instead of CoinGecko')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print the full result (with equity curves) as JSON')
+    args = parser.parse_args()
+
+    import app
+    coins = args.coins.split(',') if args.coins else list(app.tracked_coins)
+    values = dict(item.split('=', 1) for item in args.param) if args.param else None
+    grid = parse_grid(args.strategy, values)
+
+    if args.offline:
+        def loader(coin_id, days, currency):
+            return mock_series(coin_id, days, args.seed)
+    else:
+        loader = app.get_historical_data
+    from analytics import series_arrays
+    series = {coin_id: series_arrays(loader(coin_id, args.days, args.currency)) for coin_id in coins}
+
+    result = backtest(series, args.strategy, grid, args.workers)
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    print(f"📈 {args.strategy} over {len(result['coins'])} coins, {result.get('points', 0)} points, "
+          f"{len(grid)} combinations in {result.get('compute_ms', 0):.0f} ms")
+    for run in result['runs'][:10]:
+        print(f"   {run['mean_return_pct']:>8.2f}%  {run['params']}")
+    if result['best']:
+        print(f"🏆 Best {result['best']['params']}")
+        for coin_id, stats in result['best']['coins'].items():
+            print(f"   {coin_id:<20} {stats['return_pct']:>8.2f}%  hold {stats['buy_and_hold_pct']:>8.2f}%  "
+                  f"dd {stats['max_drawdown_pct']:>7.2f}%  sharpe {stats['sharpe']:>6.2f}  trades {stats['trades']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Analytics engine benchmark
+
+Times analytics.compute_analytics on synthetic random-walk series, by
+default 20 coins over a year of hourly data (8760 points each), and
+reports the one-off array conversion, alignment and full-metrics cost
+separately.
+
+Usage:
+    python benchmarks/bench_analytics.py [--coins 20] [--days 365] [--window 24]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import align_series, compute_analytics, series_arrays  # noqa: E402
+
+
+def make_series(coins, days, seed=7):
+    rng = np.random.default_rng(seed)
+    points = days * 24
+    start = int(time.time() * 1000) - points * 3600 * 1000
+    timestamps = start + np.arange(points) * 3600 * 1000
+    series = {}
+    for i in range(coins):
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, points)))
+        series[f'coin-{i}'] = [{'x': int(t), 'y': float(p)} for t, p in zip(timestamps, prices)]
+    return series
+
+
+def best_ms(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--coins', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--window', type=int, default=24)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    series = make_series(args.coins, args.days)
+    convert_ms = best_ms(lambda: {c: series_arrays(p) for c, p in series.items()}, args.repeat)
+    arrays = {coin_id: series_arrays(points) for coin_id, points in series.items()}
+    align_ms = best_ms(lambda: align_series(arrays), args.repeat)
+    total_ms = best_ms(lambda: compute_analytics(arrays, args.window), args.repeat)
+    result = compute_analytics(arrays, args.window)
+
+    print(f"{args.coins} coins x {result['points']} points, window {args.window}")
+    print(f"  to arrays (once per cache fill): {convert_ms:8.2f} ms")
+    print(f"  align:                           {align_ms:8.2f} ms")
+    print(f"  align + all metrics:             {total_ms:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Login benchmark for CryptoPulse
+
+Fires a burst of concurrent /login requests at app.py while a second
+set of threads polls a cheap endpoint, and reports login latency and
+the latency the cheap requests see meanwhile. Run once with hashing
+inline (the old behaviour) and once on the process pool.
+
+Usage:
+    python benchmarks/bench_auth.py [--logins 32] [--threads 8]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import statistics, threading, time
+from concurrent.futures import ThreadPoolExecutor
+t0 = time.perf_counter()
+import app
+import_ms = (time.perf_counter() - t0) * 1000
+
+def login(_):
+    client = app.app.test_client()
+    start = time.perf_counter()
+    client.post('/login', data={{'email': 'demo@user.com', 'password': 'demo123'}})
+    return (time.perf_counter() - start) * 1000
+
+side = []
+done = threading.Event()
+
+def poll():
+    client = app.app.test_client()
+    while not done.is_set():
+        start = time.perf_counter()
+        client.get('/api/currencies')
+        side.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)
+
+login(0)  # warm the pool
+pollers = [threading.Thread(target=poll) for _ in range(2)]
+for t in pollers:
+    t.start()
+with ThreadPoolExecutor({threads}) as pool:
+    latencies = list(pool.map(login, range({logins})))
+done.set()
+for t in pollers:
+    t.join()
+q = statistics.quantiles
+print(import_ms, statistics.median(latencies), q(latencies, n=20)[18],
+      statistics.median(side), q(side, n=20)[18])
+"""
+
+
+def run(workers, logins, threads):
+    env = dict(os.environ, AUTH_WORKERS=str(workers))
+    out = subprocess.run([sys.executable, '-c', SNIPPET.format(logins=logins, threads=threads)],
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return [float(v) for v in out.strip().splitlines()[-1].split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    print(f"{'mode':<14} {'import ms':>10} {'login p50':>10} {'login p95':>10} "
+          f"{'other p50':>10} {'other p95':>10}")
+    for label, workers in (('inline', 0), (f'pool({args.workers})', args.workers)):
+        result = run(workers, args.logins, args.threads)
+        print(f"{label:<14} " + ' '.join(f"{v:>10.1f}" for v in result))
+
+
+if __name__ == '__main__':
+    main()
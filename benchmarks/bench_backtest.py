@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Backtest sweep benchmark
+
+Runs every strategy's default parameter grid over all of app.py's
+tracked_coins (seeded mock series, a year of hourly data by default)
+inline and across the process pool, and reports combinations per second.
+
+Usage:
+    python benchmarks/bench_backtest.py [--days 365] [--workers 4] [--seed 0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+os.environ.setdefault('AUTH_WORKERS', '0')
+
+import backtest  # noqa: E402
+from analytics import series_arrays  # noqa: E402
+from app import tracked_coins  # noqa: E402
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    series = {coin_id: series_arrays(backtest.mock_series(coin_id, args.days, args.seed))
+              for coin_id in tracked_coins}
+    print(f"{len(series)} coins x {args.days * 24} points, {args.workers} workers")
+    print(f"{'strategy':<12} {'combos':>7} {'inline s':>9} {'pool s':>9} {'combos/s':>9}")
+    for strategy in sorted(backtest.STRATEGIES):
+        grid = backtest.parse_grid(strategy, None)
+        inline = timed(lambda: backtest.backtest(series, strategy, grid, workers=0))
+        backtest.backtest(series, strategy, grid[:2], workers=args.workers)  # start the pool
+        pooled = timed(lambda: backtest.backtest(series, strategy, grid, workers=args.workers))
+        print(f"{strategy:<12} {len(grid):>7} {inline:>9.3f} {pooled:>9.3f} {len(grid) / min(inline, pooled):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
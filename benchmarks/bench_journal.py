@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Journal benchmark: trade-path overhead and recovery time
+
+Trade path: times app.apply_trade called directly against
+journal.apply('trade', ...) (handler + WAL append + group commit), with
+and without fsync, from one thread and from several threads at once so
+commits are shared.
+
+Recovery: builds USERS x PER_USER trades in a scratch journal, then times
+app.journal.recover() in a fresh interpreter twice: replaying the whole
+WAL, and loading a snapshot plus a TAIL-record WAL tail.
+
+Usage:
+    python benchmarks/bench_journal.py [--trades 2000] [--threads 8] [--users 1000] [--per-user 50] [--tail 500]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RECOVER_SNIPPET = """
+import json
+import time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+recovered = app.journal.recover()
+t2 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'recover_ms': (t2 - t1) * 1000,
+                  'records': recovered['records'], 'users': len(app.user_portfolios)}))
+"""
+
+
+def trade(i):
+    return {'type': 'buy', 'coin_id': ('bitcoin', 'ethereum', 'solana')[i % 3], 'quantity': 0.001,
+            'price': 100.0, 'amount': 0.1, 'timestamp': f'2024-01-01T00:00:{i % 60:02d}'}
+
+
+def per_trade_us(fn, count, threads=1):
+    """Mean wall time per call, `count` calls spread over `threads` threads"""
+    def run(offset):
+        for i in range(offset, count, threads):
+            fn(i)
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def trade_path(app, args):
+    journal = app.journal
+    journal.snapshot_records = 10 ** 9
+    journal.open()
+    direct = per_trade_us(lambda i: app.apply_trade('bench', trade(i)), args.trades)
+    print(f"apply_trade directly              {direct:>8.1f} us/trade")
+    for fsync in (False, True):
+        journal.fsync = fsync
+        for threads in (1, args.threads):
+            commits, records = journal.commits, journal.committed_records
+            cost = per_trade_us(lambda i: journal.apply('trade', 'bench', trade(i)), args.trades, threads)
+            batch = (journal.committed_records - records) / max(journal.commits - commits, 1)
+            print(f"journaled, fsync={'on ' if fsync else 'off'}, {threads:>2} threads  {cost:>8.1f} us/trade"
+                  f"  ({batch:.1f} records/commit)")
+    journal.close()
+
+
+def build(directory, args, snapshot):
+    """Fill a journal with users x per-user trades, optionally snapshotting before the tail"""
+    env = dict(os.environ, JOURNAL_DIR=directory, JOURNAL_FSYNC='0', MARKET_PLANE='0',
+               JOURNAL_SNAPSHOT_RECORDS=str(10 ** 9), PYTHONDONTWRITEBYTECODE='1')
+    script = f"""
+import sys
+sys.path.insert(0, 'benchmarks')
+import app
+from bench_journal import trade
+app.journal.open()
+total = {args.users} * {args.per_user}
+for i in range(total):
+    app.journal.apply('trade', f'user{{i % {args.users}}}', trade(i))
+    if {snapshot} and i == total - {args.tail} - 1:
+        app.journal.checkpoint(wait=True)
+app.journal.close()
+"""
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+def recover(directory):
+    env = dict(os.environ, JOURNAL_DIR=directory, MARKET_PLANE='0', PYTHONDONTWRITEBYTECODE='1')
+    output = subprocess.run([sys.executable, '-c', RECOVER_SNIPPET], cwd=ROOT, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trades', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--per-user', type=int, default=50)
+    parser.add_argument('--tail', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        os.environ.update(JOURNAL_DIR=os.path.join(scratch, 'trade-path'), MARKET_PLANE='0')
+        import app
+        trade_path(app, args)
+
+        total = args.users * args.per_user
+        print(f"\nrecovery of {total} trades ({args.users} users)")
+        for label, snapshot in (('full WAL replay', False), (f'snapshot + {args.tail} tail', True)):
+            directory = os.path.join(scratch, 'snapshot' if snapshot else 'wal')
+            build(directory, args, snapshot)
+            size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+            result = recover(directory)
+            print(f"{label:<22} {result['recover_ms']:>8.1f} ms  ({result['records']} records replayed, "
+                  f"{size / 1024 / 1024:.1f} MB on disk)")
+
+
+if __name__ == '__main__':
+    main()
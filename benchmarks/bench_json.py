@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+JSON serialization benchmark for DynamoDB-backed responses
+
+Compares the old path (json.dumps with a Decimal default, json.loads,
+then jsonify) with jsonify through DecimalJSONProvider, on raw
+Decimal items and on items already converted by plain_items. The
+one-off cost of the plain_items conversion is reported separately.
+
+Usage:
+    python benchmarks/bench_json.py [--sizes 100 1000 10000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify  # noqa: E402
+
+from dynamo_json import DecimalJSONProvider, plain_items  # noqa: E402
+
+
+def decimal_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+
+def make_transactions(n):
+    return [{
+        'username': 'demo',
+        'transaction_id': str(uuid.uuid4()),
+        'type': 'buy' if i % 2 else 'sell',
+        'coin_id': 'bitcoin',
+        'quantity': Decimal('0.00123456'),
+        'price': Decimal('45123.12'),
+        'amount': Decimal('55.71'),
+        'timestamp': datetime.now().isoformat()
+    } for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    old_app = Flask('old')
+    new_app = Flask('new')
+    new_app.json = DecimalJSONProvider(new_app)
+
+    print(f"{'rows':>8} {'old ms':>10} {'provider ms':>12} {'plain ms':>10} {'convert ms':>11}")
+    for n in args.sizes:
+        items = make_transactions(n)
+        converted = plain_items(items)
+
+        def old_response():
+            with old_app.app_context():
+                jsonify({'transactions': json.loads(json.dumps(items, default=decimal_default))}).get_data()
+
+        def provider_response():
+            with new_app.app_context():
+                jsonify({'transactions': items}).get_data()
+
+        def plain_response():
+            with new_app.app_context():
+                jsonify({'transactions': converted}).get_data()
+
+        def convert():
+            plain_items(items)
+
+        def best(fn):
+            return min(timeit.repeat(fn, number=1, repeat=args.repeat)) * 1000
+
+        print(f"{n:>8} {best(old_response):>10.2f} {best(provider_response):>12.2f} "
+              f"{best(plain_response):>10.2f} {best(convert):>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Page render benchmark for fragment caching
+
+Logs in as each demo user against app.py with a stubbed price feed and
+requests the server-rendered dashboards. Reports the Server-Timing
+render time per page with the fragment cache warm (same snapshot) and
+cold (a new price tick before every request).
+
+Usage:
+    python benchmarks/bench_render.py [--coins 20] [--requests 200]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+os.environ.setdefault('AUTH_WORKERS', '0')
+
+import app as local_app  # noqa: E402
+
+PAGES = [
+    ('demo@user.com', 'demo123', ['/', '/portfolio']),
+    ('analyst@crypto.com', 'demo123', ['/analyst_dashboard']),
+]
+
+
+def fake_prices(coins, currency='usd'):
+    return {coin: {
+        currency: random.uniform(0.1, 50000),
+        f'{currency}_24h_change': random.uniform(-10, 10),
+        f'{currency}_market_cap': random.uniform(1e6, 1e12),
+        f'{currency}_24h_vol': random.uniform(1e5, 1e10),
+    } for coin in coins}
+
+
+def render_ms(client, path):
+    response = client.get(path)
+    assert response.status_code == 200, (path, response.status_code)
+    return float(response.headers['Server-Timing'].split('dur=')[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--coins', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    coins = list(local_app.tracked_coins)
+    coins += [f'coin-{i}' for i in range(max(0, args.coins - len(coins)))]
+    local_app.tracked_coins[:] = coins[:args.coins]
+
+    snapshot = fake_prices(local_app.tracked_coins)
+    local_app.get_crypto_prices = lambda coin_ids, currency='usd', priority='prices': snapshot
+
+    print(f"{'page':<22} {'cold ms':>9} {'warm ms':>9}")
+    for email, password, paths in PAGES:
+        client = local_app.app.test_client()
+        client.post('/login', data={'email': email, 'password': password})
+        for path in paths:
+            cold = []
+            for _ in range(args.requests):
+                snapshot = fake_prices(local_app.tracked_coins)
+                cold.append(render_ms(client, path))
+            warm = [render_ms(client, path) for _ in range(args.requests)]
+            print(f"{path:<22} {statistics.median(cold):>9.3f} {statistics.median(warm):>9.3f}")
+
+    print(local_app.fragment_cache.snapshot())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo VaR benchmark
+
+Fits the return model on seeded random-walk history for a portfolio of
+N coins and times risk.simulate (one process) and risk.simulate_chunked
+(process pool) for the requested path count, reporting 1-day 99% VaR
+against the closed-form normal approximation as a sanity check.
+
+Usage:
+    python benchmarks/bench_risk.py [--coins 20] [--paths 100000] [--days 90]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import risk  # noqa: E402
+from analytics import series_arrays  # noqa: E402
+from backtest import mock_series  # noqa: E402
+
+
+def best_ms(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--coins', type=int, default=20)
+    parser.add_argument('--paths', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=90)
+    args = parser.parse_args()
+
+    series = {f'coin-{i}': series_arrays(mock_series(f'coin-{i}', args.days, 7)) for i in range(args.coins)}
+    model_ms, (coins, mean, covariance) = best_ms(lambda: risk.return_model(series))
+    factor = risk.cholesky(covariance)
+    values = np.full(len(coins), 1000.0)
+
+    inline_ms, pnl = best_ms(lambda: risk.simulate(factor, mean, values, args.paths))
+    risk.RISK_POOL_PATHS = 0
+    risk.simulate_chunked(factor, mean, values, risk.RISK_BATCH)  # start the pool
+    pooled_ms, _ = best_ms(lambda: risk.simulate_chunked(factor, mean, values, args.paths))
+
+    var_99, es_99 = risk.var_es(pnl[:, 0], 0.99)
+    normal_99 = 2.326 * np.sqrt(values @ covariance @ values) - values @ mean
+    print(f"{len(coins)} coins, {args.paths} paths, horizons {risk.HORIZONS}")
+    print(f"return model    {model_ms:>8.2f} ms")
+    print(f"simulate        {inline_ms:>8.2f} ms")
+    print(f"simulate (pool) {pooled_ms:>8.2f} ms  ({risk.RISK_WORKERS} workers)")
+    print(f"1d VaR99 {var_99:.2f}  ES99 {es_99:.2f}  normal approx. VaR99 {normal_99:.2f}")
+
+
+if __name__ == '__main__':
+    main()
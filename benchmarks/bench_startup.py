@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for CryptoPulse
+
+Measures module import time (fresh interpreter per run), first-request
+latency through the Flask test client, and the one-off cost of building
+the AWS clients that are now created lazily.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+t0 = time.perf_counter()
+import {module}
+t1 = time.perf_counter()
+client = {module}.app.test_client()
+client.get('/about')
+t2 = time.perf_counter()
+print((t1 - t0) * 1000, (t2 - t1) * 1000)
+"""
+
+CLIENTS_SNIPPET = """
+import time
+import aws_clients
+t0 = time.perf_counter()
+for name in ('sns', 's3'):
+    aws_clients.get_client(name)
+for table in ('CryptoPulse_Users', 'CryptoPulse_Portfolios',
+              'CryptoPulse_Transactions', 'CryptoPulse_PriceAlerts'):
+    aws_clients.get_table(table)
+t1 = time.perf_counter()
+aws_clients.get_client('sns')
+aws_clients.get_table('CryptoPulse_Users')
+t2 = time.perf_counter()
+print((t1 - t0) * 1000, (t2 - t1) * 1000)
+"""
+
+
+def run_snippet(snippet):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    out = subprocess.run([sys.executable, '-c', snippet], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return [float(v) for v in out.strip().splitlines()[-1].split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':<10} {'import ms':>12} {'first request ms':>18}")
+    for module in ('app', 'app_aws'):
+        samples = [run_snippet(IMPORT_SNIPPET.format(module=module)) for _ in range(args.runs)]
+        import_ms = statistics.median(s[0] for s in samples)
+        request_ms = statistics.median(s[1] for s in samples)
+        print(f"{module:<10} {import_ms:>12.1f} {request_ms:>18.1f}")
+
+    samples = [run_snippet(CLIENTS_SNIPPET) for _ in range(args.runs)]
+    print(f"\nAWS clients, first use:  {statistics.median(s[0] for s in samples):.1f} ms")
+    print(f"AWS clients, cached:     {statistics.median(s[1] for s in samples) * 1000:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
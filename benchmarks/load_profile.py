@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Load profile for serve.py worker modes
+
+Starts `serve.py` once per worker mode, drives it with concurrent
+keep-alive clients for a fixed duration against endpoints that do not
+touch CoinGecko or AWS, and reports requests/second overall and per
+worker process (one worker per core).
+
+Usage:
+    python benchmarks/load_profile.py [--modes sync threaded gevent]
+                                      [--workers 2] [--clients 32] [--duration 10]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Mix of cheap JSON and server-rendered pages
+PROFILE = ['/api/currencies', '/about', '/login', '/api/fear_greed']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def drive(port, clients, duration):
+    counts = [0] * clients
+    errors = [0] * clients
+    stop = time.time() + duration
+
+    def worker(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        n = 0
+        while time.time() < stop:
+            path = PROFILE[n % len(PROFILE)]
+            n += 1
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status < 500:
+                    counts[i] += 1
+                else:
+                    errors[i] += 1
+            except (OSError, http.client.HTTPException):
+                errors[i] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts), sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--app', choices=['local', 'aws'], default='local')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'threaded', 'gevent'])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ, RATE_LIMIT_ENABLED='0', AUTH_WORKERS='0')
+    print(f"{'mode':<10} {'workers':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'req/s/core':>11}")
+    for mode in args.modes:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, 'serve.py', '--app', args.app, '--mode', mode,
+             '--workers', str(args.workers), '--threads', str(args.threads),
+             '--bind', f'127.0.0.1:{port}'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for(port) or server.poll() is not None:
+                print(f"{mode:<10} failed to start (is its worker class installed?)")
+                continue
+            drive(port, args.clients, 1)  # warm-up
+            ok, errors = drive(port, args.clients, args.duration)
+            rps = ok / args.duration
+            print(f"{mode:<10} {args.workers:>8} {ok:>9} {errors:>7} {rps:>9.0f} {rps / args.workers:>11.0f}")
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+In-process TTL cache for upstream market data
+
+Values are stored with the time they were fetched. get_or_load() is
+single-flight: when several threads miss the same key at once, one of
+them calls the loader and the others wait for its result instead of
+all hitting CoinGecko.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-call TTL"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> threading.Lock held by the loader
+
+    def entry(self, key):
+        """(value, stored_at) for key regardless of age, or None"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def get(self, key, ttl):
+        """Value for key if it is younger than ttl seconds, else None"""
+        entry = self.entry(key)
+        if entry is not None and time.time() - entry[1] < ttl:
+            return entry[0]
+        return None
+
+    def set(self, key, value, stored_at=None):
+        with self._lock:
+            self._entries[key] = (value, stored_at or time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def get_or_load(self, key, ttl, loader):
+        """Return a fresh cached value or call loader() once to refresh it"""
+        value = self.get(key, ttl)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another thread may have refreshed it while we waited
+            value = self.get(key, ttl)
+            if value is not None:
+                return value
+            try:
+                value = loader()
+                # Empty results usually mean an upstream failure; retry next time
+                if value:
+                    self.set(key, value)
+                return value
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,91 @@
+"""
+Aggregated dashboard bundle for CryptoPulse
+
+Pages used to hydrate with one fetch per widget (market stats, trending,
+fear/greed, prices, history), each paying its own round trip, session
+decode and upstream call. /api/dashboard_bundle takes the list of
+widgets a page needs, resolves them concurrently through the shared
+TTL cache and returns one JSON document, compressed by http_cache like
+the other JSON APIs.
+
+Widgets are named "name" or "name:arg1:arg2", e.g. "historical:bitcoin:7".
+Each app registers its resolvers as {name: (ttl_seconds, fn)} where
+fn(currency, *args) returns JSON-serializable data.
+"""
+
+import json
+
+from flask import current_app
+
+import upstream
+from cache import TTLCache
+
+MAX_WIDGETS = 12
+
+# Chart ranges a "historical" widget may ask for; others round up to the next one
+HISTORY_DAYS = (1, 7, 30, 90, 365)
+
+# Shared by every bundle request in the process
+bundle_cache = TTLCache(max_entries=2048)
+
+
+def parse_widgets(raw):
+    """'prices,historical:bitcoin:7' or a JSON list -> [(spec, name, args)]"""
+    if isinstance(raw, str):
+        raw = raw.split(',')
+    widgets = []
+    for spec in raw or []:
+        spec = str(spec).strip()
+        if not spec or any(spec == existing[0] for existing in widgets):
+            continue
+        name, *args = spec.split(':')
+        widgets.append((spec, name, args))
+    return widgets[:MAX_WIDGETS]
+
+
+def history_days(raw):
+    """A widget's days argument as an allowed range (the smallest covering it, at most the largest)"""
+    days = int(raw)
+    return next((allowed for allowed in HISTORY_DAYS if allowed >= days), HISTORY_DAYS[-1])
+
+
+def _resolve_one(resolvers, currency, name, args):
+    ttl, fn = resolvers[name]
+    key = (name, currency, *args)
+    return bundle_cache.get_or_load(key, ttl, lambda: fn(currency, *args))
+
+
+async def resolve_bundle(widgets, resolvers, currency):
+    """
+    Resolve widgets concurrently
+
+    A resolver returning None (no upstream data) is reported as an error
+    rather than an empty widget; get_or_load never caches it.
+
+    Returns:
+        tuple: ({spec: data}, {spec: error message})
+    """
+    data = {}
+    errors = {}
+    calls = {}
+    for spec, name, args in widgets:
+        if name not in resolvers:
+            errors[spec] = 'Unknown widget'
+            continue
+        calls[spec] = upstream.run_async(_resolve_one, resolvers, currency, name, args)
+
+    for spec, result in (await upstream.gather(**calls)).items():
+        if isinstance(result, Exception):
+            print(f"Error resolving widget {spec}: {result}")
+            errors[spec] = 'Failed to load'
+        elif result is None:
+            errors[spec] = 'No data'
+        else:
+            data[spec] = result
+    return data, errors
+
+
+def bundle_response(payload):
+    """Serialize the bundle once (http_cache negotiates and applies compression)"""
+    body = json.dumps(payload, separators=(',', ':'), default=current_app.json.default).encode('utf-8')
+    return current_app.response_class(body, mimetype='application/json')
@@ -0,0 +1,61 @@
+"""
+DynamoDB <-> JSON helpers for CryptoPulse
+
+boto3 returns every number as decimal.Decimal. Instead of converting
+values with float(...) all over the route code, items are converted
+once where they leave the data-access layer (plain_item), and the
+Flask JSON provider encodes any Decimal that still reaches jsonify
+directly, so responses are serialized exactly once.
+"""
+
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+
+def plain_item(item):
+    """Convert a DynamoDB item (nested maps/lists included) to plain floats in one pass"""
+    cls = item.__class__
+    if cls is dict:
+        converted = {}
+        for key, value in item.items():
+            value_cls = value.__class__
+            if value_cls is Decimal:
+                converted[key] = float(value)
+            elif value_cls is dict or value_cls is list:
+                converted[key] = plain_item(value)
+            else:
+                converted[key] = value
+        return converted
+    if cls is list:
+        return [plain_item(value) for value in item]
+    if cls is Decimal:
+        return float(item)
+    return item
+
+
+def plain_items(items):
+    """Convert a list of DynamoDB items"""
+    return [plain_item(item) for item in items]
+
+
+def dynamo_value(value):
+    """Convert floats (nested maps/lists included) to Decimal for writing to DynamoDB"""
+    cls = value.__class__
+    if cls is float:
+        return Decimal(str(value))
+    if cls is dict:
+        return {key: dynamo_value(item) for key, item in value.items()}
+    if cls is list:
+        return [dynamo_value(item) for item in value]
+    return value
+
+
+class DecimalJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes Decimal as a JSON number instead of a string"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Decimal):
+            return float(o)
+        return DefaultJSONProvider.default(o)
@@ -0,0 +1,116 @@
+"""
+Fragment caching for server-rendered market sections
+
+The dashboard pages embed the same market sections (the tracked-coin
+price table, top movers, coin pickers) for every user; only the small
+per-user parts (balance, holdings) differ. Templates render those shared
+sections through the `market_fragment()` global:
+
+    {{ market_fragment('fragments/home_price_rows.html') }}
+
+A fragment is rendered once per (template, currency) and reused for as
+long as the snapshot version - a digest of tracked_coins and the price
+data - is unchanged. A price tick or an edit of tracked_coins changes
+the version, so the next page render replaces the stale fragment.
+
+Page render times are recorded from Flask's template signals, returned
+in a Server-Timing header and aggregated in FragmentCache.snapshot().
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from flask import before_render_template, g, template_rendered
+from jinja2 import pass_context
+from markupsafe import Markup
+
+from cache import TTLCache
+
+
+def snapshot_version(tracked_coins, prices=None):
+    """Digest identifying one (tracked coins, prices) snapshot"""
+    payload = json.dumps([list(tracked_coins), prices], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
+
+
+class FragmentCache:
+    """Rendered-fragment cache plus per-page render timing for a Flask app"""
+
+    def __init__(self, app=None, max_entries=256):
+        self.fragments = TTLCache(max_entries=max_entries)  # (template, currency) -> (version, html)
+        self.hits = 0
+        self.misses = 0
+        self.page_timings = {}  # template -> [renders, total_ms, max_ms]
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.add_template_global(self.market_fragment, 'market_fragment')
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        app.after_request(self._after_request)
+        app.extensions['fragment_cache'] = self
+
+    def invalidate(self):
+        """Drop every cached fragment (e.g. after tracked_coins changes)"""
+        self.fragments.invalidate()
+
+    def render(self, template_name, currency, version, render):
+        """Cached HTML for a fragment, calling render() only on a version change"""
+        key = (template_name, currency)
+        entry = self.fragments.entry(key)
+        if entry is not None and entry[0][0] == version:
+            self.hits += 1
+            return entry[0][1]
+        self.misses += 1
+        html = Markup(render())
+        self.fragments.set(key, (version, html))
+        return html
+
+    @pass_context
+    def market_fragment(self, context, template_name, uses_prices=True):
+        """
+        Template global rendering a shared market section from the page context
+
+        Args:
+            template_name: Fragment template; it sees the full page context
+            uses_prices: False for fragments that only depend on tracked_coins
+        """
+        prices = context.get('prices') if uses_prices else None
+        version = snapshot_version(context.get('tracked_coins', []), prices)
+        template = context.environment.get_template(template_name)
+        return self.render(template_name, context.get('currency', 'usd'), version,
+                           lambda: template.render(context.get_all()))
+
+    def _render_started(self, sender, template, context, **extra):
+        g.setdefault('render_started', {})[template.name] = time.perf_counter()
+
+    def _render_finished(self, sender, template, context, **extra):
+        started = g.get('render_started', {}).pop(template.name, None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        g.render_ms = g.get('render_ms', 0.0) + elapsed_ms
+        with self._lock:
+            timing = self.page_timings.setdefault(template.name, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += elapsed_ms
+            timing[2] = max(timing[2], elapsed_ms)
+
+    def _after_request(self, response):
+        render_ms = g.pop('render_ms', None)
+        if render_ms is not None:
+            response.headers['Server-Timing'] = f'render;dur={render_ms:.2f}'
+        return response
+
+    def snapshot(self):
+        """Hit rate and average/max render time per page template"""
+        with self._lock:
+            pages = {
+                name: {'renders': count, 'avg_ms': round(total / count, 2), 'max_ms': round(worst, 2)}
+                for name, (count, total, worst) in self.page_timings.items()
+            }
+        return {'fragments': len(self.fragments), 'hits': self.hits, 'misses': self.misses, 'pages': pages}
@@ -0,0 +1,119 @@
+"""
+FX conversion for historical market data
+
+Historical charts are fetched once per (coin, days) in USD and kept as
+NumPy arrays; any supported currency is produced at response time by
+multiplying the price (and market cap / volume) columns by one rate.
+Switching currency therefore costs a vectorized multiply, not another
+/market_chart download.
+
+Rates come from a single CoinGecko /exchange_rates call (BTC-based
+rates for every currency, rebased to USD here), cached for RATES_TTL.
+When that call fails the last good rates (FALLBACK_RATES before any
+succeeded) are served and the call is retried after FX_RATES_RETRY, so
+an outage costs one upstream call per interval. Historical points are
+converted at the current rate.
+
+Environment:
+    FX_RATES_TTL   seconds between rate refreshes (default 600)
+    FX_RATES_RETRY seconds before retrying a failed refresh (default 60)
+    HISTORY_TTL    seconds a USD chart stays cached (default 300)
+"""
+
+import os
+import time
+
+import numpy as np
+
+import upstream
+from cache import TTLCache
+
+BASE_CURRENCY = 'usd'
+RATES_TTL = int(os.environ.get('FX_RATES_TTL', 600))
+RATES_RETRY = min(int(os.environ.get('FX_RATES_RETRY', 60)), RATES_TTL)
+HISTORY_TTL = int(os.environ.get('HISTORY_TTL', 300))
+
+# Approximate USD rates, used when /exchange_rates is unavailable
+FALLBACK_RATES = {
+    'usd': 1,
+    'eur': 0.85,
+    'gbp': 0.73,
+    'jpy': 110,
+    'cad': 1.25,
+    'aud': 1.35,
+    'chf': 0.92,
+    'cny': 6.45,
+    'inr': 74,
+    'krw': 1180
+}
+
+CHART_SERIES = ('prices', 'market_caps', 'total_volumes')
+
+rate_cache = TTLCache(max_entries=4)
+chart_cache = TTLCache(max_entries=1024)
+
+
+def _load_rates():
+    try:
+        data = upstream.fetch_json('/exchange_rates')
+        table = data['rates']
+        usd = float(table[BASE_CURRENCY]['value'])
+        return {code: float(entry['value']) / usd for code, entry in table.items()}
+    except Exception as e:
+        print(f"Error fetching exchange rates: {e}")
+        # Cached as if stored RATES_RETRY before expiry, so the next attempt waits that long
+        previous = rate_cache.entry('rates')
+        rate_cache.set('rates', previous[0] if previous else FALLBACK_RATES,
+                       stored_at=time.time() - RATES_TTL + RATES_RETRY)
+        return None
+
+
+def rates():
+    """{currency: units per USD}, refreshed from one upstream call"""
+    return rate_cache.get_or_load('rates', RATES_TTL, _load_rates) or (rate_cache.entry('rates') or (FALLBACK_RATES,))[0]
+
+
+def rate(currency):
+    """Units of `currency` per USD (1 for unknown currencies)"""
+    if currency == BASE_CURRENCY:
+        return 1.0
+    return rates().get(currency, FALLBACK_RATES.get(currency, 1.0))
+
+
+def usd_chart(coin_id, days, fetch, interval=None):
+    """
+    Cached USD /market_chart data as arrays
+
+    Args:
+        fetch: fn() -> CoinGecko market_chart dict in USD, or None on failure
+               (failures are not cached)
+
+    Returns:
+        dict: {'prices' | 'market_caps' | 'total_volumes': ndarray[n, 2]}, or None
+    """
+    def load():
+        data = fetch()
+        if not data or not data.get('prices'):
+            return None
+        return {name: np.asarray(data.get(name) or [], dtype=np.float64).reshape(-1, 2)
+                for name in CHART_SERIES}
+    return chart_cache.get_or_load((coin_id, days, interval), HISTORY_TTL, load)
+
+
+def chart_points(chart, currency):
+    """Price column as Chart.js points [{'x': ms, 'y': price}] in `currency`"""
+    prices = chart['prices']
+    timestamps = prices[:, 0].astype(np.int64).tolist()
+    values = np.round(prices[:, 1] * rate(currency), 6).tolist()
+    return [{'x': x, 'y': y} for x, y in zip(timestamps, values)]
+
+
+def chart_json(chart, currency):
+    """The chart in CoinGecko's market_chart shape ([[ms, value], ...] lists) in `currency`"""
+    multiplier = rate(currency)
+    converted = {}
+    for name, series in chart.items():
+        values = series.copy()
+        values[:, 1] *= multiplier
+        converted[name] = [[int(t), v] for t, v in values.tolist()]
+    return converted
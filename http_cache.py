@@ -0,0 +1,184 @@
+"""
+HTTP caching and compression for CryptoPulse JSON APIs
+
+For the public market-data endpoints (prices, historical charts,
+currencies, market stats, trending, screener) every 200 GET response gets:
+
+- a strong ETag: a digest of the serialized snapshot, so it changes
+  exactly when the underlying data does (JSON keys are sorted, so equal
+  snapshots serialize to equal bytes)
+- a 304 Not Modified when If-None-Match already names that version
+- Cache-Control: public, max-age=<per endpoint>
+- brotli (if installed) or gzip compression for bodies over
+  COMPRESS_MIN_BYTES, negotiated from Accept-Encoding
+
+Compressed bodies are cached per (snapshot version, encoding), so a
+snapshot is compressed once no matter how many clients fetch it.
+
+COMPRESS_ONLY_ENDPOINTS (the dashboard bundle) get the same negotiated
+compression for any method, without validators or Cache-Control; their
+bodies are per request, so the compressed bytes are not cached.
+
+Environment:
+    HTTP_CACHE_ENABLED   1/0 (default 1)
+"""
+
+import gzip
+import hashlib
+import os
+
+from flask import request, session
+
+from cache import TTLCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# endpoint -> Cache-Control max-age in seconds
+CACHEABLE_ENDPOINTS = {
+    'api_prices': 15,
+    'api_historical': 60,
+    'api_currencies': 3600,
+    'market_stats': 60,
+    'trending': 300,
+    'api_screener': 15,
+}
+
+# Compressed for GET and POST alike, never validated or cached
+COMPRESS_ONLY_ENDPOINTS = {'dashboard_bundle'}
+
+COMPRESS_MIN_BYTES = 1024
+COMPRESSED_TTL = 3600
+
+ENCODING_SUFFIXES = {'br': 'br', 'gzip': 'gz'}
+
+
+def accepted_encodings(header):
+    """Encodings the client accepts (q > 0) from an Accept-Encoding header"""
+    accepted = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+def pick_encoding(header):
+    """Best encoding we can produce for this client, or None for identity"""
+    accepted = accepted_encodings(header)
+    if brotli is not None and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _if_none_match_versions(header):
+    """Snapshot versions named by If-None-Match (weak or strong, any encoding)"""
+    versions = set()
+    for tag in (header or '').split(','):
+        tag = tag.strip()
+        if tag == '*':
+            versions.add('*')
+            continue
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        versions.add(tag.split('-', 1)[0])
+    return versions
+
+
+class HttpCache:
+    """Flask after_request hook adding validators, 304s and cached compression"""
+
+    def __init__(self, app=None, endpoints=None, compress_only=None, min_bytes=COMPRESS_MIN_BYTES):
+        self.enabled = os.environ.get('HTTP_CACHE_ENABLED', '1') != '0'
+        self.endpoints = dict(CACHEABLE_ENDPOINTS, **(endpoints or {}))
+        self.compress_only = set(COMPRESS_ONLY_ENDPOINTS) | set(compress_only or ())
+        self.min_bytes = min_bytes
+        self.compressed = TTLCache(max_entries=512)
+        self.stats = {'not_modified': 0, 'compressed': 0, 'compress_cache_hits': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self._after_request)
+        app.extensions['http_cache'] = self
+
+    def compressed_body(self, version, encoding, body):
+        """Compressed bytes for a snapshot, compressing at most once per encoding"""
+        key = (version, encoding)
+        data = self.compressed.get(key, COMPRESSED_TTL)
+        if data is not None:
+            self.stats['compress_cache_hits'] += 1
+            return data
+        data = compress(body, encoding)
+        self.compressed.set(key, data)
+        self.stats['compressed'] += 1
+        return data
+
+    def _compress_only(self, response):
+        if response.status_code != 200 or response.is_streamed or 'Content-Encoding' in response.headers:
+            return response
+        body = response.get_data()
+        response.vary.add('Accept-Encoding')
+        encoding = pick_encoding(request.headers.get('Accept-Encoding')) if len(body) >= self.min_bytes else None
+        if encoding:
+            response.set_data(compress(body, encoding))
+            response.headers['Content-Encoding'] = encoding
+            self.stats['compressed'] += 1
+        return response
+
+    def _after_request(self, response):
+        if not self.enabled:
+            return response
+        if request.endpoint in self.compress_only:
+            return self._compress_only(response)
+        if request.method not in ('GET', 'HEAD'):
+            return response
+        max_age = self.endpoints.get(request.endpoint)
+        if max_age is None or response.status_code != 200 or response.is_streamed:
+            return response
+        if response.mimetype != 'application/json' or 'Content-Encoding' in response.headers:
+            return response
+
+        body = response.get_data()
+        version = hashlib.blake2b(body, digest_size=12).hexdigest()
+        encoding = pick_encoding(request.headers.get('Accept-Encoding')) if len(body) >= self.min_bytes else None
+        etag = f'"{version}-{ENCODING_SUFFIXES[encoding]}"' if encoding else f'"{version}"'
+
+        # Never let shared caches store a response that will set a session cookie
+        scope = 'private' if session.modified else 'public'
+        response.headers['Cache-Control'] = f'{scope}, max-age={max_age}'
+        response.headers['ETag'] = etag
+        response.vary.add('Accept-Encoding')
+
+        wanted = _if_none_match_versions(request.headers.get('If-None-Match'))
+        if version in wanted or '*' in wanted:
+            self.stats['not_modified'] += 1
+            response.status_code = 304
+            response.set_data(b'')
+            response.headers.pop('Content-Type', None)
+            return response
+
+        if encoding:
+            response.set_data(self.compressed_body(version, encoding, body))
+            response.headers['Content-Encoding'] = encoding
+        return response
@@ -2,14 +2,43 @@
 """
 Initialize Admin User for CryptoPulse AWS
 This script creates the first admin user in DynamoDB
+
+Bulk mode (non-interactive) seeds many users with portfolios and
+synthetic trade history for staging and load tests:
+
+    python init_admin.py --bulk --generate 20000 --trades-per-user 10
+    python init_admin.py --bulk --csv users.csv --workers 8 --segments 8
+
+CSV columns: username,password[,email][,role]
 """
 
+import argparse
+import csv
+import functools
+import random
+import time
+import uuid
 import boto3
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from decimal import Decimal
 from werkzeug.security import generate_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
 from botocore.exceptions import ClientError
 
+from aws_clients import ENDPOINT_URLS, get_config
+
+# Coins used for synthetic portfolios and trades
+SEED_COINS = [
+    'bitcoin', 'ethereum', 'solana', 'cardano', 'polkadot', 'chainlink',
+    'litecoin', 'bitcoin-cash', 'stellar', 'dogecoin', 'ripple', 'avalanche-2'
+]
+SEED_PRICES = {
+    'bitcoin': 45000, 'ethereum': 3000, 'solana': 100, 'cardano': 0.5,
+    'polkadot': 25, 'chainlink': 15, 'litecoin': 150, 'bitcoin-cash': 300,
+    'stellar': 0.12, 'dogecoin': 0.08, 'ripple': 0.6, 'avalanche-2': 35
+}
+
 def create_admin_user():
     """Create initial admin user in DynamoDB"""
     
@@ -116,9 +145,234 @@ def verify_aws_setup():
         print(f"❌ Error: {e}")
         return False
 
+def load_users_csv(path):
+    """Read users from a CSV file with username,password[,email][,role] columns"""
+    users = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            username = (row.get('username') or '').strip()
+            password = row.get('password') or ''
+            if not username or not password:
+                continue
+            users.append({
+                'username': username,
+                'password': password,
+                'email': (row.get('email') or '').strip(),
+                'role': (row.get('role') or 'user').strip()
+            })
+    return users
+
+def generate_users(count, prefix='loadtest', password='demo123'):
+    """Generate synthetic users named <prefix>00001, <prefix>00002, ..."""
+    width = max(5, len(str(count)))
+    return [{
+        'username': f"{prefix}{i:0{width}d}",
+        'password': password,
+        'email': f"{prefix}{i:0{width}d}@example.com",
+        'role': 'user'
+    } for i in range(1, count + 1)]
+
+def hash_passwords(users, workers=None, method=None):
+    """
+    Hash every user's password across a process pool
+
+    generate_password_hash is deliberately slow, so this is the dominant
+    cost of seeding; it scales with the number of cores. `method` is passed
+    through to Werkzeug (e.g. 'pbkdf2:sha256:50000' for throwaway load-test
+    accounts); None keeps Werkzeug's default.
+    """
+    passwords = [user['password'] for user in users]
+    hasher = functools.partial(generate_password_hash, method=method) if method else generate_password_hash
+    chunksize = max(1, len(passwords) // ((workers or os.cpu_count() or 1) * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashed = list(pool.map(hasher, passwords, chunksize=chunksize))
+    for user, password_hash in zip(users, hashed):
+        user['password'] = password_hash
+    return users
+
+def synthetic_portfolio(rng, trades_per_user, now):
+    """Build a random portfolio and a matching trade history for one user"""
+    balance = 10000.0
+    holdings = {}
+    trades = []
+    start = now - timedelta(days=365)
+    # Distinct, increasing timestamps keep the (username, timestamp) key unique
+    offsets = sorted(rng.sample(range(365 * 24 * 3600), trades_per_user))
+
+    for offset in offsets:
+        coin_id = rng.choice(SEED_COINS)
+        price = SEED_PRICES[coin_id] * rng.uniform(0.7, 1.3)
+        held = holdings.get(coin_id, 0.0)
+        if held > 0 and rng.random() < 0.35:
+            quantity = held * rng.uniform(0.1, 1.0)
+            amount = quantity * price
+            holdings[coin_id] = held - quantity
+            if holdings[coin_id] <= 0:
+                del holdings[coin_id]
+            balance += amount
+            trade_type = 'sell'
+        else:
+            amount = min(balance, rng.uniform(10, 500))
+            if amount <= 0:
+                continue
+            quantity = amount / price
+            holdings[coin_id] = held + quantity
+            balance -= amount
+            trade_type = 'buy'
+
+        trades.append({
+            'transaction_id': str(uuid.uuid4()),
+            'type': trade_type,
+            'coin_id': coin_id,
+            'quantity': Decimal(str(round(quantity, 8))),
+            'price': Decimal(str(round(price, 6))),
+            'amount': Decimal(str(round(amount, 2))),
+            'timestamp': (start + timedelta(seconds=offset)).isoformat()
+        })
+
+    holdings = {k: Decimal(str(round(v, 8))) for k, v in holdings.items()}
+    return Decimal(str(round(balance, 2))), holdings, trades
+
+def write_segment(segment, region, tables, trades_per_user, seed):
+    """Write one segment of users through its own batch writers; returns item count"""
+    # boto3 resources are not thread-safe, so each segment gets its own session
+    session = boto3.session.Session()
+    dynamodb = session.resource('dynamodb', region_name=region, config=get_config(),
+                                endpoint_url=ENDPOINT_URLS.get('dynamodb'))
+    users_table = dynamodb.Table(tables['users'])
+    portfolios_table = dynamodb.Table(tables['portfolios'])
+    transactions_table = dynamodb.Table(tables['transactions'])
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    created_at = now.isoformat()
+    written = 0
+
+    with users_table.batch_writer(overwrite_by_pkeys=['username']) as users_batch, \
+         portfolios_table.batch_writer(overwrite_by_pkeys=['username']) as portfolios_batch, \
+         transactions_table.batch_writer(overwrite_by_pkeys=['username', 'timestamp']) as transactions_batch:
+        for user in segment:
+            users_batch.put_item(Item={
+                'username': user['username'],
+                'password': user['password'],
+                'email': user['email'],
+                'role': user['role'],
+                'created_at': created_at
+            })
+            written += 1
+
+            if user['role'] == 'admin':
+                continue
+
+            balance, holdings, trades = synthetic_portfolio(rng, trades_per_user, now)
+            portfolios_batch.put_item(Item={
+                'username': user['username'],
+                'balance': balance,
+                'holdings': holdings,
+                'created_at': created_at
+            })
+            written += 1
+
+            for trade in trades:
+                trade['username'] = user['username']
+                transactions_batch.put_item(Item=trade)
+            written += len(trades)
+
+    return written
+
+def bulk_seed(users, workers=None, segments=8, trades_per_user=0, seed=None, hash_method=None):
+    """
+    Hash passwords in parallel and write users, portfolios and trades in parallel segments
+
+    Returns:
+        dict: Counts, timings and throughput for each phase
+    """
+    region = os.environ.get('AWS_REGION', 'us-east-1')
+    tables = {
+        'users': os.environ.get('USERS_TABLE', 'CryptoPulse_Users'),
+        'portfolios': os.environ.get('PORTFOLIOS_TABLE', 'CryptoPulse_Portfolios'),
+        'transactions': os.environ.get('TRANSACTIONS_TABLE', 'CryptoPulse_Transactions')
+    }
+    seed = seed if seed is not None else random.randrange(2 ** 32)
+
+    started = time.perf_counter()
+    hash_passwords(users, workers, hash_method)
+    hash_seconds = time.perf_counter() - started
+    print(f"🔑 Hashed {len(users)} passwords in {hash_seconds:.1f}s "
+          f"({len(users) / hash_seconds:.0f}/s)")
+
+    segments = max(1, min(segments, len(users)))
+    size = -(-len(users) // segments)
+    chunks = [users[i:i + size] for i in range(0, len(users), size)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        counts = list(pool.map(
+            lambda args: write_segment(args[1], region, tables, trades_per_user, seed + args[0]),
+            enumerate(chunks)
+        ))
+    write_seconds = time.perf_counter() - started
+    items = sum(counts)
+    print(f"💾 Wrote {items} items in {write_seconds:.1f}s "
+          f"({items / write_seconds:.0f} items/s, {len(chunks)} segments)")
+
+    return {
+        'users': len(users),
+        'items': items,
+        'hash_seconds': hash_seconds,
+        'write_seconds': write_seconds,
+        'hashes_per_second': len(users) / hash_seconds,
+        'items_per_second': items / write_seconds
+    }
+
+def run_bulk(args):
+    """Non-interactive bulk seeding entry point"""
+    print("🚀 CryptoPulse Bulk User Seeding")
+    print("=" * 50)
+
+    if args.csv:
+        users = load_users_csv(args.csv)
+        print(f"📄 Loaded {len(users)} users from {args.csv}")
+    else:
+        users = generate_users(args.generate, args.prefix, args.password)
+        print(f"🧪 Generated {len(users)} users ({args.prefix}*)")
+
+    if not users:
+        print("❌ No users to seed")
+        return
+
+    try:
+        summary = bulk_seed(users, workers=args.workers, segments=args.segments,
+                            trades_per_user=args.trades_per_user, seed=args.seed,
+                            hash_method=args.hash_method)
+    except ClientError as e:
+        print(f"❌ AWS Error: {e}")
+        return
+
+    total = summary['hash_seconds'] + summary['write_seconds']
+    print(f"\n🎉 Seeded {summary['users']} users ({summary['items']} items) in {total:.1f}s "
+          f"— {summary['users'] / total:.0f} users/s end to end")
+
 def main():
     """Main function"""
     
+    parser = argparse.ArgumentParser(description='Initialize CryptoPulse users in DynamoDB')
+    parser.add_argument('--bulk', action='store_true', help='Non-interactive bulk seeding')
+    parser.add_argument('--csv', help='CSV file with username,password[,email][,role]')
+    parser.add_argument('--generate', type=int, default=1000, help='Number of users to generate')
+    parser.add_argument('--prefix', default='loadtest', help='Username prefix for generated users')
+    parser.add_argument('--password', default='demo123', help='Password for generated users')
+    parser.add_argument('--trades-per-user', type=int, default=0, help='Synthetic trades per user')
+    parser.add_argument('--workers', type=int, default=None, help='Password hashing processes')
+    parser.add_argument('--segments', type=int, default=8, help='Parallel write segments')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for synthetic data')
+    parser.add_argument('--hash-method', default=None, help="Werkzeug hash method, e.g. 'pbkdf2:sha256:50000'")
+    args = parser.parse_args()
+    
+    if args.bulk:
+        run_bulk(args)
+        return
+    
     print("🚀 CryptoPulse AWS Admin Initialization")
     print("=" * 50)
     
@@ -0,0 +1,444 @@
+"""
+Write-ahead log and snapshot checkpoints for app.py's in-memory state
+
+Every mutation goes through Journal.apply(op, *args): the registered
+handler changes the in-memory state and the (op, args) record is
+appended to the write-ahead log under the same lock, so the log order is
+the order the state saw. apply() returns once the record is durable.
+If a write or fsync fails, every request whose record was not yet
+durable gets JournalError and the journal refuses further mutations
+until restart: memory may hold changes the log does not, and the next
+recovery rolls them back.
+Changes that are not logged because replay re-derives them (defaults
+created on first use) take locked() so a snapshot never sees them half
+done.
+Concurrent requests share one write + fsync (group commit): the first
+waiter flushes everything appended so far, the others wait for it.
+
+    wal-<first lsn>.log       records: length, crc32, lsn, pickled (op, args)
+    snapshot-<lsn>.bin        magic, lsn, crc32, pickled state
+
+After JOURNAL_SNAPSHOT_RECORDS records the state is captured and a new
+WAL segment started (under the lock); the snapshot is written in the
+background and older segments and snapshots are deleted once it is on
+disk. Startup loads the newest valid snapshot and replays only the WAL
+records after it through the same handlers; a torn record at the end of
+the log (crash mid-write) is dropped.
+
+recover() only reads, so serve.py can run it in the preloading master.
+open() takes an exclusive lock on the directory, so one process owns the
+log; others apply mutations without journaling them (app.py keeps state
+per process, so run it with one worker when durability matters).
+
+Environment:
+    JOURNAL                   1/0 (default 1)
+    JOURNAL_DIR               directory for the log and snapshots (default ./data)
+    JOURNAL_FSYNC             1/0, fsync each group commit (default 1)
+    JOURNAL_GROUP_WINDOW_MS   how long a flushing request waits for others to join (default 0)
+    JOURNAL_SNAPSHOT_RECORDS  records between snapshots (default 10000)
+"""
+
+import fcntl
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+JOURNAL = os.environ.get('JOURNAL', '1') != '0'
+JOURNAL_DIR = os.environ.get('JOURNAL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+JOURNAL_FSYNC = os.environ.get('JOURNAL_FSYNC', '1') != '0'
+JOURNAL_GROUP_WINDOW = float(os.environ.get('JOURNAL_GROUP_WINDOW_MS', 0)) / 1000
+JOURNAL_SNAPSHOT_RECORDS = int(os.environ.get('JOURNAL_SNAPSHOT_RECORDS', 10000))
+
+RECORD = struct.Struct('<IIQ')  # payload length, crc32, lsn
+SNAPSHOT = struct.Struct('<8sQI')  # magic, lsn, crc32
+SNAPSHOT_MAGIC = b'CPSNAP01'
+PICKLE_PROTOCOL = pickle.HIGHEST_PROTOCOL
+
+
+class JournalError(RuntimeError):
+    """A record could not be made durable; the journal is failed until restart"""
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _segment_name(lsn):
+    return f'wal-{lsn:016d}.log'
+
+
+def _snapshot_name(lsn):
+    return f'snapshot-{lsn:016d}.bin'
+
+
+def _numbered(directory, prefix, suffix):
+    """[(number, path)] of files like <prefix><number><suffix>, ascending"""
+    found = []
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(suffix):
+            try:
+                found.append((int(name[len(prefix):-len(suffix)]), os.path.join(directory, name)))
+            except ValueError:
+                continue
+    return sorted(found)
+
+
+def read_records(path):
+    """
+    Yield (lsn, op, args, end_offset) from one WAL segment
+
+    Stops at the first incomplete or corrupt record.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        length, crc, lsn = RECORD.unpack_from(data, offset)
+        start = offset + RECORD.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        op, args = pickle.loads(payload)
+        offset = start + length
+        yield lsn, op, args, offset
+
+
+def read_snapshot(path):
+    """(lsn, state) from a snapshot file, or None if it is damaged"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < SNAPSHOT.size:
+        return None
+    magic, lsn, crc = SNAPSHOT.unpack_from(data, 0)
+    payload = data[SNAPSHOT.size:]
+    if magic != SNAPSHOT_MAGIC or zlib.crc32(payload) != crc:
+        return None
+    return lsn, pickle.loads(payload)
+
+
+def _fsync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """Group-committed write-ahead log plus snapshots for a Flask app's state"""
+
+    def __init__(self, app=None, capture=None, restore=None, directory=JOURNAL_DIR, enabled=JOURNAL,
+                 fsync=JOURNAL_FSYNC, snapshot_records=JOURNAL_SNAPSHOT_RECORDS):
+        """
+        Args:
+            capture: fn() -> the whole state as picklable objects (pickled under the lock)
+            restore: fn(state) replacing the whole state with a snapshot's
+        """
+        self.capture = capture
+        self.restore = restore
+        self.directory = directory
+        self.enabled = enabled
+        self.fsync = fsync
+        self.snapshot_records = snapshot_records
+        self.handlers = {}
+        self.lsn = 0  # last record applied to the in-memory state
+        self.snapshot_lsn = 0
+        self.recovered = {'snapshot_lsn': 0, 'records': 0, 'ms': 0.0}
+        self.commits = 0
+        self.committed_records = 0
+        self.failed = None  # OSError that stopped the log
+        self._pid = None
+        self._lock_file = None
+        self._fd = None
+        self._pending = bytearray()
+        self._appended = 0
+        self._durable = 0
+        self._flushing = False
+        self._checkpointing = False
+        self._lock = threading.RLock()
+        self._commit = threading.Condition()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.extensions['journal'] = self
+
+    def register(self, op, handler):
+        """Make `op` loggable; handler(*args) applies it and may return a result"""
+        self.handlers[op] = handler
+
+    # Logging
+
+    def locked(self):
+        """The state lock, for unlogged changes that replay re-derives"""
+        return self._lock
+
+    def writing(self):
+        return self._fd is not None and self._pid == os.getpid()
+
+    def apply(self, op, *args):
+        """
+        Apply a mutation and log it
+
+        Returns:
+            The handler's result, once the record is durable
+        """
+        with self._lock:
+            if self.failed is not None:
+                raise JournalError(f"Journal failed, not applying {op}: {self.failed}")
+            result = self.handlers[op](*args)
+            if not self.writing():
+                return result
+            payload = pickle.dumps((op, args), PICKLE_PROTOCOL)
+            self.lsn += 1
+            self._pending += RECORD.pack(len(payload), zlib.crc32(payload), self.lsn)
+            self._pending += payload
+            self._appended = lsn = self.lsn
+        self._wait_durable(lsn)
+        return result
+
+    def _wait_durable(self, lsn):
+        """Group commit: the first waiter writes everything pending, the rest wait for it"""
+        with self._commit:
+            while self._durable < lsn:
+                if self.failed is not None:
+                    raise JournalError(f"Record {lsn} was not written: {self.failed}")
+                if not self._flushing:
+                    self._flushing = True
+                    break
+                self._commit.wait()
+            else:
+                return
+        try:
+            if JOURNAL_GROUP_WINDOW:
+                time.sleep(JOURNAL_GROUP_WINDOW)
+            with self._lock:
+                data = bytes(self._pending)
+                upto = self._appended
+                fd = self._fd
+            # Records leave _pending only once they are on disk
+            try:
+                if data:
+                    _write_all(fd, data)
+                    if self.fsync:
+                        os.fsync(fd)
+            except OSError as e:
+                self._fail(e)
+                raise JournalError(f"Record {lsn} was not written: {e}") from e
+            with self._lock:
+                del self._pending[:len(data)]
+            with self._commit:
+                self.commits += 1
+                self.committed_records += upto - self._durable
+                self._durable = max(self._durable, upto)
+        finally:
+            with self._commit:
+                self._flushing = False
+                self._commit.notify_all()
+        if upto - self.snapshot_lsn >= self.snapshot_records:
+            self.checkpoint()
+
+    def _fail(self, error):
+        print(f"❌ Journal write failed, refusing further changes until restart: {error}")
+        with self._lock, self._commit:
+            self.failed = error
+            self._commit.notify_all()
+
+    # Snapshots
+
+    def checkpoint(self, wait=False):
+        """Capture the state, start a new WAL segment and write the snapshot (in the background unless wait)"""
+        # Become the flusher so no group commit is writing to the segment being closed
+        with self._commit:
+            while self._flushing:
+                self._commit.wait()
+            self._flushing = True
+        try:
+            with self._lock:
+                if (not self.writing() or self.failed is not None or self._checkpointing
+                        or self.lsn == self.snapshot_lsn):
+                    return False
+                self._checkpointing = True
+                try:
+                    state = pickle.dumps(self.capture(), PICKLE_PROTOCOL)
+                    lsn = self.lsn
+                    # Records up to lsn stay in the old segment; the snapshot supersedes them
+                    try:
+                        _write_all(self._fd, bytes(self._pending))
+                        if self.fsync:
+                            os.fsync(self._fd)
+                    except OSError as e:
+                        self._fail(e)
+                        raise
+                    self._pending.clear()
+                    os.close(self._fd)
+                    self._fd = self._open_segment(lsn + 1)
+                    self.snapshot_lsn = lsn
+                except Exception:
+                    self._checkpointing = False
+                    raise
+        finally:
+            with self._commit:
+                if self._checkpointing:
+                    self._durable = max(self._durable, self.snapshot_lsn)
+                self._flushing = False
+                self._commit.notify_all()
+        if wait:
+            self._write_snapshot(lsn, state)
+        else:
+            threading.Thread(target=self._write_snapshot, args=(lsn, state), name='journal-snapshot',
+                             daemon=True).start()
+        return True
+
+    def _write_snapshot(self, lsn, state):
+        try:
+            path = os.path.join(self.directory, _snapshot_name(lsn))
+            with open(path + '.tmp', 'wb') as f:
+                f.write(SNAPSHOT.pack(SNAPSHOT_MAGIC, lsn, zlib.crc32(state)))
+                f.write(state)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+            _fsync_directory(self.directory)
+            # Everything older is covered by this snapshot
+            for number, old in _numbered(self.directory, 'snapshot-', '.bin'):
+                if number < lsn:
+                    os.remove(old)
+            for number, old in _numbered(self.directory, 'wal-', '.log'):
+                if number <= lsn:
+                    os.remove(old)
+            print(f"💾 Journal snapshot at lsn {lsn} ({len(state) / 1024:.0f} KB)")
+        except OSError as e:
+            print(f"Journal snapshot failed: {e}")
+        finally:
+            self._checkpointing = False
+
+    # Recovery
+
+    def recover(self, truncate=False):
+        """
+        Bring the in-memory state up to date with the files on disk
+
+        Loads the newest valid snapshot if it is ahead of the state, then
+        replays the WAL records after it. Safe to call again: only records
+        the state has not seen are applied.
+
+        Args:
+            truncate: Cut a torn record off the end of the last segment
+                      (only the process holding the directory lock may)
+
+        Returns:
+            dict: snapshot_lsn, records replayed, ms taken
+        """
+        if not self.enabled or not os.path.isdir(self.directory):
+            return self.recovered
+        started = time.perf_counter()
+        with self._lock:
+            snapshot_lsn = self.snapshot_lsn
+            for number, path in reversed(_numbered(self.directory, 'snapshot-', '.bin')):
+                if number <= self.lsn:
+                    snapshot_lsn = max(snapshot_lsn, number)
+                    break
+                loaded = read_snapshot(path)
+                if loaded is not None:
+                    self.restore(loaded[1])
+                    self.lsn = snapshot_lsn = loaded[0]
+                    break
+                print(f"⚠️ Ignoring damaged snapshot {path}")
+
+            replayed = 0
+            segments = _numbered(self.directory, 'wal-', '.log')
+            for i, (first, path) in enumerate(segments):
+                next_first = segments[i + 1][0] if i + 1 < len(segments) else None
+                if next_first is not None and next_first <= self.lsn + 1:
+                    continue
+                end = 0
+                for lsn, op, args, end in read_records(path):
+                    if lsn <= self.lsn:
+                        continue
+                    self.handlers[op](*args)
+                    self.lsn = lsn
+                    replayed += 1
+                if truncate and next_first is None and end < os.path.getsize(path):
+                    print(f"⚠️ Dropping torn journal tail in {path} at byte {end}")
+                    os.truncate(path, end)
+
+            self.snapshot_lsn = snapshot_lsn
+            self._appended = self._durable = self.lsn
+            self.recovered = {'snapshot_lsn': snapshot_lsn, 'records': replayed,
+                              'ms': round((time.perf_counter() - started) * 1000, 2)}
+        if replayed or snapshot_lsn:
+            print(f"💾 Recovered journal: snapshot lsn {snapshot_lsn} + {replayed} records "
+                  f"in {self.recovered['ms']} ms")
+        return self.recovered
+
+    def _open_segment(self, first_lsn):
+        path = os.path.join(self.directory, _segment_name(first_lsn))
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        _fsync_directory(self.directory)
+        return fd
+
+    def open(self):
+        """Take ownership of the log in this process, catching up first; False if another process owns it"""
+        if not self.enabled:
+            return False
+        pid = os.getpid()
+        with self._lock:
+            if self._pid == pid:
+                return self._fd is not None
+            self._pid = pid
+            # Inherited across a fork: this process neither holds the lock nor owns the fd
+            self._fd = self._lock_file = None
+            self._pending.clear()
+            os.makedirs(self.directory, exist_ok=True)
+            lock_file = open(os.path.join(self.directory, 'LOCK'), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                print(f"⚠️ Journal in {self.directory} is owned by another process; "
+                      f"changes in pid {pid} are not journaled")
+                return False
+            self._lock_file = lock_file
+            self.recover(truncate=True)
+            segments = _numbered(self.directory, 'wal-', '.log')
+            self._fd = self._open_segment(segments[-1][0] if segments else self.lsn + 1)
+            return True
+
+    def _before_request(self):
+        if self.enabled and self._pid != os.getpid():
+            try:
+                self.open()
+            except OSError as e:
+                print(f"⚠️ Journal unavailable, changes are not journaled: {e}")
+                self.enabled = False
+
+    def close(self):
+        """Flush and release the log (the state stays as it is)"""
+        if self.writing() and self.failed is None:
+            self._wait_durable(self.lsn)
+        with self._lock:
+            if self.writing():
+                os.close(self._fd)
+                self._lock_file.close()
+            self._fd = self._lock_file = None
+            self._pid = None
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'writing': self.writing(),
+            'failed': None if self.failed is None else str(self.failed),
+            'directory': self.directory,
+            'lsn': self.lsn,
+            'snapshot_lsn': self.snapshot_lsn,
+            'commits': self.commits,
+            'records_per_commit': round(self.committed_records / self.commits, 2) if self.commits else None,
+            'recovered': self.recovered
+        }
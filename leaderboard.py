@@ -0,0 +1,241 @@
+"""
+Live leaderboard of users ranked by total portfolio value
+
+Users are kept in a RankedSet, an order-statistics structure over
+(-value, username) keys: a list of sorted buckets (at most 2 x LOAD keys
+each) with a Fenwick tree over the bucket sizes.
+
+    add / remove   bisect to the bucket, insort     O(log n + LOAD)
+    rank           Fenwick prefix + bisect          O(log n)
+    top k          walk the buckets from the front  O(k)
+
+A trade re-ranks only the trading user. A price tick re-values only the
+holders of coins whose price changed (an inverted coin -> holders index);
+when a large share of users is affected, the whole ranking is rebuilt
+with one sort instead.
+
+Values are in USD: cash plus holdings at the last prices seen. Coins
+without a price yet count as zero.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from itertools import chain, islice
+
+# Re-rank by removing and re-adding keys when fewer than this share of users changed
+BULK_REBUILD_FRACTION = 0.25
+
+
+class RankedSet:
+    """Sorted set with O(log n) rank lookups (bucketed sorted list + Fenwick index)"""
+
+    LOAD = 256
+
+    def __init__(self, keys=()):
+        self._build(sorted(keys))
+
+    def _build(self, keys):
+        self.buckets = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+        self.size = len(keys)
+        self._index = None
+
+    def _tree(self):
+        """Fenwick tree over bucket sizes, rebuilt after buckets split or vanish"""
+        if self._index is None:
+            tree = [0] + [len(bucket) for bucket in self.buckets]
+            for i in range(1, len(tree)):
+                parent = i + (i & -i)
+                if parent < len(tree):
+                    tree[parent] += tree[i]
+            self._index = tree
+        return self._index
+
+    def _adjust(self, position, delta):
+        if self._index is None:
+            return
+        i = position + 1
+        while i < len(self._index):
+            self._index[i] += delta
+            i += i & -i
+
+    def _prefix(self, position):
+        """Number of keys in buckets before `position`"""
+        tree = self._tree()
+        total = 0
+        i = position
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def add(self, key):
+        self.size += 1
+        if not self.buckets:
+            self.buckets.append([key])
+            self.maxes.append(key)
+            self._index = None
+            return
+        position = min(bisect_left(self.maxes, key), len(self.buckets) - 1)
+        bucket = self.buckets[position]
+        insort(bucket, key)
+        self.maxes[position] = bucket[-1]
+        if len(bucket) > 2 * self.LOAD:
+            self.buckets[position:position + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self.maxes[position:position + 1] = [bucket[self.LOAD - 1], bucket[-1]]
+            self._index = None
+        else:
+            self._adjust(position, 1)
+
+    def remove(self, key):
+        position = bisect_left(self.maxes, key)
+        bucket = self.buckets[position] if position < len(self.buckets) else []
+        i = bisect_left(bucket, key)
+        if i == len(bucket) or bucket[i] != key:
+            raise KeyError(key)
+        del bucket[i]
+        self.size -= 1
+        if bucket:
+            self.maxes[position] = bucket[-1]
+            self._adjust(position, -1)
+        else:
+            del self.buckets[position]
+            del self.maxes[position]
+            self._index = None
+
+    def rank(self, key):
+        """0-based position of key"""
+        position = bisect_left(self.maxes, key)
+        if position == len(self.buckets):
+            return self.size
+        return self._prefix(position) + bisect_left(self.buckets[position], key)
+
+    def first(self, k):
+        return list(islice(chain.from_iterable(self.buckets), k))
+
+    def __iter__(self):
+        return chain.from_iterable(self.buckets)
+
+    def __len__(self):
+        return self.size
+
+
+class Leaderboard:
+    """Users ranked by cash plus holdings at the latest prices"""
+
+    def __init__(self):
+        self.users = {}  # username -> (value, cash, {coin_id: quantity})
+        self.ranking = RankedSet()
+        self.holders = defaultdict(set)  # coin_id -> usernames holding it
+        self.prices = {}  # coin_id -> usd
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+
+    def _value(self, cash, holdings):
+        return cash + sum(quantity * self.prices.get(coin_id, 0.0) for coin_id, quantity in holdings.items())
+
+    def _set(self, username, cash, holdings, rank=True):
+        previous = self.users.get(username)
+        if previous is not None:
+            if rank:
+                self.ranking.remove((-previous[0], username))
+            for coin_id in previous[2]:
+                self.holders[coin_id].discard(username)
+        value = self._value(cash, holdings)
+        self.users[username] = (value, cash, holdings)
+        for coin_id in holdings:
+            self.holders[coin_id].add(username)
+        if rank:
+            self.ranking.add((-value, username))
+
+    def update_user(self, username, balance, holdings):
+        """Re-rank one user after a trade (or add them)"""
+        holdings = {coin_id: float(q) for coin_id, q in holdings.items() if float(q) > 0}
+        with self._lock:
+            self._set(username, float(balance), holdings)
+
+    def remove_user(self, username):
+        """Drop a deleted user from the board"""
+        with self._lock:
+            previous = self.users.pop(username, None)
+            if previous is None:
+                return
+            self.ranking.remove((-previous[0], username))
+            for coin_id in previous[2]:
+                self.holders[coin_id].discard(username)
+
+    def rebuild(self, portfolios):
+        """
+        Replace every entry at once
+
+        Args:
+            portfolios: {username: (balance, holdings)}
+        """
+        with self._lock:
+            self.users = {}
+            self.holders = defaultdict(set)
+            for username, (balance, holdings) in portfolios.items():
+                holdings = {coin_id: float(q) for coin_id, q in holdings.items() if float(q) > 0}
+                self._set(username, float(balance), holdings, rank=False)
+            self.ranking = RankedSet((-value, username) for username, (value, _, _) in self.users.items())
+            self.built_at = time.time()
+
+    def update_prices(self, prices, currency='usd'):
+        """
+        Apply a price tick and re-rank only the holders of coins that moved
+
+        Args:
+            prices: get_crypto_prices()-style dict
+
+        Returns:
+            int: Number of users re-valued
+        """
+        with self._lock:
+            changed = [coin_id for coin_id, data in prices.items()
+                       if data.get(currency) is not None and self.prices.get(coin_id) != data[currency]]
+            if not changed:
+                return 0
+            for coin_id in changed:
+                self.prices[coin_id] = float(prices[coin_id][currency])
+            affected = set().union(*(self.holders.get(coin_id, ()) for coin_id in changed))
+            if not affected:
+                return 0
+
+            if len(affected) > BULK_REBUILD_FRACTION * len(self.users):
+                for username in affected:
+                    _, cash, holdings = self.users[username]
+                    self.users[username] = (self._value(cash, holdings), cash, holdings)
+                self.ranking = RankedSet((-value, username) for username, (value, _, _) in self.users.items())
+            else:
+                for username in affected:
+                    value, cash, holdings = self.users[username]
+                    self.ranking.remove((-value, username))
+                    value = self._value(cash, holdings)
+                    self.users[username] = (value, cash, holdings)
+                    self.ranking.add((-value, username))
+            return len(affected)
+
+    def coins(self):
+        """Every coin held by someone on the board"""
+        return [coin_id for coin_id, usernames in self.holders.items() if usernames]
+
+    def top(self, k=10):
+        """Best k users, highest value first"""
+        with self._lock:
+            keys = self.ranking.first(k)
+        return [{'rank': i + 1, 'username': username, 'value': round(-negative, 2)}
+                for i, (negative, username) in enumerate(keys)]
+
+    def rank(self, username):
+        """{'rank', 'username', 'value', 'of'} for one user, or None"""
+        with self._lock:
+            entry = self.users.get(username)
+            if entry is None:
+                return None
+            return {'rank': self.ranking.rank((-entry[0], username)) + 1, 'username': username,
+                    'value': round(entry[0], 2), 'of': len(self.ranking)}
+
+    def __len__(self):
+        return len(self.users)
@@ -0,0 +1,52 @@
+"""
+Market-wide data shared by app.py and app_aws.py
+
+Global market stats, trending coins and the Fear & Greed index. Used by
+the individual /api/* routes and by the dashboard bundle.
+"""
+
+from datetime import datetime
+
+import upstream
+
+
+def get_market_stats():
+    """Fetch global market statistics (raises on upstream failure)"""
+    data = upstream.fetch_json('/global')
+    return {
+        'total_market_cap': data['data']['total_market_cap']['usd'],
+        'total_volume': data['data']['total_volume']['usd'],
+        'market_cap_change_24h': data['data']['market_cap_change_percentage_24h_usd'],
+        'active_cryptocurrencies': data['data']['active_cryptocurrencies'],
+        'bitcoin_dominance': data['data']['market_cap_percentage']['btc']
+    }
+
+
+def get_trending_coins():
+    """Fetch the top 5 trending coins (empty list on upstream failure)"""
+    try:
+        data = upstream.fetch_json('/search/trending')
+        
+        trending_coins = []
+        for coin in data['coins'][:5]:  # Top 5 trending
+            trending_coins.append({
+                'id': coin['item']['id'],
+                'name': coin['item']['name'],
+                'symbol': coin['item']['symbol'],
+                'market_cap_rank': coin['item']['market_cap_rank']
+            })
+        return trending_coins
+    except Exception as e:
+        print(f"Error fetching trending coins: {e}")
+        return []
+
+
+def get_fear_greed():
+    """Get Fear & Greed Index"""
+    # This would typically use the Alternative.me API
+    # For demo, returning mock data
+    return {
+        'value': 65,
+        'value_classification': 'Greed',
+        'timestamp': datetime.now().isoformat()
+    }
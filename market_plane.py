@@ -0,0 +1,400 @@
+"""
+Cross-process market data plane
+
+Under gunicorn every worker used to poll CoinGecko for itself and keep
+its own tracked_coins. The plane is one shared-memory segment holding
+the tracked coins, their latest USD prices and the FX rate table:
+
+    header   magic, layout, coin/rate counts, sequence counter,
+             snapshot version, coins version, updated_at      (64 bytes)
+    coins    MAX_COINS x (id[48], price, 24h change, market cap, 24h volume)
+    rates    MAX_RATES x (currency[8], units per USD)
+
+One process at a time (whichever holds the leader file lock) fetches
+prices every MARKET_PLANE_INTERVAL seconds and publishes them; if it
+dies the lock is released and another worker takes over. Writers also
+serialize on a file lock and bump the sequence counter to odd while
+writing and back to even after (a seqlock), so readers never lock: they
+copy the segment and retry if the counter moved. A parsed snapshot is
+kept per process until the version changes.
+
+get_crypto_prices() serves non-trade requests from the snapshot while it
+is fresh; other currencies are derived from USD with the published FX
+rates. Tracked-coin changes are published through the plane too and
+every worker adopts them on its next request. The segment outlives
+worker restarts, so a restarted app adopts the coins it finds there.
+
+Environment:
+    MARKET_PLANE           1/0 (default 1)
+    MARKET_PLANE_NAME      shared memory segment name prefix (default cryptopulse_market;
+                           app.py and app_aws.py append _local / _aws so their coin
+                           lists never share a segment)
+    MARKET_PLANE_INTERVAL  seconds between fetches (default 10)
+    MARKET_PLANE_MAX_AGE   oldest snapshot served, in seconds (default 30)
+"""
+
+import fcntl
+import math
+import os
+import struct
+import tempfile
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+MARKET_PLANE = os.environ.get('MARKET_PLANE', '1') != '0'
+MARKET_PLANE_NAME = os.environ.get('MARKET_PLANE_NAME', 'cryptopulse_market')
+MARKET_PLANE_INTERVAL = float(os.environ.get('MARKET_PLANE_INTERVAL', 10))
+MARKET_PLANE_MAX_AGE = float(os.environ.get('MARKET_PLANE_MAX_AGE', 30))
+
+MAGIC = b'CPMP'
+LAYOUT = 1
+MAX_COINS = 512
+MAX_RATES = 64
+
+HEADER = struct.Struct('<4sHHHHQQQd')  # magic, layout, coins, rates, pad, seq, version, coins_version, updated_at
+HEADER_SIZE = 64
+SEQ_OFFSET = 12
+COIN = struct.Struct('<48s4d')
+RATE = struct.Struct('<8sd')
+COINS_OFFSET = HEADER_SIZE
+
+# How long to wait for a segment another process created but has not sized yet
+ATTACH_TIMEOUT = 0.5
+RATES_OFFSET = COINS_OFFSET + MAX_COINS * COIN.size
+SEGMENT_SIZE = RATES_OFFSET + MAX_RATES * RATE.size
+
+# USD fields of a /simple/price entry, in record order
+FIELDS = ('usd', 'usd_24h_change', 'usd_market_cap', 'usd_24h_vol')
+NAN = float('nan')
+
+
+class Snapshot:
+    """One consistent read of the plane"""
+
+    def __init__(self, version, coins_version, updated_at, coins, rates):
+        self.version = version
+        self.coins_version = coins_version
+        self.updated_at = updated_at
+        self.coins = coins  # [(coin_id, price, change, market_cap, volume)]
+        self.rates = rates  # {currency: units per USD}
+        self.ids = [coin[0] for coin in coins]
+        self.by_id = {coin[0]: coin for coin in coins}
+
+    @property
+    def age(self):
+        return time.time() - self.updated_at if self.updated_at else float('inf')
+
+
+class SegmentNotReady(Exception):
+    """The segment exists but its creator has not sized it yet; treat the plane as empty"""
+
+
+class MarketPlane:
+    """Shared-memory price snapshot and tracked-coin list for a Flask app"""
+
+    def __init__(self, app=None, tracked_coins=None, fetch_prices=None, on_coins_changed=None,
+                 name=MARKET_PLANE_NAME, enabled=MARKET_PLANE):
+        """
+        Args:
+            tracked_coins: The app's tracked coin list, kept in sync in place
+            fetch_prices: fn(coin_ids) -> /simple/price dict in USD (market cap,
+                          24h change and volume included); may raise
+            on_coins_changed: Called after tracked_coins was replaced from the plane
+        """
+        self.tracked_coins = tracked_coins if tracked_coins is not None else []
+        self.fetch_prices = fetch_prices
+        self.on_coins_changed = on_coins_changed
+        self.name = name
+        self.enabled = enabled
+        self.publishes = 0
+        self.fetch_errors = 0
+        self._shm = None
+        self._pid = None
+        self._snapshot = None
+        self._coins_version = None
+        self._leader_file = None
+        self._fetcher = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.extensions['market_plane'] = self
+
+    # Segment and locks
+
+    def _segment(self):
+        """The mapped segment, attached (or created) once per process"""
+        pid = os.getpid()
+        if self._shm is not None and self._pid == pid:
+            return self._shm
+        with self._lock:
+            if self._shm is None or self._pid != pid:
+                try:
+                    shm = shared_memory.SharedMemory(name=self.name, create=True, size=SEGMENT_SIZE)
+                    # The segment belongs to the deployment, not to this process
+                    resource_tracker.unregister(shm._name, 'shared_memory')
+                except FileExistsError:
+                    shm = self._attach()
+                if shm.size < SEGMENT_SIZE:
+                    raise RuntimeError(f"Shared memory segment {self.name} is too small")
+                self._shm = shm
+                self._pid = pid
+                self._leader_file = None
+                self._fetcher = None
+                self._snapshot = None
+        return self._shm
+
+    def _attach(self):
+        """Map an existing segment, waiting briefly while its creator is still sizing it"""
+        deadline = time.monotonic() + ATTACH_TIMEOUT
+        while True:
+            try:
+                shm = shared_memory.SharedMemory(name=self.name)
+            except ValueError:
+                # mmap of a zero-length object: created but not yet truncated to size
+                if time.monotonic() >= deadline:
+                    raise SegmentNotReady(f"Shared memory segment {self.name} is not sized yet")
+                time.sleep(0.005)
+                continue
+            resource_tracker.unregister(shm._name, 'shared_memory')
+            return shm
+
+    def unlink(self):
+        """Remove the segment from the system (a process that attaches next starts an empty one)"""
+        with self._lock:
+            if self._shm is None:
+                return
+            # Hand it back to the resource tracker so unlink() does not leave a stale entry
+            resource_tracker.register(self._shm._name, 'shared_memory')
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+            self._pid = None
+
+    def _lock_path(self, suffix):
+        return os.path.join(tempfile.gettempdir(), f'{self.name}.{suffix}')
+
+    def _write(self, update):
+        """Run update(snapshot or None) -> (coins, rates, updated_at) and publish it under the seqlock"""
+        buf = self._segment().buf
+        with self._lock, open(self._lock_path('write'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            current = self._read(buf)
+            coins, rates, updated_at = update(current)
+            coins = coins[:MAX_COINS]
+            rates = list(rates.items())[:MAX_RATES]
+            magic, _, _, _, _, seq, version, coins_version, _ = HEADER.unpack_from(buf, 0)
+            if magic != MAGIC:
+                seq = version = coins_version = 0
+            if current is None or [c[0] for c in coins] != current.ids:
+                coins_version += 1
+
+            struct.pack_into('<Q', buf, SEQ_OFFSET, seq + 1)
+            for i, (coin_id, *values) in enumerate(coins):
+                COIN.pack_into(buf, COINS_OFFSET + i * COIN.size, coin_id.encode('utf-8')[:48], *values)
+            for i, (currency, rate) in enumerate(rates):
+                RATE.pack_into(buf, RATES_OFFSET + i * RATE.size, currency.encode('utf-8')[:8], rate)
+            HEADER.pack_into(buf, 0, MAGIC, LAYOUT, len(coins), len(rates), 0, seq + 1,
+                             version + 1, coins_version, updated_at)
+            struct.pack_into('<Q', buf, SEQ_OFFSET, seq + 2)
+            self.publishes += 1
+
+    def _read(self, buf):
+        """Consistent snapshot without locking (seqlock retry), or None if the plane is empty"""
+        for _ in range(1000):
+            seq = struct.unpack_from('<Q', buf, SEQ_OFFSET)[0]
+            if seq & 1:
+                time.sleep(0)
+                continue
+            magic, layout, n_coins, n_rates, _, _, version, coins_version, updated_at = HEADER.unpack_from(buf, 0)
+            if magic != MAGIC or layout != LAYOUT:
+                return None
+            cached = self._snapshot
+            if cached is not None and cached.version == version:
+                snapshot = cached
+            else:
+                coins_bytes = bytes(buf[COINS_OFFSET:COINS_OFFSET + n_coins * COIN.size])
+                rates_bytes = bytes(buf[RATES_OFFSET:RATES_OFFSET + n_rates * RATE.size])
+                coins = [(raw_id.rstrip(b'\0').decode('utf-8'), *values)
+                         for raw_id, *values in COIN.iter_unpack(coins_bytes)]
+                rates = {raw.rstrip(b'\0').decode('utf-8'): rate for raw, rate in RATE.iter_unpack(rates_bytes)}
+                snapshot = Snapshot(version, coins_version, updated_at, coins, rates)
+            if struct.unpack_from('<Q', buf, SEQ_OFFSET)[0] == seq:
+                self._snapshot = snapshot
+                return snapshot
+        return None
+
+    def snapshot(self):
+        if not self.enabled:
+            return None
+        try:
+            return self._read(self._segment().buf)
+        except SegmentNotReady:
+            return None
+        except (OSError, RuntimeError) as e:
+            print(f"⚠️ Market plane unavailable, using per-worker fetches: {e}")
+            self.enabled = False
+            return None
+
+    # Publishing
+
+    def publish_coins(self, coin_ids):
+        """Replace the tracked coins for every worker, keeping known prices"""
+        if not self.enabled:
+            return
+
+        def update(current):
+            known = current.by_id if current else {}
+            coins = [known.get(coin_id, (coin_id, NAN, NAN, NAN, NAN)) for coin_id in coin_ids]
+            return coins, current.rates if current else {}, current.updated_at if current else 0.0
+        self._write(update)
+        self._adopt(self.snapshot())
+
+    def publish_prices(self, prices, rates=None):
+        """
+        Publish a USD /simple/price result (and optionally the FX rate table)
+
+        Coins no longer tracked in the plane are ignored.
+        """
+        def record(coin_id):
+            data = prices.get(coin_id) or {}
+            return (coin_id, *(NAN if data.get(field) is None else float(data[field]) for field in FIELDS))
+
+        def update(current):
+            ids = current.ids if current else list(self.tracked_coins)
+            if rates is None:
+                return [record(coin_id) for coin_id in ids], current.rates if current else {}, time.time()
+            return [record(coin_id) for coin_id in ids], rates, time.time()
+        self._write(update)
+
+    # Reading
+
+    def prices(self, coin_ids, currency='usd'):
+        """
+        get_crypto_prices()-style dict from a fresh snapshot
+
+        Returns None when the snapshot is stale, a coin has no published
+        price or there is no rate for the currency; callers then fetch
+        directly.
+        """
+        snapshot = self.snapshot()
+        if snapshot is None or snapshot.age > MARKET_PLANE_MAX_AGE:
+            return None
+        rate = 1.0 if currency == 'usd' else snapshot.rates.get(currency)
+        if rate is None:
+            return None
+        result = {}
+        for coin_id in coin_ids:
+            coin = snapshot.by_id.get(coin_id)
+            if coin is None or math.isnan(coin[1]):
+                return None
+            _, price, change, market_cap, volume = coin
+            entry = {currency: price * rate}
+            if not math.isnan(change):
+                entry[f'{currency}_24h_change'] = change
+            if not math.isnan(market_cap):
+                entry[f'{currency}_market_cap'] = market_cap * rate
+            if not math.isnan(volume):
+                entry[f'{currency}_24h_vol'] = volume * rate
+            result[coin_id] = entry
+        return result
+
+    def _adopt(self, snapshot):
+        """Make the local tracked_coins match the plane's"""
+        if snapshot is None or snapshot.coins_version == self._coins_version:
+            return
+        self._coins_version = snapshot.coins_version
+        if snapshot.ids and snapshot.ids != self.tracked_coins:
+            self.tracked_coins[:] = snapshot.ids
+            if self.on_coins_changed:
+                self.on_coins_changed()
+
+    # Fetcher
+
+    def _is_leader(self):
+        if self._leader_file is None:
+            leader_file = open(self._lock_path('leader'), 'a')
+            try:
+                fcntl.flock(leader_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                leader_file.close()
+                return False
+            self._leader_file = leader_file
+            print(f"📡 Market plane fetcher running in pid {os.getpid()}")
+        return True
+
+    def refresh(self):
+        """Fetch and publish prices for the plane's coins (one upstream call)"""
+        snapshot = self.snapshot()
+        coin_ids = snapshot.ids if snapshot and snapshot.ids else list(self.tracked_coins)
+        try:
+            prices = self.fetch_prices(coin_ids)
+        except Exception as e:
+            self.fetch_errors += 1
+            print(f"Market plane fetch failed: {e}")
+            return False
+        if not prices:
+            self.fetch_errors += 1
+            return False
+        try:
+            import fx
+            rates = fx.rates()
+        except Exception as e:
+            print(f"Market plane rates unavailable: {e}")
+            rates = None
+        self.publish_prices(prices, rates)
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                if self._is_leader():
+                    self.refresh()
+            except Exception as e:
+                print(f"Market plane fetcher error: {e}")
+            time.sleep(MARKET_PLANE_INTERVAL)
+
+    def start(self):
+        """Start this process's fetcher thread (it only fetches while holding the leader lock)"""
+        if not self.enabled or self.fetch_prices is None:
+            return
+        self._segment()
+        with self._lock:
+            if self._fetcher is None:
+                self._fetcher = threading.Thread(target=self._run, name='market-plane', daemon=True)
+                self._fetcher.start()
+
+    def _before_request(self):
+        if not self.enabled:
+            return
+        try:
+            snapshot = self.snapshot()
+            if not self.enabled:
+                return
+            if snapshot is None or not snapshot.ids:
+                self.publish_coins(list(self.tracked_coins))
+            else:
+                self._adopt(snapshot)
+            if self._fetcher is None:
+                self.start()
+        except SegmentNotReady:
+            return  # attach again on the next request
+        except (OSError, RuntimeError) as e:
+            print(f"⚠️ Market plane unavailable, using per-worker fetches: {e}")
+            self.enabled = False
+
+    def status(self):
+        snapshot = self.snapshot() if self.enabled else None
+        return {
+            'enabled': self.enabled,
+            'name': self.name,
+            'leader': self._leader_file is not None,
+            'version': snapshot.version if snapshot else None,
+            'coins': len(snapshot.ids) if snapshot else 0,
+            'age_seconds': round(snapshot.age, 1) if snapshot and snapshot.updated_at else None,
+            'publishes': self.publishes,
+            'fetch_errors': self.fetch_errors
+        }
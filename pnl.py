@@ -0,0 +1,237 @@
+"""
+Incremental cost basis and realized/unrealized P&L
+
+Each user keeps one Position per coin. A Position holds its open lots
+(FIFO) or a single merged lot (average cost) plus running totals, and is
+updated from the buy/sell path:
+
+    buy   append a lot                                   O(1)
+    sell  consume lots from the front; every lot is
+          consumed at most once                          O(1) amortized
+
+Reading P&L never replays transaction history: unrealized P&L is the
+open quantity at the current price minus the open cost, realized P&L is
+a running total.
+
+Positions serialize to plain dicts (to_dict / from_dict) so app_aws can
+store them on the portfolio item next to `holdings`. To keep that item
+well under DynamoDB's 400 KB limit a buy at the same price as the newest
+lot extends it, and past PNL_MAX_LOTS open lots the two newest are
+merged at their average cost (total cost stays exact; only FIFO order
+inside the merged tail is approximated).
+
+Holdings bought before lots were tracked have no lots; seed() adds an
+opening lot for them (see uncovered() and average_buy_costs()).
+
+Environment:
+    PNL_METHOD     fifo | average (default fifo)
+    PNL_MAX_LOTS   open lots kept per coin (default 100)
+"""
+
+import os
+from collections import deque
+
+PNL_METHOD = os.environ.get('PNL_METHOD', 'fifo')
+PNL_MAX_LOTS = max(int(os.environ.get('PNL_MAX_LOTS', 100)), 1)
+
+# Quantities below this are treated as fully closed (float dust)
+EPSILON = 1e-12
+
+
+class Position:
+    """Open lots and running P&L totals for one coin"""
+
+    def __init__(self, method=PNL_METHOD):
+        self.method = method
+        self.lots = deque()  # [quantity, unit_cost], oldest first
+        self.quantity = 0.0
+        self.cost = 0.0  # cost of the open quantity
+        self.realized = 0.0
+        self.invested = 0.0  # total spent on buys
+        self.proceeds = 0.0  # total received from sells
+
+    def buy(self, quantity, price):
+        amount = quantity * price
+        if self.method == 'average' and self.lots:
+            lot = self.lots[0]
+            lot[0] += quantity
+            lot[1] = (self.cost + amount) / lot[0]
+        elif self.lots and self.lots[-1][1] == price:
+            self.lots[-1][0] += quantity
+        else:
+            self.lots.append([quantity, price])
+            if len(self.lots) > PNL_MAX_LOTS:
+                newest = self.lots.pop()
+                lot = self.lots[-1]
+                merged = lot[0] + newest[0]
+                lot[1] = (lot[0] * lot[1] + newest[0] * newest[1]) / merged
+                lot[0] = merged
+        self.quantity += quantity
+        self.cost += amount
+        self.invested += amount
+
+    def seed(self, quantity, unit_cost):
+        """Add an opening lot (older than every tracked lot) for untracked holdings"""
+        amount = quantity * unit_cost
+        if self.method == 'average' and self.lots:
+            lot = self.lots[0]
+            lot[0] += quantity
+            lot[1] = (self.cost + amount) / lot[0]
+        else:
+            self.lots.appendleft([quantity, unit_cost])
+        self.quantity += quantity
+        self.cost += amount
+        self.invested += amount
+
+    def sell(self, quantity, price):
+        """
+        Close `quantity` against the open lots
+
+        Returns:
+            float: Realized P&L of this sale
+        """
+        remaining = min(quantity, self.quantity)
+        cost_closed = 0.0
+        while remaining > EPSILON and self.lots:
+            lot = self.lots[0]
+            take = min(lot[0], remaining)
+            cost_closed += take * lot[1]
+            lot[0] -= take
+            remaining -= take
+            if lot[0] <= EPSILON:
+                self.lots.popleft()
+
+        closed = min(quantity, self.quantity)
+        realized = closed * price - cost_closed
+        self.quantity -= closed
+        self.cost -= cost_closed
+        if self.quantity <= EPSILON or not self.lots:
+            self.quantity = 0.0
+            self.cost = 0.0
+            self.lots.clear()
+        self.realized += realized
+        self.proceeds += closed * price
+        return realized
+
+    @property
+    def avg_cost(self):
+        return self.cost / self.quantity if self.quantity > EPSILON else 0.0
+
+    def to_dict(self):
+        return {
+            'method': self.method,
+            'lots': [list(lot) for lot in self.lots],
+            'quantity': self.quantity,
+            'cost': self.cost,
+            'realized': self.realized,
+            'invested': self.invested,
+            'proceeds': self.proceeds
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        position = cls(data.get('method', PNL_METHOD))
+        position.lots = deque([float(q), float(c)] for q, c in data.get('lots', []))
+        for field in ('quantity', 'cost', 'realized', 'invested', 'proceeds'):
+            setattr(position, field, float(data.get(field, 0)))
+        return position
+
+
+class Ledger:
+    """All of one user's positions"""
+
+    def __init__(self, positions=None, method=PNL_METHOD):
+        self.method = method
+        self.positions = positions or {}
+
+    def position(self, coin_id):
+        if coin_id not in self.positions:
+            self.positions[coin_id] = Position(self.method)
+        return self.positions[coin_id]
+
+    def record_trade(self, trade_type, coin_id, quantity, price):
+        """Apply one buy or sell; returns realized P&L (0 for buys)"""
+        position = self.position(coin_id)
+        if trade_type == 'buy':
+            position.buy(quantity, price)
+            return 0.0
+        return position.sell(quantity, price)
+
+    def uncovered(self, holdings):
+        """{coin_id: quantity} held but not covered by open lots"""
+        missing = {}
+        for coin_id, quantity in holdings.items():
+            quantity = float(quantity)
+            open_quantity = self.positions[coin_id].quantity if coin_id in self.positions else 0.0
+            if quantity - open_quantity > max(EPSILON, quantity * 1e-9):
+                missing[coin_id] = quantity - open_quantity
+        return missing
+
+    def seed(self, coin_id, quantity, unit_cost):
+        self.position(coin_id).seed(quantity, unit_cost)
+
+    def summary(self, prices, currency='usd'):
+        """
+        Realized/unrealized P&L and returns at the given prices
+
+        Args:
+            prices: get_crypto_prices()-style dict; coins without a price
+                    are valued at their cost
+
+        Returns:
+            dict: 'positions' per coin and portfolio 'totals'
+        """
+        positions = {}
+        realized = unrealized = cost = invested = 0.0
+        for coin_id, position in self.positions.items():
+            price = prices.get(coin_id, {}).get(currency)
+            value = position.quantity * price if price is not None else position.cost
+            open_pnl = value - position.cost
+            positions[coin_id] = {
+                'quantity': position.quantity,
+                'avg_cost': position.avg_cost,
+                'cost_basis': position.cost,
+                'market_value': value,
+                'unrealized': open_pnl,
+                'unrealized_pct': open_pnl / position.cost * 100 if position.cost else 0.0,
+                'realized': position.realized,
+                'return_pct': (position.realized + open_pnl) / position.invested * 100 if position.invested else 0.0
+            }
+            realized += position.realized
+            unrealized += open_pnl
+            cost += position.cost
+            invested += position.invested
+
+        total = realized + unrealized
+        return {
+            'method': self.method,
+            'positions': positions,
+            'totals': {
+                'realized': realized,
+                'unrealized': unrealized,
+                'total': total,
+                'cost_basis': cost,
+                'invested': invested,
+                'unrealized_pct': unrealized / cost * 100 if cost else 0.0,
+                'return_pct': total / invested * 100 if invested else 0.0
+            }
+        }
+
+    def to_dict(self):
+        return {coin_id: position.to_dict() for coin_id, position in self.positions.items()}
+
+    @classmethod
+    def from_dict(cls, data, method=PNL_METHOD):
+        return cls({coin_id: Position.from_dict(p) for coin_id, p in (data or {}).items()}, method)
+
+
+def average_buy_costs(transactions):
+    """{coin_id: quantity-weighted average buy price} over a transaction history"""
+    totals = {}
+    for transaction in transactions:
+        if transaction.get('type') != 'buy':
+            continue
+        quantity, amount = totals.get(transaction['coin_id'], (0.0, 0.0))
+        totals[transaction['coin_id']] = (quantity + float(transaction['quantity']),
+                                          amount + float(transaction['amount']))
+    return {coin_id: amount / quantity for coin_id, (quantity, amount) in totals.items() if quantity > 0}
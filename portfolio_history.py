@@ -0,0 +1,196 @@
+"""
+Portfolio value over time
+
+A user's transactions are folded once into a step-function timeline:
+event times plus the cash balance and per-coin quantity after each
+event. Valuing the portfolio over a window is then a vectorized pass:
+
+    holdings at every grid point   np.searchsorted over event times
+    coin prices at every point     np.interp over the cached series
+    value                          cash + sum(quantity * price)
+
+so cost is O(grid points x coins held), independent of how many trades
+the user made. Timelines and finished curves are cached per user; a new
+trade is appended to the cached timeline and only that user's curves
+are dropped.
+
+Prices come from the same cached per-coin series as analytics.py; a coin
+without a series is valued at its own trade prices.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import upstream
+from analytics import cached_series
+from cache import TTLCache
+
+STARTING_BALANCE = 10000.0
+ALLOWED_DAYS = (1, 7, 30, 90, 365)
+TIMELINE_TTL = 600
+CURVE_TTL = 300
+
+HOUR_MS = 3600 * 1000
+DAY_MS = 24 * HOUR_MS
+
+
+def _timestamp_ms(value):
+    return datetime.fromisoformat(str(value)).timestamp() * 1000
+
+
+class Timeline:
+    """Cash and per-coin quantity after every trade, in time order"""
+
+    def __init__(self, starting_balance=STARTING_BALANCE):
+        self.starting_balance = starting_balance
+        self.times = []
+        self.cash = []
+        self.coins = {}  # coin_id -> (event times, quantity after each event, trade prices)
+        self._balance = starting_balance
+
+    @classmethod
+    def from_transactions(cls, transactions, starting_balance=STARTING_BALANCE):
+        timeline = cls(starting_balance)
+        for transaction in sorted(transactions, key=lambda tx: tx['timestamp']):
+            timeline.apply(transaction)
+        return timeline
+
+    def apply(self, transaction):
+        """Append one trade (must not be older than the last one applied)"""
+        at = _timestamp_ms(transaction['timestamp'])
+        quantity = float(transaction['quantity'])
+        amount = float(transaction['amount'])
+        sign = 1 if transaction['type'] == 'buy' else -1
+
+        self._balance -= sign * amount
+        self.times.append(at)
+        self.cash.append(self._balance)
+
+        times, quantities, prices = self.coins.setdefault(transaction['coin_id'], ([], [], []))
+        held = quantities[-1] if quantities else 0.0
+        times.append(at)
+        quantities.append(max(held + sign * quantity, 0.0))
+        prices.append(float(transaction['price']))
+
+    def coins_held_between(self, start_ms, end_ms):
+        """Coins with a non-zero position at some point in [start_ms, end_ms]"""
+        held = []
+        for coin_id, (times, quantities, _) in self.coins.items():
+            at_start = np.searchsorted(times, start_ms, side='right') - 1
+            if (at_start >= 0 and quantities[at_start] > 0) or any(
+                    start_ms <= t <= end_ms and q > 0 for t, q in zip(times, quantities)):
+                held.append(coin_id)
+        return held
+
+    def values(self, grid, price_arrays):
+        """
+        Portfolio value at every grid timestamp
+
+        Args:
+            grid: Sorted timestamps (ms)
+            price_arrays: {coin_id: (timestamps, prices)}; missing coins are
+                          valued at their own trade prices
+        """
+        values = np.full(len(grid), self.starting_balance)
+        if self.times:
+            idx = np.searchsorted(self.times, grid, side='right') - 1
+            cash = np.asarray(self.cash)
+            values = np.where(idx >= 0, cash[np.maximum(idx, 0)], self.starting_balance)
+
+        for coin_id, (times, quantities, trade_prices) in self.coins.items():
+            idx = np.searchsorted(times, grid, side='right') - 1
+            held = np.where(idx >= 0, np.asarray(quantities)[np.maximum(idx, 0)], 0.0)
+            if not held.any():
+                continue
+            x, y = price_arrays.get(coin_id) or (np.asarray(times), np.asarray(trade_prices))
+            values = values + held * np.interp(grid, x, y)
+        return values
+
+
+class PortfolioCurves:
+    """Per-user cached timelines and value curves"""
+
+    def __init__(self, load_transactions, load_series, starting_balance=STARTING_BALANCE):
+        """
+        Args:
+            load_transactions: fn(username) -> all of the user's transactions
+            load_series: fn(coin_id, days, currency) -> [{'x': ms, 'y': price}], None
+                         without real data (never mock series)
+        """
+        self.load_transactions = load_transactions
+        self.load_series = load_series
+        self.starting_balance = starting_balance
+        self.timelines = TTLCache(max_entries=4096)
+        self.curves = TTLCache(max_entries=4096)
+        self._lock = threading.Lock()
+
+    def timeline(self, username):
+        return self.timelines.get_or_load(username, TIMELINE_TTL, lambda: Timeline.from_transactions(
+            self.load_transactions(username), self.starting_balance))
+
+    def record_trade(self, username, transaction):
+        """Append a new trade to the cached timeline and drop the user's curves"""
+        with self._lock:
+            entry = self.timelines.entry(username)
+            # A timeline loaded after the trade was stored already contains it
+            if entry is not None and _timestamp_ms(transaction['timestamp']) > (entry[0].times or [0])[-1]:
+                entry[0].apply(transaction)
+        for days in ALLOWED_DAYS:
+            self.curves.invalidate((username, days))
+
+    def forget(self, username):
+        """Drop a deleted user's timeline and curves"""
+        with self._lock:
+            self.timelines.invalidate(username)
+        for days in ALLOWED_DAYS:
+            self.curves.invalidate((username, days))
+
+    async def curve(self, username, days):
+        """
+        Value curve over the last `days` as Chart.js points
+
+        Returns:
+            dict: 'points' [{'x': ms, 'y': value}] plus start/end value and change
+        """
+        key = (username, days)
+        result = self.curves.get(key, CURVE_TTL)
+        if result is not None:
+            return result
+
+        started = time.perf_counter()
+        timeline = await upstream.run_async(self.timeline, username)
+        end_ms = time.time() * 1000
+        start_ms = end_ms - days * DAY_MS
+        step_ms = HOUR_MS if days <= 90 else DAY_MS
+        grid = np.arange(start_ms, end_ms + 1, step_ms)
+
+        with self._lock:
+            coins = timeline.coins_held_between(start_ms, end_ms)
+        loaded = await upstream.gather(**{
+            coin_id: upstream.run_async(cached_series, self.load_series, coin_id, days, 'usd')
+            for coin_id in coins
+        })
+        price_arrays = {coin_id: arrays for coin_id, arrays in loaded.items() if isinstance(arrays, tuple)}
+
+        with self._lock:
+            values = timeline.values(grid, price_arrays)
+        start_value = float(values[0])
+        end_value = float(values[-1])
+        result = {
+            'days': days,
+            'points': [{'x': int(x), 'y': round(float(y), 2)} for x, y in zip(grid, values)],
+            'start_value': round(start_value, 2),
+            'end_value': round(end_value, 2),
+            'change': round(end_value - start_value, 2),
+            'change_pct': round((end_value / start_value - 1) * 100, 2) if start_value else 0.0,
+            'coins': coins,
+            'missing': sorted(set(coins) - set(price_arrays)),
+            'compute_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+        # Coins without price history are valued at their trade prices; retry them next time
+        if not result['missing']:
+            self.curves.set(key, result)
+        return result
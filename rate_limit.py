@@ -0,0 +1,208 @@
+"""
+Token-bucket rate limiting for CryptoPulse API routes and login
+
+Every request to /api/* and every POST to the login/signup handlers
+spends tokens from two buckets: one per client IP and, when logged in,
+one per user. Routes have cost weights (a historical chart costs more
+than the currency list, a login attempt costs the most). When a bucket
+is empty the request gets 429 with Retry-After; all limited responses
+carry X-RateLimit-* headers.
+
+Buckets are [tokens, last_refill] pairs in an OrderedDict kept in
+least-recently-used order, so idle buckets are evicted from the front
+without scanning.
+
+Environment:
+    RATE_LIMIT_ENABLED      1/0 (default 1)
+    RATE_LIMIT_USER_RATE    tokens per second per user (default 5)
+    RATE_LIMIT_USER_BURST   bucket size per user (default 60)
+    RATE_LIMIT_IP_RATE      tokens per second per IP (default 10)
+    RATE_LIMIT_IP_BURST     bucket size per IP (default 120)
+    RATE_LIMIT_IDLE_SECONDS evict buckets idle this long (default 600)
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, request, session
+
+# Token cost per endpoint; unlisted /api/* endpoints cost DEFAULT_COST
+ROUTE_COSTS = {
+    'api_currencies': 1,
+    'api_prices': 2,
+    'api_historical': 5,
+    'market_stats': 3,
+    'trending': 3,
+    'fear_greed': 1,
+    'market_overview': 5,
+    'api_prices_multi': 5,
+    'api_historical_multi': 15,
+    'dashboard_bundle': 8,
+    'api_analytics': 15,
+    'api_screener': 2,
+    'api_portfolio_history': 10,
+    'api_backtest': 25,
+    'api_risk': 15,
+    'api_activity': 1,
+    'api_activity_stream': 5,
+    'api_leaderboard': 2,
+    'buy_coin': 2,
+    'sell_coin': 2,
+    'login': 10,
+    'user_login': 10,
+    'admin_login': 10,
+    'signup': 10,
+}
+DEFAULT_COST = 1
+
+# Form handlers that are limited on POST only
+FORM_ENDPOINTS = {'login', 'user_login', 'admin_login', 'signup'}
+
+
+class TokenBuckets:
+    """LRU-ordered token buckets sharing one rate and capacity"""
+
+    def __init__(self, rate, capacity, idle_seconds):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.idle_seconds = idle_seconds
+        self._buckets = OrderedDict()
+
+    def peek(self, key, now):
+        """Current token count for key after refill (does not store)"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.capacity
+        return min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+
+    def spend(self, key, cost, now):
+        """Deduct cost from key's bucket; caller must have checked peek()"""
+        tokens = self.peek(key, now) - cost
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [tokens, now]
+        else:
+            bucket[0] = tokens
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return tokens
+
+    def wait_time(self, tokens, cost):
+        """Seconds until a bucket holding `tokens` can afford `cost`"""
+        if tokens >= cost:
+            return 0.0
+        return (cost - tokens) / self.rate
+
+    def evict_idle(self, now):
+        """Drop buckets untouched for idle_seconds (oldest first)"""
+        cutoff = now - self.idle_seconds
+        evicted = 0
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[1] > cutoff:
+                break
+            self._buckets.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Flask request hooks enforcing per-user and per-IP token buckets"""
+
+    def __init__(self, app=None, user_rate=None, user_burst=None, ip_rate=None, ip_burst=None,
+                 idle_seconds=None, route_costs=None):
+        env = os.environ.get
+        self.enabled = env('RATE_LIMIT_ENABLED', '1') != '0'
+        idle_seconds = idle_seconds or int(env('RATE_LIMIT_IDLE_SECONDS', 600))
+        self.users = TokenBuckets(user_rate or float(env('RATE_LIMIT_USER_RATE', 5)),
+                                  user_burst or float(env('RATE_LIMIT_USER_BURST', 60)),
+                                  idle_seconds)
+        self.ips = TokenBuckets(ip_rate or float(env('RATE_LIMIT_IP_RATE', 10)),
+                                ip_burst or float(env('RATE_LIMIT_IP_BURST', 120)),
+                                idle_seconds)
+        self.route_costs = dict(ROUTE_COSTS, **(route_costs or {}))
+        self._lock = threading.Lock()
+        self._next_eviction = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.extensions['rate_limiter'] = self
+
+    def request_cost(self):
+        """Token cost of the current request, or None if it is not limited"""
+        endpoint = request.endpoint
+        if endpoint in FORM_ENDPOINTS:
+            return self.route_costs[endpoint] if request.method == 'POST' else None
+        if request.path.startswith('/api/'):
+            return self.route_costs.get(endpoint, DEFAULT_COST)
+        return None
+
+    def check(self, user_key, ip_key, cost, now=None):
+        """
+        Spend `cost` from the user and IP buckets if both can afford it
+
+        Returns:
+            tuple: (allowed, remaining, limit, retry_after_seconds)
+        """
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            if now >= self._next_eviction:
+                self.users.evict_idle(now)
+                self.ips.evict_idle(now)
+                self._next_eviction = now + 60
+
+            checks = [(self.ips, ip_key)]
+            if user_key is not None:
+                checks.append((self.users, user_key))
+
+            levels = [(buckets, key, buckets.peek(key, now)) for buckets, key in checks]
+            retry_after = max(buckets.wait_time(tokens, cost) for buckets, key, tokens in levels)
+            # The tightest bucket decides what the client is told
+            buckets, key, tokens = min(levels, key=lambda level: level[2] / level[0].capacity)
+
+            if retry_after > 0:
+                return False, max(0, int(tokens)), int(buckets.capacity), retry_after
+
+            for level_buckets, level_key, _ in levels:
+                level_buckets.spend(level_key, cost, now)
+            return True, max(0, int(tokens - cost)), int(buckets.capacity), 0.0
+
+    def _before_request(self):
+        if not self.enabled:
+            return None
+        cost = self.request_cost()
+        if cost is None:
+            return None
+
+        username = session.get('username')
+        user_key = f"user:{username}" if username else None
+        ip_key = f"ip:{request.remote_addr}"
+        allowed, remaining, limit, retry_after = self.check(user_key, ip_key, cost)
+        g.rate_limit = (remaining, limit, retry_after)
+
+        if not allowed:
+            response = jsonify({'error': 'Rate limit exceeded', 'retry_after': math.ceil(retry_after)})
+            response.status_code = 429
+            return response
+        return None
+
+    def _after_request(self, response):
+        state = g.pop('rate_limit', None)
+        if state is None:
+            return response
+        remaining, limit, retry_after = state
+        response.headers['X-RateLimit-Limit'] = str(limit)
+        response.headers['X-RateLimit-Remaining'] = str(remaining)
+        if retry_after > 0:
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            response.headers['X-RateLimit-Reset'] = str(math.ceil(retry_after))
+        return response
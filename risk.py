@@ -0,0 +1,214 @@
+"""
+Monte Carlo value-at-risk for user portfolios
+
+Estimates the mean and covariance of log returns for the coins a user
+holds from the cached historical series (analytics.cached_series),
+scaled to daily, and simulates correlated return paths:
+
+    z ~ N(0, I)            (paths x coins) per horizon increment
+    r = mu*dt + z @ L.T*sqrt(dt)   L = Cholesky factor of the daily covariance
+    P&L = position values @ (exp(cumulative r) - 1)
+
+Daily returns are modelled as i.i.d. normal, so a path only needs one
+draw per reported horizon (1 and 7 days by default): the increment from
+one horizon to the next is itself normal with the covariance scaled by
+its length. VaR is the loss at the (1 - confidence) P&L quantile,
+expected shortfall the mean loss beyond it. Cash is not at risk.
+
+Paths are generated in batches of RISK_BATCH; runs larger than
+RISK_POOL_PATHS are chunked across a process pool, each chunk with its
+own spawned seed. Results are cached per (holdings hash, price snapshot,
+paths).
+
+Environment:
+    RISK_HISTORY_DAYS  history used for the covariance (default 90)
+    RISK_BATCH         paths simulated per vectorized batch (default 50000)
+    RISK_POOL_PATHS    path count from which chunks go to processes (default 250000)
+    RISK_WORKERS       simulation processes (default: CPU count, 0 = run inline)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import upstream
+from analytics import align_series, cached_series
+from cache import TTLCache
+from fragments import snapshot_version
+
+RISK_HISTORY_DAYS = int(os.environ.get('RISK_HISTORY_DAYS', 90))
+RISK_BATCH = int(os.environ.get('RISK_BATCH', 50000))
+RISK_POOL_PATHS = int(os.environ.get('RISK_POOL_PATHS', 250000))
+RISK_WORKERS = int(os.environ.get('RISK_WORKERS', os.cpu_count() or 1))
+DEFAULT_PATHS = 100000
+MAX_PATHS = 1000000
+HORIZONS = (1, 7)
+CONFIDENCES = (0.95, 0.99)
+RISK_TTL = 300
+
+DAY_MS = 24 * 3600 * 1000
+
+risk_cache = TTLCache(max_entries=1024)
+
+
+def return_model(arrays_by_coin):
+    """
+    Daily mean and covariance of log returns
+
+    Returns:
+        tuple: (coins, mean[coins], covariance[coins, coins]); coins without
+        enough history are left out
+    """
+    coins, grid, prices = align_series(arrays_by_coin)
+    if len(grid) < 3:
+        return [], np.empty(0), np.empty((0, 0))
+    steps_per_day = DAY_MS / (grid[1] - grid[0])
+    returns = np.diff(np.log(np.maximum(prices, 1e-12)), axis=1)
+    mean = returns.mean(axis=1) * steps_per_day
+    covariance = np.atleast_2d(np.cov(returns)) * steps_per_day
+    return coins, mean, covariance
+
+
+def cholesky(covariance):
+    """Lower-triangular factor, repairing matrices that are not positive definite"""
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+
+def simulate(factor, mean, values, paths, horizons=HORIZONS, seed=None, batch=RISK_BATCH):
+    """
+    Simulated portfolio P&L at every horizon
+
+    Args:
+        factor: Cholesky factor of the daily covariance
+        mean: Daily mean log returns
+        values: Current value of each position
+        paths: Number of paths
+
+    Returns:
+        ndarray: P&L[paths, horizons]
+    """
+    rng = np.random.default_rng(seed)
+    steps = np.diff(horizons, prepend=0).astype(np.float64)
+    pnl = np.empty((paths, len(horizons)))
+    for start in range(0, paths, batch):
+        size = min(batch, paths - start)
+        cumulative = np.zeros((size, len(mean)))
+        for h, dt in enumerate(steps):
+            shocks = rng.standard_normal((size, len(mean))) @ factor.T
+            cumulative += mean * dt + shocks * np.sqrt(dt)
+            pnl[start:start + size, h] = np.expm1(cumulative) @ values
+    return pnl
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def _get_pool():
+    """Simulation process pool, created on first use and recreated after fork"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    with _lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ProcessPoolExecutor(max_workers=RISK_WORKERS)
+            _pool_pid = pid
+        return _pool
+
+
+def simulate_chunked(factor, mean, values, paths, horizons=HORIZONS, seed=None):
+    """simulate(), split across the process pool for large path counts"""
+    if RISK_WORKERS <= 0 or paths < RISK_POOL_PATHS:
+        return simulate(factor, mean, values, paths, horizons, seed)
+    chunks = max(RISK_WORKERS, -(-paths // RISK_BATCH))
+    sizes = [paths // chunks + (i < paths % chunks) for i in range(chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(chunks)
+    pool = _get_pool()
+    futures = [pool.submit(simulate, factor, mean, values, size, horizons, child)
+               for size, child in zip(sizes, seeds)]
+    return np.concatenate([future.result() for future in futures])
+
+
+def var_es(pnl, confidence):
+    """(VaR, expected shortfall) as positive losses at `confidence`"""
+    cutoff = np.quantile(pnl, 1 - confidence)
+    tail = pnl[pnl <= cutoff]
+    return float(-cutoff), float(-tail.mean()) if len(tail) else float(-cutoff)
+
+
+def holdings_hash(holdings):
+    payload = json.dumps({coin_id: round(float(q), 10) for coin_id, q in holdings.items()}, sort_keys=True)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
+
+
+async def portfolio_risk(holdings, prices, loader, paths=DEFAULT_PATHS, currency='usd', seed=None):
+    """
+    VaR and expected shortfall of a portfolio's holdings
+
+    Args:
+        holdings: {coin_id: quantity}
+        prices: get_crypto_prices()-style dict for the held coins
+        loader: fn(coin_id, days, currency) -> [{'x': ms, 'y': price}], None
+                without real data (never mock series)
+        paths: Number of simulated paths
+
+    Returns:
+        dict: per-horizon VaR/ES at each confidence level plus the exposure
+    """
+    held = {coin_id: float(q) for coin_id, q in holdings.items() if float(q) > 0}
+    key = (holdings_hash(held), snapshot_version(sorted(held), prices), paths, currency)
+    result = risk_cache.get(key, RISK_TTL)
+    if result is not None:
+        return result
+
+    started = time.perf_counter()
+    values = {coin_id: q * prices[coin_id][currency] for coin_id, q in held.items()
+              if prices.get(coin_id, {}).get(currency) is not None}
+    results = await upstream.gather(**{
+        coin_id: upstream.run_async(cached_series, loader, coin_id, RISK_HISTORY_DAYS, currency)
+        for coin_id in values
+    })
+    series = {coin_id: data for coin_id, data in results.items() if isinstance(data, tuple)}
+    coins, mean, covariance = return_model(series)
+
+    exposure = np.array([values[coin_id] for coin_id in coins])
+    total = float(exposure.sum())
+    horizons = {}
+    # Positions priced at 0 have nothing at risk (and no percentage base)
+    if coins and total > 0:
+        pnl = simulate_chunked(cholesky(covariance), mean, exposure, paths, HORIZONS, seed)
+        for h, days in enumerate(HORIZONS):
+            stats = {'expected_pnl': round(float(pnl[:, h].mean()), 2)}
+            for confidence in CONFIDENCES:
+                var, es = var_es(pnl[:, h], confidence)
+                level = int(round(confidence * 100))
+                stats[f'var_{level}'] = round(var, 2)
+                stats[f'es_{level}'] = round(es, 2)
+                stats[f'var_{level}_pct'] = round(var / total * 100, 2)
+            horizons[f'{days}d'] = stats
+
+    result = {
+        'currency': currency,
+        'paths': paths if horizons else 0,
+        'history_days': RISK_HISTORY_DAYS,
+        'exposure': round(total, 2),
+        'positions': {coin_id: round(values[coin_id], 2) for coin_id in coins},
+        'unmodeled': sorted(set(held) - set(coins)),
+        'daily_volatility_pct': {coin_id: round(float(np.sqrt(covariance[i, i])) * 100, 2)
+                                 for i, coin_id in enumerate(coins)},
+        'horizons': horizons,
+        'compute_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+    # Held coins without history are listed as unmodeled and retried next time
+    if not result['unmodeled']:
+        risk_cache.set(key, result)
+    return result
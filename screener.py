@@ -0,0 +1,173 @@
+"""
+Market screener over pre-built sorted indexes
+
+Each price snapshot (one get_crypto_prices() result per currency) is
+turned into a ScreenerIndex once: rows are sorted by every sort key
+(24h change, market cap, 24h volume, price) a single time, together
+with the key values for bisecting. A screener query is then a range
+lookup on the sort key plus a slice in the requested direction; other
+filters are applied while walking the already-sorted order, so no query
+sorts anything. Summary stats used by the analyst dashboard are
+computed in the same single build pass.
+
+Snapshots are cached per currency for SNAPSHOT_TTL seconds and built
+single-flight, so concurrent requests share one upstream call and one
+build.
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+from cache import TTLCache
+
+SNAPSHOT_TTL = 30
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+# sort key -> suffix of the CoinGecko /simple/price field for the currency
+SORT_KEYS = {
+    'change': '_24h_change',
+    'market_cap': '_market_cap',
+    'volume': '_24h_vol',
+    'price': '',
+}
+
+index_cache = TTLCache(max_entries=64)
+
+
+class ScreenerIndex:
+    """One price snapshot with rows pre-sorted by every sort key"""
+
+    def __init__(self, prices, currency):
+        self.prices = prices
+        self.currency = currency
+        self.rows = []
+        up = down = 0
+        change_total = 0.0
+        market_cap_total = 0.0
+        for coin_id, data in prices.items():
+            row = {'id': coin_id}
+            for key, suffix in SORT_KEYS.items():
+                value = data.get(f'{currency}{suffix}')
+                row[key] = float(value) if value is not None else None
+            self.rows.append(row)
+
+            change = row['change'] or 0
+            up += change > 0
+            down += change < 0
+            change_total += change
+            market_cap_total += row['market_cap'] or 0
+
+        self.stats = {
+            'total_coins': len(self.rows),
+            'coins_up_24h': up,
+            'coins_down_24h': down,
+            'total_market_cap': market_cap_total,
+            'avg_24h_change': change_total / len(self.rows) if self.rows else 0
+        }
+
+        # key -> (ascending values, rows in the same order, rows missing the key)
+        self.orders = {}
+        for key in SORT_KEYS:
+            present = sorted((row for row in self.rows if row[key] is not None), key=lambda row: row[key])
+            missing = [row for row in self.rows if row[key] is None]
+            self.orders[key] = ([row[key] for row in present], present, missing)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def top(self, key, n):
+        """n rows with the highest `key`, highest first"""
+        ordered = self.orders[key][1]
+        return ordered[-n:][::-1] if n > 0 else []
+
+    def bottom(self, key, n):
+        """n rows with the lowest `key`, in descending order"""
+        return self.orders[key][1][:n][::-1]
+
+    def query(self, sort='market_cap', descending=True, ranges=None, search=None,
+              offset=0, limit=DEFAULT_PER_PAGE):
+        """
+        Filter, order and paginate the snapshot without sorting
+
+        Args:
+            sort: One of SORT_KEYS
+            descending: Highest values first (rows missing the key come last)
+            ranges: {key: (min or None, max or None)}
+            search: Case-insensitive substring of the coin id
+            offset, limit: Page window
+
+        Returns:
+            tuple: (total matching rows, rows in the page)
+        """
+        values, ordered, missing = self.orders[sort]
+        ranges = {key: bounds for key, bounds in (ranges or {}).items() if bounds != (None, None)}
+
+        lo, hi = 0, len(values)
+        if sort in ranges:
+            low, high = ranges.pop(sort)
+            if low is not None:
+                lo = bisect_left(values, low)
+            if high is not None:
+                hi = bisect_right(values, high)
+            missing = []
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, max(hi, lo))
+
+        if not ranges and not search:
+            total = len(positions) + len(missing)
+            page = [ordered[i] for i in positions[offset:offset + limit]]
+            if len(page) < limit:
+                start = max(0, offset - len(positions))
+                page += missing[start:start + limit - len(page)]
+            return total, page
+
+        search = search.lower() if search else None
+
+        def matches(row):
+            if search and search not in row['id'].lower():
+                return False
+            for key, (low, high) in ranges.items():
+                value = row[key]
+                if value is None or (low is not None and value < low) or (high is not None and value > high):
+                    return False
+            return True
+
+        total = 0
+        page = []
+        for row in chain((ordered[i] for i in positions), missing):
+            if matches(row):
+                if offset <= total < offset + limit:
+                    page.append(row)
+                total += 1
+        return total, page
+
+
+def get_index(currency, load_prices):
+    """
+    Cached index for the current price snapshot in `currency`
+
+    Args:
+        load_prices: fn(currency) -> get_crypto_prices()-style dict
+    """
+    return index_cache.get_or_load(currency, SNAPSHOT_TTL,
+                                   lambda: ScreenerIndex(load_prices(currency) or {}, currency))
+
+
+def parse_query(args):
+    """Screener options from request args (sort, order, min_/max_<key>, q, page, per_page)"""
+    sort = args.get('sort', 'market_cap')
+    if sort not in SORT_KEYS:
+        sort = 'market_cap'
+    ranges = {}
+    for key in SORT_KEYS:
+        ranges[key] = (args.get(f'min_{key}', type=float), args.get(f'max_{key}', type=float))
+    page = max(args.get('page', 1, type=int), 1)
+    per_page = min(max(args.get('per_page', DEFAULT_PER_PAGE, type=int), 1), MAX_PER_PAGE)
+    return {
+        'sort': sort,
+        'descending': args.get('order', 'desc').lower() != 'asc',
+        'ranges': ranges,
+        'search': args.get('q', '').strip() or None,
+        'offset': (page - 1) * per_page,
+        'limit': per_page
+    }, page, per_page
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Production entry point for CryptoPulse
+
+Runs app.py (in-memory) or app_aws.py (DynamoDB) under gunicorn with a
+selectable worker model:
+
+    sync      one request per worker process (gunicorn 'sync')
+    threaded  a thread pool per worker process (gunicorn 'gthread')
+    gevent    cooperative greenlets per worker process (needs gevent)
+
+With preloading (the default) the application module is imported and
+warmed in the master before forking, so tracked coins, currency tables,
+seed users and compiled templates are shared copy-on-write by every
+worker. AWS clients and the password hashing pool are created lazily
+per process, so nothing socket- or process-bound crosses the fork.
+
+Usage:
+    python serve.py --app aws --mode threaded --workers 4 --threads 8
+    python serve.py --app local --mode gevent --bind 0.0.0.0:8000
+
+Environment equivalents: CRYPTOPULSE_APP, CRYPTOPULSE_MODE,
+WEB_CONCURRENCY (workers), CRYPTOPULSE_THREADS, CRYPTOPULSE_BIND.
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+APP_MODULES = {'local': 'app', 'aws': 'app_aws'}
+WORKER_CLASSES = {'sync': 'sync', 'threaded': 'gthread', 'gevent': 'gevent'}
+
+
+def load_app(app_name, config=None):
+    """Import the chosen application module and build it through its factory"""
+    module = importlib.import_module(APP_MODULES[app_name])
+    return module.create_app(config)
+
+
+def gunicorn_options(args):
+    """Translate CLI arguments into gunicorn settings"""
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': WORKER_CLASSES[args.mode],
+        'preload_app': args.preload,
+        'timeout': args.timeout,
+        'keepalive': 5,
+        'accesslog': '-' if args.access_log else None,
+        'errorlog': '-',
+    }
+    if args.mode == 'threaded':
+        options['threads'] = args.threads
+    if args.mode == 'gevent':
+        options['worker_connections'] = args.connections
+    return options
+
+
+def run_gunicorn(args, config=None):
+    from gunicorn.app.base import BaseApplication
+
+    class CryptoPulseServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if value is not None and key in self.cfg.settings:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            # Runs once in the master when preload_app is set, otherwise per worker
+            return load_app(args.app, config)
+
+    CryptoPulseServer(gunicorn_options(args)).run()
+
+
+def parse_args(argv=None):
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description='Serve CryptoPulse in production')
+    parser.add_argument('--app', choices=APP_MODULES, default=env('CRYPTOPULSE_APP', 'aws'))
+    parser.add_argument('--mode', choices=WORKER_CLASSES, default=env('CRYPTOPULSE_MODE', 'threaded'))
+    parser.add_argument('--workers', type=int, default=int(env('WEB_CONCURRENCY', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int, default=int(env('CRYPTOPULSE_THREADS', 8)))
+    parser.add_argument('--connections', type=int, default=int(env('CRYPTOPULSE_CONNECTIONS', 1000)),
+                        help='Max concurrent connections per gevent worker')
+    parser.add_argument('--bind', default=env('CRYPTOPULSE_BIND', '0.0.0.0:5000'))
+    parser.add_argument('--timeout', type=int, default=30)
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        help='Import the app in each worker instead of the master')
+    parser.add_argument('--access-log', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.mode == 'gevent':
+        try:
+            from gevent import monkey
+        except ImportError:
+            print("❌ gevent mode requires gevent: pip install gevent")
+            sys.exit(1)
+        # Patch before the app (and requests/ssl) are imported by preloading
+        monkey.patch_all()
+
+    print(f"🚀 Serving CryptoPulse ({args.app}) on {args.bind}: {args.workers} x {args.mode}"
+          f"{f' ({args.threads} threads)' if args.mode == 'threaded' else ''}"
+          f"{', preloaded' if args.preload else ''}")
+    run_gunicorn(args)
+
+
+if __name__ == '__main__':
+    main()
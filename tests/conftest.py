@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the apps off the network, the real journal directory and any live segment
+os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+os.environ.setdefault('AUTH_WORKERS', '0')
+os.environ.setdefault('MARKET_PLANE', '0')
+os.environ.setdefault('MARKET_PLANE_INTERVAL', '3600')
+os.environ.setdefault('LEADERBOARD_SYNC_SECONDS', '0')
+os.environ['MARKET_PLANE_NAME'] = f'cryptopulse_test_{os.getpid()}'
+os.environ['JOURNAL_DIR'] = tempfile.mkdtemp(prefix='cryptopulse-journal-')
+os.environ['COINGECKO_BUDGET_FILE'] = os.path.join(tempfile.mkdtemp(prefix='cryptopulse-budget-'), 'budget')
+
+
+@pytest.fixture
+def aws_app(monkeypatch):
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    moto = pytest.importorskip('moto')
+    with moto.mock_aws():
+        import aws_clients
+        dynamodb = aws_clients.get_resource('dynamodb')
+        for table, keys in (('CryptoPulse_Transactions', ('username', 'timestamp')),
+                            ('CryptoPulse_Portfolios', ('username',))):
+            indexes = {}
+            if table == 'CryptoPulse_Transactions':
+                indexes['GlobalSecondaryIndexes'] = [{
+                    'IndexName': 'RecentTrades', 'Projection': {'ProjectionType': 'ALL'},
+                    'KeySchema': [{'AttributeName': 'feed', 'KeyType': 'HASH'},
+                                  {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}]}]
+            attributes = keys + (('feed',) if indexes else ())
+            dynamodb.create_table(
+                TableName=table,
+                KeySchema=[{'AttributeName': key, 'KeyType': kind} for key, kind in zip(keys, ('HASH', 'RANGE'))],
+                AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'S'} for key in attributes],
+                BillingMode='PAY_PER_REQUEST', **indexes)
+        aws_clients.get_client('s3').create_bucket(Bucket='cryptopulse-files')
+        import app_aws
+        monkeypatch.setattr(app_aws.market_plane, 'enabled', False)
+        monkeypatch.setattr(app_aws, 'send_notification', lambda subject, message: None)
+        monkeypatch.setattr(app_aws, 'get_crypto_prices', lambda ids=None, currency='usd', priority='prices': {
+            coin_id: {currency: 200.0} for coin_id in ids or app_aws.tracked_coins})
+        yield app_aws
@@ -0,0 +1,62 @@
+from activity import ActivityFeed
+
+
+def trade(i, **extra):
+    return dict({'transaction_id': f't{i}', 'timestamp': f'2024-01-01T00:00:{i:02d}', 'type': 'buy',
+                 'coin_id': 'bitcoin', 'quantity': 1, 'amount': 100}, **extra)
+
+
+def test_ring_buffers_keep_the_newest_events():
+    feed = ActivityFeed(size=5, kind_size=3)
+    for i in range(8):
+        feed.record_trade(f'user{i}', trade(i))
+    feed.record('login', 'alice')
+    assert [event['username'] for event in feed.recent(10)] == ['alice', 'user7', 'user6', 'user5', 'user4']
+    assert [event['transaction_id'] for event in feed.recent(10, 'trade')] == ['t7', 't6', 't5']
+    assert feed.last_id == 9
+
+
+def test_backfill_fills_spare_capacity_older_than_live_events():
+    feed = ActivityFeed(size=10, kind_size=4)
+    feed.record_trade('live', trade(9))
+    stored = [dict(trade(i), username=f'user{i}') for i in (9, 8, 7, 6, 5, 4)]  # newest first
+    calls = []
+    feed.backfill('trade', lambda: calls.append(1) or stored)
+    feed.backfill('trade', lambda: calls.append(1) or stored)
+
+    assert calls == [1]
+    # t9 was already recorded live; the per-kind buffer stops at 4
+    assert [event['transaction_id'] for event in feed.recent(10, 'trade')] == ['t9', 't8', 't7', 't6']
+    assert [event['transaction_id'] for event in feed.recent(10)] == ['t9', 't8', 't7', 't6', 't5', 't4']
+    assert all(event['id'] == 0 for event in feed.recent(10)[1:])
+    # Backfilled events are never streamed as new
+    assert feed.since(feed.last_id) == []
+    assert [event['transaction_id'] for event in feed.since(0)] == ['t9']
+
+
+def test_aws_backfill_and_count_come_from_the_index_and_counter(aws_app, monkeypatch):
+    from decimal import Decimal
+    # One trade from before the index and counter existed
+    aws_app.transactions_table.put_item(Item={
+        'username': 'old', 'timestamp': '2024-01-01T00:00:00', 'transaction_id': 'legacy', 'type': 'buy',
+        'coin_id': 'bitcoin', 'quantity': Decimal('1'), 'price': Decimal('100'), 'amount': Decimal('100')})
+    aws_app.portfolios_table.put_item(Item={'username': 'alice', 'balance': Decimal('10000'), 'holdings': {}})
+    client = aws_app.app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'alice'
+    for amount in (10, 20, 30):
+        assert client.post('/api/buy_coin', json={'coin_id': 'bitcoin', 'amount': amount}).status_code == 200
+
+    def no_scan(**kwargs):
+        raise AssertionError('the feed backfill must not scan the table')
+    monkeypatch.setattr(aws_app.transactions_table, 'scan', no_scan)
+    assert [trade['amount'] for trade in aws_app.load_recent_trades()] == [30, 20, 10]
+    monkeypatch.undo()
+
+    # Seeded once by counting, then read from the counter
+    assert aws_app.transaction_count() == 4
+    monkeypatch.setattr(aws_app.transactions_table, 'scan', no_scan)
+    aws_app.store_transaction({'username': 'bob', 'timestamp': '2030-01-01T00:00:00', 'transaction_id': 'n',
+                               'type': 'buy', 'coin_id': 'bitcoin', 'quantity': Decimal('1'),
+                               'price': Decimal('1'), 'amount': Decimal('1')})
+    assert aws_app.transaction_count() == 5
@@ -0,0 +1,60 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import analytics
+import risk
+from backtest import mock_series
+
+
+def real_or_none(available):
+    calls = []
+
+    def loader(coin_id, days, currency):
+        calls.append(coin_id)
+        return mock_series(coin_id, days, seed=1) if coin_id in available else None
+    return loader, calls
+
+
+def test_failed_series_are_not_cached_or_modelled():
+    analytics.series_cache.invalidate()
+    analytics.analytics_cache.invalidate()
+    loader, calls = real_or_none({'bitcoin', 'ethereum'})
+    result = asyncio.run(analytics.market_analytics(['bitcoin', 'ethereum', 'solana'], 30, 24, 'usd', loader))
+    assert result['coins'] == ['bitcoin', 'ethereum']
+    assert result['missing'] == ['solana']
+
+    # The missing coin is asked for again; the good ones come from the series cache
+    asyncio.run(analytics.market_analytics(['bitcoin', 'ethereum', 'solana'], 30, 24, 'usd', loader))
+    assert calls.count('solana') == 2
+    assert calls.count('bitcoin') == 1
+
+
+def test_risk_lists_coins_without_history_as_unmodeled():
+    analytics.series_cache.invalidate()
+    risk.risk_cache.invalidate()
+    loader, _ = real_or_none({'bitcoin'})
+    prices = {'bitcoin': {'usd': 100.0}, 'solana': {'usd': 10.0}}
+    result = asyncio.run(risk.portfolio_risk({'bitcoin': 1, 'solana': 5}, prices, loader, paths=2000))
+    assert list(result['positions']) == ['bitcoin']
+    assert result['unmodeled'] == ['solana']
+    assert result['horizons']['1d']['var_99'] > 0
+
+
+def test_var_es_are_positive_losses():
+    pnl = np.arange(-99, 101, dtype=float)  # -99 .. 100
+    var, es = risk.var_es(pnl, 0.95)
+    assert var == pytest.approx(89.05)
+    assert es == pytest.approx(94.5)  # mean of -99 .. -90
+    assert es >= var
+
+
+def test_risk_with_zero_exposure_skips_simulation():
+    analytics.series_cache.invalidate()
+    risk.risk_cache.invalidate()
+    loader, _ = real_or_none({'bitcoin'})
+    result = asyncio.run(risk.portfolio_risk({'bitcoin': 1}, {'bitcoin': {'usd': 0.0}}, loader, paths=2000))
+    assert result['exposure'] == 0
+    assert result['horizons'] == {}
+    assert result['paths'] == 0
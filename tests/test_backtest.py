@@ -0,0 +1,41 @@
+import pytest
+
+import backtest
+
+
+def test_parse_grid_expands_and_casts():
+    grid = backtest.parse_grid('dca', {'interval': '24,48', 'amount': '100'})
+    assert grid == [{'interval': 24, 'amount': 100.0}, {'interval': 48, 'amount': 100.0}]
+
+
+@pytest.mark.parametrize('strategy,values', [
+    ('dca', {'interval': 'inf'}),
+    ('dca', {'interval': 'nan'}),
+    ('dca', {'amount': '-50'}),
+    ('momentum', {'threshold': '-0.2'}),
+    ('rebalance', {'target': '1.5'}),
+    ('rebalance', {'threshold': '1e400'}),
+])
+def test_parse_grid_rejects_out_of_range_values(strategy, values):
+    with pytest.raises(ValueError):
+        backtest.parse_grid(strategy, values)
+
+
+@pytest.fixture
+def client():
+    import app
+    return app.app.test_client()
+
+
+def test_backtest_requires_login(client):
+    assert client.get('/api/backtest?strategy=dca&sweep=1').status_code == 403
+
+
+@pytest.mark.parametrize('query', ['strategy=dca&interval=inf', 'strategy=dca&amount=-5',
+                                   'strategy=rebalance&target=2'])
+def test_backtest_bad_parameters_are_400(client, query):
+    with client.session_transaction() as session:
+        session['username'] = 'alice'
+    response = client.get(f'/api/backtest?{query}')
+    assert response.status_code == 400
+    assert 'Invalid parameter value' in response.get_json()['error']
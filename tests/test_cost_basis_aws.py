@@ -0,0 +1,45 @@
+from decimal import Decimal
+
+import pytest
+
+
+def test_legacy_holdings_are_seeded_and_sold_first(aws_app):
+    # A portfolio from before cost_basis existed, with its buy history
+    aws_app.portfolios_table.put_item(Item={'username': 'alice', 'balance': Decimal('9900'),
+                                            'holdings': {'bitcoin': Decimal('1')}})
+    aws_app.transactions_table.put_item(Item={
+        'username': 'alice', 'timestamp': '2024-01-01T00:00:00', 'transaction_id': 'old', 'type': 'buy',
+        'coin_id': 'bitcoin', 'quantity': Decimal('1'), 'price': Decimal('100'), 'amount': Decimal('100')})
+
+    client = aws_app.app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'alice'
+
+    totals = client.get('/api/pnl').json['totals']
+    assert totals['unrealized'] == pytest.approx(100.0)
+    stored = aws_app.get_user_portfolio('alice')['cost_basis']['bitcoin']
+    assert stored['lots'] == [[1, 100]]
+
+    assert client.post('/api/buy_coin', json={'coin_id': 'bitcoin', 'amount': 200}).status_code == 200
+    sold = client.post('/api/sell_coin', json={'coin_id': 'bitcoin', 'quantity': 1}).json
+    assert float(sold['transaction']['realized_pnl']) == pytest.approx(100.0)
+    lots = aws_app.get_user_portfolio('alice')['cost_basis']['bitcoin']['lots']
+    assert lots == [[1, 200]]
+
+
+def test_unpriced_legacy_holdings_are_migrated_once(aws_app, monkeypatch):
+    aws_app.portfolios_table.put_item(Item={'username': 'dave', 'balance': Decimal('100'),
+                                            'holdings': {'delisted': Decimal('3')}})
+    monkeypatch.setattr(aws_app, 'get_crypto_prices', lambda ids=None, currency='usd', priority='prices': {})
+    reads = []
+    real_history = aws_app.get_transaction_history
+    monkeypatch.setattr(aws_app, 'get_transaction_history', lambda username, *args, **kwargs:
+                        reads.append(username) or real_history(username, *args, **kwargs))
+
+    client = aws_app.app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'dave'
+    for _ in range(3):
+        assert client.get('/api/pnl').status_code == 200
+    assert reads == ['dave']
+    assert aws_app.get_user_portfolio('dave')['cost_basis']['delisted']['lots'] == [[3, 0]]
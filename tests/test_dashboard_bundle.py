@@ -0,0 +1,64 @@
+import gzip
+import json
+
+import pytest
+
+from dashboard_bundle import bundle_cache, history_days
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import app
+    asked = []
+
+    def historical(coin_id, days, currency):
+        asked.append(days)
+        return [{'x': i, 'y': float(days)} for i in range(200)]
+    monkeypatch.setattr(app, 'get_market_series', historical)
+    bundle_cache.invalidate()
+    yield app.app.test_client(), asked
+    bundle_cache.invalidate()
+
+
+def test_history_days_are_clamped_to_chart_ranges():
+    assert [history_days(raw) for raw in ('0', '1', '2', '7', '31', '365', '100000')] == [1, 1, 7, 7, 90, 365, 365]
+    with pytest.raises(ValueError):
+        history_days('week')
+
+
+def test_historical_widget_days_are_bounded(client):
+    client, asked = client
+    response = client.get('/api/dashboard_bundle?widgets=historical:bitcoin:100000,historical:bitcoin:week')
+    payload = response.get_json()
+    assert asked == [365]
+    assert payload['widgets']['historical:bitcoin:100000'][0]['y'] == 365.0
+    assert payload['errors'] == {'historical:bitcoin:week': 'Failed to load'}
+
+
+def test_missing_history_is_an_uncached_widget_error(client, monkeypatch):
+    import app
+    client, _ = client
+    monkeypatch.setattr(app, 'get_market_series', lambda coin_id, days, currency: None)
+    payload = client.get('/api/dashboard_bundle?widgets=historical:bitcoin:7').get_json()
+    assert payload['widgets'] == {}
+    assert payload['errors'] == {'historical:bitcoin:7': 'No data'}
+    assert bundle_cache.entry(('historical', 'usd', 'bitcoin', '7')) is None
+
+
+@pytest.mark.parametrize('method', ['GET', 'POST'])
+def test_bundle_is_compressed_through_http_cache(client, method):
+    client, _ = client
+    widgets = ['historical:bitcoin:7', 'historical:ethereum:30']
+    if method == 'GET':
+        response = client.get(f"/api/dashboard_bundle?widgets={','.join(widgets)}",
+                              headers={'Accept-Encoding': 'gzip;q=1, br;q=0'})
+    else:
+        response = client.post('/api/dashboard_bundle', json={'widgets': widgets},
+                               headers={'Accept-Encoding': 'gzip;q=1, br;q=0'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert 'ETag' not in response.headers
+    assert set(json.loads(gzip.decompress(response.data))['widgets']) == set(widgets)
+
+    plain = client.post('/api/dashboard_bundle', json={'widgets': widgets}, headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in plain.headers
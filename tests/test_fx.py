@@ -0,0 +1,40 @@
+import fx
+import upstream
+
+
+def test_rate_outage_costs_one_call_per_retry_interval(monkeypatch):
+    calls = []
+
+    def down(path, **kwargs):
+        calls.append(path)
+        raise upstream.UpstreamError('unavailable')
+    monkeypatch.setattr(upstream, 'fetch_json', down)
+    fx.rate_cache.invalidate()
+    try:
+        assert [fx.rate('eur') for _ in range(5)] == [fx.FALLBACK_RATES['eur']] * 5
+        assert calls == ['/exchange_rates']
+
+        # Once the retry interval has passed the next call tries again
+        value, stored_at = fx.rate_cache.entry('rates')
+        fx.rate_cache.set('rates', value, stored_at=stored_at - fx.RATES_RETRY)
+        fx.rate('eur')
+        assert len(calls) == 2
+    finally:
+        fx.rate_cache.invalidate()
+
+
+def test_failed_refresh_keeps_the_last_good_rates(monkeypatch):
+    fx.rate_cache.invalidate()
+    monkeypatch.setattr(upstream, 'fetch_json', lambda path, **kwargs: {
+        'rates': {'usd': {'value': 2.0}, 'eur': {'value': 1.0}}})
+    try:
+        assert fx.rate('eur') == 0.5
+        value, stored_at = fx.rate_cache.entry('rates')
+        fx.rate_cache.set('rates', value, stored_at=stored_at - fx.RATES_TTL)
+
+        def down(path, **kwargs):
+            raise upstream.UpstreamError('unavailable')
+        monkeypatch.setattr(upstream, 'fetch_json', down)
+        assert fx.rate('eur') == 0.5
+    finally:
+        fx.rate_cache.invalidate()
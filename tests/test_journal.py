@@ -0,0 +1,196 @@
+import os
+import pickle
+
+import pytest
+
+from journal import Journal, JournalError
+
+
+def counter_journal(directory, state):
+    journal = Journal(capture=lambda: dict(state), restore=lambda snapshot: (state.clear(), state.update(snapshot)),
+                      directory=str(directory), enabled=True, fsync=False, snapshot_records=10 ** 9)
+
+    def add(key, amount):
+        state[key] = state.get(key, 0) + amount
+        return state[key]
+    journal.register('add', add)
+    return journal
+
+
+def test_recovery_replays_the_wal(tmp_path):
+    state = {}
+    journal = counter_journal(tmp_path, state)
+    journal.open()
+    for i in range(5):
+        assert journal.apply('add', 'a', i) == sum(range(i + 1))
+    journal.close()
+
+    recovered = {}
+    result = counter_journal(tmp_path, recovered).recover()
+    assert recovered == state == {'a': 10}
+    assert result['records'] == 5
+
+
+def test_recovery_loads_the_snapshot_then_the_tail(tmp_path):
+    state = {}
+    journal = counter_journal(tmp_path, state)
+    journal.open()
+    journal.apply('add', 'a', 1)
+    journal.apply('add', 'b', 2)
+    assert journal.checkpoint(wait=True)
+    journal.apply('add', 'a', 3)
+    journal.close()
+
+    recovered = {}
+    result = counter_journal(tmp_path, recovered).recover()
+    assert recovered == {'a': 4, 'b': 2}
+    assert result == {'snapshot_lsn': 2, 'records': 1, 'ms': result['ms']}
+
+
+def test_torn_tail_is_dropped_and_truncated(tmp_path):
+    state = {}
+    journal = counter_journal(tmp_path, state)
+    journal.open()
+    journal.apply('add', 'a', 1)
+    journal.apply('add', 'a', 2)
+    journal.close()
+    segment = os.path.join(tmp_path, sorted(name for name in os.listdir(tmp_path) if name.startswith('wal-'))[-1])
+    intact = os.path.getsize(segment)
+    with open(segment, 'ab') as f:
+        f.write(b'\x40\x00\x00\x00partial record')
+
+    recovered = {}
+    reopened = counter_journal(tmp_path, recovered)
+    assert reopened.open()
+    assert recovered == {'a': 3}
+    assert os.path.getsize(segment) == intact
+    # New records go after the cut, so the next recovery sees all three
+    reopened.apply('add', 'a', 4)
+    reopened.close()
+    again = {}
+    counter_journal(tmp_path, again).recover()
+    assert again == {'a': 7}
+
+
+@pytest.fixture
+def app_journal(tmp_path):
+    import app
+    original = pickle.dumps(app.capture_state())
+
+    def make():
+        journal = Journal(capture=app.capture_state, restore=app.restore_state, directory=str(tmp_path),
+                          enabled=True, fsync=False, snapshot_records=10 ** 9)
+        journal.handlers = dict(app.journal.handlers)
+        return journal
+    yield app, make
+    app.restore_state(pickle.loads(original))
+
+
+def gone(app, username):
+    return all(username not in state for state in (app.user_portfolios, app.transaction_history,
+                                                   app.user_ledgers, app.user_favorites)) \
+        and app.leaderboard.rank(username) is None
+
+
+@pytest.mark.parametrize('snapshot', [False, True])
+def test_deleted_user_stays_deleted_after_recovery(app_journal, snapshot):
+    app, make = app_journal
+    original = pickle.dumps(app.capture_state())
+    journal = make()
+    journal.open()
+    journal.apply('add_user', 'temp@example.com', {'username': 'temp', 'password': 'x', 'role': 'user'})
+    journal.apply('trade', 'temp', {'type': 'buy', 'coin_id': 'bitcoin', 'quantity': 1.0, 'price': 100.0,
+                                    'amount': 100.0, 'timestamp': '2024-01-01T00:00:00'})
+    journal.apply('toggle_favorite', 'temp', 'bitcoin')
+    assert app.leaderboard.rank('temp') is not None
+    if snapshot:
+        journal.checkpoint(wait=True)
+    journal.apply('delete_user', 'temp@example.com')
+    assert 'temp@example.com' not in app.users_db
+    assert gone(app, 'temp')
+    assert app.trade_stats['count'] == sum(len(history) for history in app.transaction_history.values())
+    journal.close()
+
+    # Restart: the pre-test state plus whatever the journal holds
+    app.restore_state(pickle.loads(original))
+    result = make().recover()
+    assert result['records'] == (1 if snapshot else 4)
+    assert 'temp@example.com' not in app.users_db
+    assert not app.users_db.has_username('temp')
+    assert gone(app, 'temp')
+    assert app.trade_stats['count'] == sum(len(history) for history in app.transaction_history.values())
+
+
+def test_failed_write_fails_the_record_and_later_changes(tmp_path, monkeypatch):
+    import journal as journal_module
+    state = {}
+    journal = counter_journal(tmp_path, state)
+    journal.open()
+    journal.apply('add', 'a', 1)
+
+    real_write = os.write
+    calls = []
+
+    def fail_once(fd, data):
+        calls.append(len(data))
+        if len(calls) == 1:
+            raise OSError(28, 'No space left on device')
+        return real_write(fd, data)
+    monkeypatch.setattr(journal_module.os, 'write', fail_once)
+    with pytest.raises(JournalError):
+        journal.apply('add', 'a', 2)
+    # No later change is applied (or acknowledged) once a record is lost
+    with pytest.raises(JournalError):
+        journal.apply('add', 'a', 4)
+    assert state == {'a': 3}
+    assert journal.status()['failed']
+    journal.close()
+
+    recovered = {}
+    counter_journal(tmp_path, recovered).recover()
+    assert recovered == {'a': 1}
+
+
+def test_waiters_behind_a_failed_commit_are_not_marked_durable(tmp_path, monkeypatch):
+    import journal as journal_module
+    state = {}
+    journal = counter_journal(tmp_path, state)
+    journal.open()
+    # Two records pending, one flush that fails: neither caller may be acknowledged
+    with journal._lock:
+        journal.handlers['add']('a', 1)
+        journal.lsn += 1
+    def broken(fd, data):
+        raise OSError(5, 'Input/output error')
+    monkeypatch.setattr(journal_module.os, 'write', broken)
+    journal._pending += b'x'
+    journal._appended = journal.lsn
+    with pytest.raises(JournalError):
+        journal._wait_durable(journal.lsn)
+    with pytest.raises(JournalError):
+        journal._wait_durable(journal.lsn)
+    assert journal._durable == 0
+    assert journal._pending == b'x'
+
+
+def test_recovered_trades_refill_the_activity_feed(app_journal):
+    from activity import ActivityFeed
+    app, make = app_journal
+    original = pickle.dumps(app.capture_state())
+    journal = make()
+    journal.open()
+    for i, coin_id in enumerate(('bitcoin', 'ethereum', 'bitcoin')):
+        journal.apply('trade', 'feedtest', {'type': 'buy', 'coin_id': coin_id, 'quantity': 1.0, 'price': 10.0,
+                                            'amount': 10.0, 'timestamp': f'2999-01-01T00:00:0{i}'})
+    journal.close()
+
+    app.restore_state(pickle.loads(original))
+    make().recover()
+    feed = ActivityFeed()
+    feed.backfill('trade', app.recovered_trades)
+    newest = feed.recent(3, 'trade')
+    assert [(event['username'], event['coin_id'], event['timestamp']) for event in newest] == [
+        ('feedtest', 'bitcoin', '2999-01-01T00:00:02'),
+        ('feedtest', 'ethereum', '2999-01-01T00:00:01'),
+        ('feedtest', 'bitcoin', '2999-01-01T00:00:00'),
+    ]
@@ -0,0 +1,49 @@
+import threading
+from decimal import Decimal
+
+import pytest
+
+from leaderboard import Leaderboard
+
+
+def test_ranks_follow_trades_and_prices():
+    board = Leaderboard()
+    board.update_user('alice', 100, {'bitcoin': 1})
+    board.update_user('bob', 500, {})
+    board.update_prices({'bitcoin': {'usd': 1000.0}})
+    assert [entry['username'] for entry in board.top()] == ['alice', 'bob']
+    assert board.rank('bob') == {'rank': 2, 'username': 'bob', 'value': 500.0, 'of': 2}
+    board.remove_user('alice')
+    assert board.rank('alice') is None and len(board) == 1
+
+
+@pytest.mark.parametrize('module', ['app', 'app_aws'])
+def test_leaderboard_requires_login(module):
+    import importlib
+    client = importlib.import_module(module).app.test_client()
+    assert client.get('/api/leaderboard').status_code == 403
+
+
+def test_aws_leaderboard_is_rebuilt_off_the_request_path(aws_app, monkeypatch):
+    aws_app.portfolios_table.put_item(Item={'username': 'carol', 'balance': Decimal('700'), 'holdings': {}})
+    synced = threading.Event()
+    real_sync = aws_app.sync_leaderboard
+
+    def sync():
+        real_sync()
+        synced.set()
+    monkeypatch.setattr(aws_app, 'sync_leaderboard', sync)
+    monkeypatch.setattr(aws_app, 'LEADERBOARD_SYNC_SECONDS', 3600)
+    monkeypatch.setattr(aws_app, '_leaderboard_sync', {'pid': None})
+
+    def no_scan(**kwargs):
+        raise AssertionError('requests must not scan portfolios')
+    client = aws_app.app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'carol'
+    client.get('/api/leaderboard')  # starts the background rebuild
+    assert synced.wait(5)
+    monkeypatch.setattr(aws_app.portfolios_table, 'scan', no_scan)
+    body = client.get('/api/leaderboard').get_json()
+    assert body['me']['username'] == 'carol'
+    assert [t.name for t in threading.enumerate()].count('leaderboard-sync') == 1
@@ -0,0 +1,103 @@
+import os
+import threading
+
+import pytest
+
+import fx
+import upstream
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    import app
+    plane = app.market_plane
+    monkeypatch.setattr(plane, 'enabled', True)
+    monkeypatch.setattr(fx, 'rates', lambda: {'usd': 1.0, 'eur': 0.5})
+    monkeypatch.setattr(app, 'fetch_usd_prices', lambda coin_ids: {
+        coin_id: {'usd': 100.0 + i, 'usd_24h_change': 2.0, 'usd_market_cap': 1e9, 'usd_24h_vol': 1e6}
+        for i, coin_id in enumerate(coin_ids)
+    })
+    yield app
+    plane.unlink()
+
+
+def test_app_publishes_and_serves_snapshot(app_module, monkeypatch):
+    plane = app_module.market_plane
+    assert plane.name.endswith('_local')
+    plane.publish_coins(list(app_module.tracked_coins))
+    assert plane.refresh()
+
+    snapshot = plane.snapshot()
+    assert snapshot.ids == app_module.tracked_coins
+    assert snapshot.by_id['bitcoin'][1] == 100.0
+
+    def offline(*args, **kwargs):
+        raise AssertionError('non-trade prices should come from the plane')
+    monkeypatch.setattr(upstream, 'fetch_json', offline)
+    prices = app_module.get_crypto_prices(['bitcoin', 'ethereum'], 'eur')
+    assert prices['bitcoin'] == {'eur': 50.0, 'eur_24h_change': 2.0, 'eur_market_cap': 5e8, 'eur_24h_vol': 5e5}
+    assert prices['ethereum']['eur'] == 50.5
+
+
+def test_trades_bypass_plane(app_module, monkeypatch):
+    plane = app_module.market_plane
+    plane.publish_coins(list(app_module.tracked_coins))
+    plane.refresh()
+    monkeypatch.setattr(upstream, 'fetch_json', lambda path, params=None, **kwargs: {'bitcoin': {'usd': 1.0}})
+    assert app_module.get_crypto_prices(['bitcoin'], priority='trade') == {'bitcoin': {'usd': 1.0}}
+
+
+def test_coin_changes_reach_other_readers(app_module):
+    from market_plane import MarketPlane
+    plane = app_module.market_plane
+    plane.publish_coins(['bitcoin', 'ethereum'])
+
+    coins = []
+    changed = []
+    reader = MarketPlane(tracked_coins=coins, name=plane.name, enabled=True,
+                         on_coins_changed=lambda: changed.append(list(coins)))
+    reader._before_request()
+    assert coins == ['bitcoin', 'ethereum']
+    plane.publish_coins(['bitcoin', 'ethereum', 'solana'])
+    reader._before_request()
+    assert changed[-1] == ['bitcoin', 'ethereum', 'solana']
+    reader._shm.close()
+
+
+@pytest.fixture
+def unsized_segment():
+    """A segment as another worker leaves it between shm_open and ftruncate"""
+    import _posixshmem
+    name = f'cryptopulse_test_unsized_{os.getpid()}'
+    fd = _posixshmem.shm_open('/' + name, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o600)
+    yield name, fd
+    os.close(fd)
+    _posixshmem.shm_unlink('/' + name)
+
+
+def test_unsized_segment_reads_as_empty_plane(unsized_segment, monkeypatch):
+    import market_plane
+    name, fd = unsized_segment
+    monkeypatch.setattr(market_plane, 'ATTACH_TIMEOUT', 0.02)
+    plane = market_plane.MarketPlane(tracked_coins=['bitcoin'], name=name, enabled=True)
+    assert plane.snapshot() is None
+    plane._before_request()
+    assert plane.enabled
+
+    # Once the creator has sized it, the next request attaches normally
+    os.ftruncate(fd, market_plane.SEGMENT_SIZE)
+    plane._before_request()
+    assert plane.enabled
+    assert plane.snapshot().ids == ['bitcoin']
+    plane._shm.close()
+
+
+def test_attach_waits_for_the_creator_to_size_the_segment(unsized_segment):
+    import market_plane
+    name, fd = unsized_segment
+    timer = threading.Timer(0.05, os.ftruncate, (fd, market_plane.SEGMENT_SIZE))
+    timer.start()
+    plane = market_plane.MarketPlane(name=name, enabled=True)
+    assert plane._segment().size >= market_plane.SEGMENT_SIZE
+    timer.join()
+    plane._shm.close()
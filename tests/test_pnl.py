@@ -0,0 +1,88 @@
+import gzip
+import json
+from decimal import Decimal
+
+import pytest
+
+import pnl
+from pnl import Ledger, Position, average_buy_costs
+from transaction_archive import decode_batch, encode_batch
+
+
+def test_fifo_sells_consume_oldest_lots():
+    ledger = Ledger(method='fifo')
+    ledger.record_trade('buy', 'bitcoin', 1.0, 100.0)
+    ledger.record_trade('buy', 'bitcoin', 1.0, 200.0)
+    assert ledger.record_trade('sell', 'bitcoin', 1.5, 300.0) == pytest.approx(1.5 * 300 - (100 + 0.5 * 200))
+    position = ledger.positions['bitcoin']
+    assert list(position.lots) == [[0.5, 200.0]]
+    assert position.cost == pytest.approx(100.0)
+
+
+def test_average_method_keeps_one_lot():
+    position = Position('average')
+    position.buy(1.0, 100.0)
+    position.buy(1.0, 200.0)
+    assert list(position.lots) == [[2.0, 150.0]]
+    assert position.sell(1.0, 150.0) == pytest.approx(0.0)
+
+
+def test_same_price_buys_extend_the_newest_lot():
+    position = Position('fifo')
+    for _ in range(10):
+        position.buy(0.1, 100.0)
+    assert len(position.lots) == 1
+    assert position.lots[0][0] == pytest.approx(1.0)
+
+
+def test_lot_count_is_capped_without_losing_cost(monkeypatch):
+    monkeypatch.setattr(pnl, 'PNL_MAX_LOTS', 5)
+    position = Position('fifo')
+    for i in range(50):
+        position.buy(1.0, 100.0 + i)
+    assert len(position.lots) == 5
+    assert sum(q for q, _ in position.lots) == pytest.approx(50.0)
+    assert sum(q * c for q, c in position.lots) == pytest.approx(position.cost)
+    # The oldest lots stay exact
+    assert list(position.lots)[:4] == [[1.0, 100.0], [1.0, 101.0], [1.0, 102.0], [1.0, 103.0]]
+
+
+def test_ledger_round_trips_through_dict():
+    ledger = Ledger(method='fifo')
+    ledger.record_trade('buy', 'ethereum', 2.0, 10.0)
+    ledger.record_trade('sell', 'ethereum', 1.0, 15.0)
+    restored = Ledger.from_dict(json.loads(json.dumps(ledger.to_dict())))
+    assert restored.summary({}) == ledger.summary({})
+
+
+def test_seeding_untracked_holdings():
+    transactions = [
+        {'type': 'buy', 'coin_id': 'bitcoin', 'quantity': 1, 'amount': 100},
+        {'type': 'buy', 'coin_id': 'bitcoin', 'quantity': 3, 'amount': 500},
+        {'type': 'sell', 'coin_id': 'bitcoin', 'quantity': 1, 'amount': 900},
+    ]
+    assert average_buy_costs(transactions) == {'bitcoin': 150.0}
+
+    ledger = Ledger(method='fifo')
+    ledger.record_trade('buy', 'bitcoin', 1.0, 200.0)
+    missing = ledger.uncovered({'bitcoin': 3.0, 'ethereum': 0.0})
+    assert missing == {'bitcoin': pytest.approx(2.0)}
+    ledger.seed('bitcoin', missing['bitcoin'], 150.0)
+    assert ledger.uncovered({'bitcoin': 3.0}) == {}
+    # Seeded lots are older than tracked ones, so they are sold first
+    assert ledger.record_trade('sell', 'bitcoin', 2.0, 150.0) == pytest.approx(0.0)
+    totals = ledger.summary({'bitcoin': {'usd': 250.0}})['totals']
+    assert totals['unrealized'] == pytest.approx(50.0)
+
+
+def test_archive_keeps_realized_pnl():
+    items = [
+        {'username': 'alice', 'timestamp': '2024-01-01T00:00:00', 'transaction_id': 'a', 'type': 'buy',
+         'coin_id': 'bitcoin', 'quantity': Decimal('1'), 'price': Decimal('100'), 'amount': Decimal('100')},
+        {'username': 'alice', 'timestamp': '2024-01-02T00:00:00', 'transaction_id': 'b', 'type': 'sell',
+         'coin_id': 'bitcoin', 'quantity': Decimal('1'), 'price': Decimal('150'), 'amount': Decimal('150'),
+         'realized_pnl': Decimal('50')},
+    ]
+    rows = decode_batch(encode_batch(items))
+    assert rows == items
+    assert 'realized_pnl' in json.loads(gzip.decompress(encode_batch(items)))['columns']
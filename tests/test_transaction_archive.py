@@ -0,0 +1,51 @@
+import transaction_archive
+
+
+class FakeTable:
+    """Scan pages of items grouped by username, as DynamoDB returns them"""
+
+    def __init__(self, items, page_size=7):
+        self.pages = [items[i:i + page_size] for i in range(0, len(items), page_size)]
+
+    def scan(self, ExclusiveStartKey=0, **kwargs):
+        response = {'Items': self.pages[ExclusiveStartKey]}
+        if ExclusiveStartKey + 1 < len(self.pages):
+            response['LastEvaluatedKey'] = ExclusiveStartKey + 1
+        return response
+
+
+def item(user, month, i):
+    return {'username': user, 'timestamp': f'2023-{month:02d}-01T00:00:{i:02d}', 'transaction_id': f'{user}{month}{i}'}
+
+
+def archive(monkeypatch, items, max_buffered):
+    uploads = []
+    monkeypatch.setattr(transaction_archive, 'MAX_BUFFERED_ROWS', max_buffered)
+    monkeypatch.setattr(transaction_archive, '_delete_items', lambda table, pending: None)
+
+    def upload_batch(pending, bucket=None, s3_client=None):
+        uploads.append([(row['username'], row['timestamp'][:7]) for row in pending])
+        return 'key', 1
+    monkeypatch.setattr(transaction_archive, 'upload_batch', upload_batch)
+    summary = transaction_archive.archive_transactions(table=FakeTable(items))
+    return summary, uploads
+
+
+def test_partitions_flush_when_the_user_changes(monkeypatch):
+    items = [item(user, month, i) for user in ('alice', 'bob') for month in (1, 2) for i in range(5)]
+    summary, uploads = archive(monkeypatch, items, max_buffered=1000)
+    assert summary['items'] == 20
+    # alice's two months are uploaded before any of bob's items arrive
+    assert [batch[0] for batch in uploads] == [('alice', '2023-01'), ('alice', '2023-02'),
+                                               ('bob', '2023-01'), ('bob', '2023-02')]
+    assert all(len(set(batch)) == 1 and len(batch) == 5 for batch in uploads)
+
+
+def test_buffer_is_bounded_within_one_user(monkeypatch):
+    items = [item('alice', month, i) for month in range(1, 7) for i in range(10)]
+    summary, uploads = archive(monkeypatch, items, max_buffered=15)
+    assert summary['items'] == 60
+    assert sum(len(batch) for batch in uploads) == 60
+    assert all(len(set(batch)) == 1 for batch in uploads)
+    # Each upload happens with at most max_buffered + 1 rows held
+    assert max(len(batch) for batch in uploads) <= 16
@@ -0,0 +1,47 @@
+import os
+
+from upstream_budget import RequestBudget, SharedBucket
+
+
+def drain(budget, priority='trade'):
+    granted = 0
+    while budget.acquire(priority):
+        granted += 1
+    return granted
+
+
+def test_workers_on_one_file_share_the_burst(tmp_path):
+    path = str(tmp_path / 'budget')
+    # Barely any refill, no waiting: each grant is a token from the burst
+    first = RequestBudget(calls_per_minute=0.001, burst=10, path=path)
+    second = RequestBudget(calls_per_minute=0.001, burst=10, path=path)
+    assert drain(first, 'market') == 4  # keeps the 60% market reserve
+    assert drain(second, 'history') == 2  # the market calls count here too
+    assert second.snapshot()['tokens_available'] < 4.1
+
+
+def test_forked_worker_spends_the_same_budget(tmp_path):
+    budget = RequestBudget(calls_per_minute=0.001, burst=10, path=str(tmp_path / 'budget'))
+    assert budget.acquire('market')  # opens the state file before the fork
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if drain(budget, 'market') == 3 else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert not budget.acquire('market')
+
+
+def test_empty_path_keeps_a_per_process_bucket():
+    budget = RequestBudget(calls_per_minute=0.001, burst=10, path='')
+    assert not isinstance(budget.buckets, SharedBucket)
+    assert budget.snapshot()['shared'] is False
+    assert drain(budget, 'market') == 4
+
+
+def test_unusable_budget_file_falls_back_to_a_per_process_bucket(tmp_path):
+    blocker = tmp_path / 'not-a-directory'
+    blocker.write_text('')
+    budget = RequestBudget(calls_per_minute=0.001, burst=10, path=str(blocker / 'budget'))
+    assert drain(budget, 'market') == 4
+    assert budget.snapshot()['shared'] is False
+
@@ -0,0 +1,36 @@
+import pytest
+
+from user_directory import UserDirectory
+
+
+def make_directory():
+    return UserDirectory({
+        'alice@example.com': {'username': 'alice', 'role': 'user'},
+        'bob@example.com': {'username': 'bob', 'role': 'admin'},
+    })
+
+
+def test_indexes_follow_inserts_and_deletes():
+    users = make_directory()
+    assert users.get_by_username('bob')['role'] == 'admin'
+    assert users.role_counts()['user'] == 1
+    del users['alice@example.com']
+    assert not users.has_username('alice')
+    assert users.count_role('user') == 0
+
+
+def test_rejected_rename_leaves_indexes_intact():
+    users = make_directory()
+    with pytest.raises(ValueError):
+        users.update_user('alice@example.com', username='bob')
+    assert users.email_for_username('alice') == 'alice@example.com'
+    assert users.email_for_username('bob') == 'bob@example.com'
+    assert 'alice@example.com' in users.emails_with_role('user')
+    assert users['alice@example.com']['username'] == 'alice'
+
+
+def test_role_change_moves_user_between_role_sets():
+    users = make_directory()
+    users.update_user('alice@example.com', role='analyst')
+    assert users.emails_with_role('analyst') == {'alice@example.com'}
+    assert users.count_role('user') == 0
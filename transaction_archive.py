@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Cold-history archival for CryptoPulse transactions
+
+Moves CryptoPulse_Transactions items older than ARCHIVE_AFTER_DAYS into
+S3_BUCKET as gzip-compressed, column-oriented JSON objects partitioned
+by user and month:
+
+    <prefix>/username=<user>/month=<YYYY-MM>/<first_ts>_<last_ts>_<id>.json.gz
+
+The first/last timestamps in the key let readers skip objects outside a
+requested range without downloading them. Items are only deleted from
+DynamoDB after their object has been uploaded; if a run dies in between,
+the next run archives them again and readers drop the duplicates by
+transaction_id.
+
+Set S3_ENDPOINT_URL / DYNAMODB_ENDPOINT_URL to run against a local
+stand-in (MinIO, LocalStack, moto_server).
+
+Usage:
+    python transaction_archive.py --older-than-days 180 [--dry-run]
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from urllib.parse import quote
+
+from aws_clients import get_client, get_table
+
+S3_BUCKET = os.environ.get('S3_BUCKET', 'cryptopulse-files')
+ARCHIVE_PREFIX = os.environ.get('ARCHIVE_PREFIX', 'archive/transactions')
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+TRANSACTIONS_TABLE = os.environ.get('TRANSACTIONS_TABLE', 'CryptoPulse_Transactions')
+
+# Rows per archive object before a partition is flushed early
+MAX_ROWS_PER_OBJECT = 50000
+
+# Rows buffered across all partitions before the largest is flushed early
+MAX_BUFFERED_ROWS = 100000
+
+# Multipart settings for upload_fileobj
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+
+FORMAT_VERSION = 1
+COLUMNS = ['username', 'timestamp', 'transaction_id', 'type', 'coin_id', 'quantity', 'price', 'amount',
+           'realized_pnl']
+NUMERIC_COLUMNS = {'quantity', 'price', 'amount', 'realized_pnl'}
+
+
+def archive_cutoff(older_than_days=None, now=None):
+    """ISO timestamp before which transactions are considered cold"""
+    if older_than_days is None:
+        older_than_days = ARCHIVE_AFTER_DAYS
+    now = now or datetime.now()
+    return (now - timedelta(days=older_than_days)).isoformat()
+
+
+def _partition_prefix(username, month=None):
+    prefix = f"{ARCHIVE_PREFIX}/username={quote(username, safe='')}/"
+    if month:
+        prefix += f"month={month}/"
+    return prefix
+
+
+def _compact_ts(timestamp):
+    """2026-02-10T14:30:45.123456 -> 20260210T143045123456 (sortable, key-safe)"""
+    return timestamp.replace('-', '').replace(':', '').replace('.', '')
+
+
+def encode_batch(items):
+    """Encode transaction items as gzip-compressed column-oriented JSON"""
+    items = sorted(items, key=lambda item: item['timestamp'])
+    columns = {name: [] for name in COLUMNS}
+    for item in items:
+        for name in COLUMNS:
+            value = item.get(name)
+            # Keep DynamoDB numbers exact by storing them as strings
+            if name in NUMERIC_COLUMNS and value is not None:
+                value = str(value)
+            columns[name].append(value)
+
+    document = {'version': FORMAT_VERSION, 'count': len(items), 'columns': columns}
+    raw = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    return gzip.compress(raw, compresslevel=6)
+
+
+def decode_batch(body):
+    """Decode an archive object back into transaction dicts (numbers as Decimal)"""
+    document = json.loads(gzip.decompress(body))
+    columns = document['columns']
+    names = [name for name in COLUMNS if name in columns]
+    rows = []
+    for values in zip(*(columns[name] for name in names)):
+        row = {}
+        for name, value in zip(names, values):
+            # Columns a row never had (realized_pnl on buys) are stored as null
+            if value is None:
+                continue
+            if name in NUMERIC_COLUMNS:
+                value = Decimal(value)
+            row[name] = value
+        rows.append(row)
+    return rows
+
+
+def upload_batch(items, bucket=None, s3_client=None):
+    """Write one partition batch to S3 with a multipart-capable upload; returns (key, compressed size in bytes)"""
+    from boto3.s3.transfer import TransferConfig
+
+    s3_client = s3_client or get_client('s3')
+    bucket = bucket or S3_BUCKET
+    items = sorted(items, key=lambda item: item['timestamp'])
+    username = items[0]['username']
+    month = items[0]['timestamp'][:7]
+    key = (f"{_partition_prefix(username, month)}"
+           f"{_compact_ts(items[0]['timestamp'])}_{_compact_ts(items[-1]['timestamp'])}_"
+           f"{uuid.uuid4().hex[:8]}.json.gz")
+
+    body = encode_batch(items)
+    transfer_config = TransferConfig(multipart_threshold=MULTIPART_THRESHOLD,
+                                     multipart_chunksize=MULTIPART_CHUNKSIZE)
+    s3_client.upload_fileobj(io.BytesIO(body), bucket, key,
+                             ExtraArgs={'ContentType': 'application/gzip',
+                                        'Metadata': {'rows': str(len(items)),
+                                                     'format-version': str(FORMAT_VERSION)}},
+                             Config=transfer_config)
+    return key, len(body)
+
+
+def _delete_items(table, items):
+    with table.batch_writer() as batch:
+        for item in items:
+            batch.delete_item(Key={'username': item['username'], 'timestamp': item['timestamp']})
+
+
+def archive_transactions(older_than_days=None, bucket=None, table=None, s3_client=None, dry_run=False):
+    """
+    Move transactions older than the cutoff from DynamoDB to S3
+
+    Args:
+        older_than_days: Age threshold (defaults to ARCHIVE_AFTER_DAYS)
+        bucket: Target bucket (defaults to S3_BUCKET)
+        table: Transactions Table object (defaults to the shared one)
+        s3_client: S3 client (defaults to the shared one)
+        dry_run: Only count what would be archived
+
+    Returns:
+        dict: Summary with items, objects, bytes and elapsed seconds
+    """
+    from boto3.dynamodb.conditions import Attr
+
+    table = table or get_table(TRANSACTIONS_TABLE)
+    cutoff = archive_cutoff(older_than_days)
+    started = time.perf_counter()
+    summary = {'cutoff': cutoff, 'items': 0, 'objects': 0, 'bytes': 0, 'dry_run': dry_run}
+
+    # (username, month) -> pending items
+    partitions = {}
+    buffered = 0
+    current_user = None
+
+    def flush(partition_key):
+        nonlocal buffered
+        pending = partitions.pop(partition_key, [])
+        if not pending:
+            return
+        buffered -= len(pending)
+        summary['items'] += len(pending)
+        if dry_run:
+            return
+        key, size = upload_batch(pending, bucket=bucket, s3_client=s3_client)
+        _delete_items(table, pending)
+        summary['objects'] += 1
+        summary['bytes'] += size
+        print(f"📦 Archived {len(pending)} transactions to s3://{bucket or S3_BUCKET}/{key}")
+
+    scan_kwargs = {'FilterExpression': Attr('timestamp').lt(cutoff)}
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            # A scan returns each username's items together, so once the user
+            # changes the previous user's partitions are complete
+            if item['username'] != current_user:
+                for partition_key in list(partitions):
+                    flush(partition_key)
+                current_user = item['username']
+            partition_key = (item['username'], item['timestamp'][:7])
+            partitions.setdefault(partition_key, []).append(item)
+            buffered += 1
+            if len(partitions[partition_key]) >= MAX_ROWS_PER_OBJECT:
+                flush(partition_key)
+            elif buffered > MAX_BUFFERED_ROWS:
+                flush(max(partitions, key=lambda k: len(partitions[k])))
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    for partition_key in list(partitions):
+        flush(partition_key)
+
+    summary['elapsed'] = time.perf_counter() - started
+    return summary
+
+
+def _list_keys(s3_client, bucket, prefix):
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj['Key']
+
+
+def get_archived_transactions(username, start=None, end=None, bucket=None, s3_client=None):
+    """
+    Read a user's archived transactions in [start, end] (ISO timestamps, inclusive)
+
+    Only objects whose month partition and key range overlap the request are
+    downloaded. Results are sorted newest first and de-duplicated.
+    """
+    s3_client = s3_client or get_client('s3')
+    bucket = bucket or S3_BUCKET
+    start_compact = _compact_ts(start) if start else None
+    end_compact = _compact_ts(end) if end else None
+
+    rows = {}
+    for key in _list_keys(s3_client, bucket, _partition_prefix(username)):
+        month = key.rsplit('/', 2)[-2].split('=', 1)[-1]
+        if start and month < start[:7]:
+            continue
+        if end and month > end[:7]:
+            continue
+
+        first_ts, last_ts = key.rsplit('/', 1)[-1].split('_')[:2]
+        if start_compact and last_ts < start_compact:
+            continue
+        if end_compact and first_ts > end_compact:
+            continue
+
+        body = s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+        for row in decode_batch(body):
+            if start and row['timestamp'] < start:
+                continue
+            if end and row['timestamp'] > end:
+                continue
+            rows[row.get('transaction_id') or row['timestamp']] = row
+
+    return sorted(rows.values(), key=lambda row: row['timestamp'], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive old CryptoPulse transactions to S3')
+    parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--bucket', default=S3_BUCKET)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    print("🗄️  CryptoPulse Transaction Archival")
+    print("=" * 50)
+    print(f"Cutoff: {archive_cutoff(args.older_than_days)}  Bucket: {args.bucket}")
+
+    summary = archive_transactions(args.older_than_days, bucket=args.bucket, dry_run=args.dry_run)
+
+    if args.dry_run:
+        print(f"🔍 Dry run: {summary['items']} transactions would be archived")
+    else:
+        print(f"✅ Archived {summary['items']} transactions into {summary['objects']} objects "
+              f"({summary['bytes'] / 1024:.1f} KiB) in {summary['elapsed']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
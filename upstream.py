@@ -0,0 +1,326 @@
+"""
+Upstream HTTP layer for CoinGecko
+
+All CoinGecko calls go through one pooled requests.Session per process,
+so connections are reused (HTTP/1.1 keep-alive) instead of paying a new
+TCP + TLS handshake on every call. On top of the pool:
+
+- per-endpoint (connect, read) timeouts instead of a flat 10 seconds
+- retries with full-jitter exponential backoff for connection errors,
+  timeouts, 429 and 5xx responses
+- a circuit breaker: after BREAKER_FAILURES consecutive failed calls
+  every call fails fast for BREAKER_COOLDOWN seconds, then a single
+  probe is let through (half-open) to decide whether to close again
+- a priority-aware call budget (upstream_budget) so trade pricing is
+  never starved by charts and widgets under the CoinGecko rate limit
+- fetch_json() remembers the last good response per request and serves
+  it (or a caller-supplied fallback such as mock data) while upstream
+  is unhealthy or the budget is too tight for the caller's class
+
+The async API (fetch_json_async / run_async / gather) lets async Flask
+views fan out independent upstream calls concurrently: page latency
+becomes the slowest call instead of the sum of all calls. requests is
+blocking, so async calls run on a bounded thread pool shared by every
+event loop in the process; its size is the global cap on in-flight
+upstream requests.
+
+Environment:
+    UPSTREAM_POOL_SIZE     keep-alive connections per host (default 20)
+    UPSTREAM_CONCURRENCY   max in-flight async upstream calls (default 16)
+    UPSTREAM_RETRIES       retries after the first attempt (default 2)
+    BREAKER_FAILURES       consecutive failures that open the breaker (default 5)
+    BREAKER_COOLDOWN       seconds the breaker stays open (default 30)
+    COINGECKO_CALLS_PER_MINUTE, COINGECKO_BURST   see upstream_budget
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import TTLCache
+from upstream_budget import budget, priority_for
+
+COINGECKO_API = 'https://api.coingecko.com/api/v3'
+
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 20))
+UPSTREAM_CONCURRENCY = int(os.environ.get('UPSTREAM_CONCURRENCY', 16))
+UPSTREAM_RETRIES = int(os.environ.get('UPSTREAM_RETRIES', 2))
+BREAKER_FAILURES = int(os.environ.get('BREAKER_FAILURES', 5))
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', 30))
+
+# (connect, read) timeouts by path prefix; first match wins
+ENDPOINT_TIMEOUTS = [
+    ('/simple/price', (2, 4)),
+    ('/coins/', (2, 8)),
+    ('/global', (2, 5)),
+    ('/search/trending', (2, 5)),
+]
+DEFAULT_TIMEOUT = (3, 10)
+
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Last good JSON per (path, params) for fail-fast fallbacks
+LAST_GOOD_MAX_AGE = 24 * 3600
+# Trades must not be priced from old data
+TRADE_MAX_STALE = 60
+
+
+class UpstreamError(Exception):
+    """Upstream call failed after retries"""
+
+
+class UpstreamUnavailable(UpstreamError):
+    """Circuit breaker is open; the call was not attempted"""
+
+
+class BudgetExhausted(UpstreamError):
+    """No call budget left for this priority class; the call was not attempted"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe"""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.total_failures = 0
+        self.total_short_circuits = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go upstream now"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.total_short_circuits += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        """Give back a half-open probe slot that was not used"""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.total_failures += 1
+            self.probe_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"⚠️ Upstream circuit breaker OPEN after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = 0.0
+            if self.state == 'open':
+                retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'failure_threshold': self.failure_threshold,
+                'retry_in_seconds': round(retry_in, 1),
+                'total_failures': self.total_failures,
+                'total_short_circuits': self.total_short_circuits
+            }
+
+
+breaker = CircuitBreaker()
+last_good = TTLCache(max_entries=512)
+
+_lock = threading.Lock()
+_session = None
+_executor = None
+_owner_pid = None
+
+
+def _reset_if_forked():
+    global _session, _executor, _owner_pid
+    pid = os.getpid()
+    if _owner_pid != pid:
+        _session = None
+        _executor = None
+        _owner_pid = pid
+
+
+def get_session():
+    """Process-wide pooled session for upstream calls"""
+    global _session
+    if _session is not None and _owner_pid == os.getpid():
+        return _session
+    with _lock:
+        _reset_if_forked()
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({'Accept': 'application/json', 'Connection': 'keep-alive'})
+            _session = session
+        return _session
+
+
+def _get_executor():
+    global _executor
+    if _executor is not None and _owner_pid == os.getpid():
+        return _executor
+    with _lock:
+        _reset_if_forked()
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=UPSTREAM_CONCURRENCY,
+                                           thread_name_prefix='upstream')
+        return _executor
+
+
+def timeout_for(path):
+    for prefix, timeout in ENDPOINT_TIMEOUTS:
+        if path.startswith(prefix):
+            return timeout
+    return DEFAULT_TIMEOUT
+
+
+def _backoff(attempt, response=None):
+    """Full-jitter exponential backoff, honouring a short Retry-After"""
+    if response is not None and response.headers.get('Retry-After', '').isdigit():
+        return min(float(response.headers['Retry-After']), RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def get(path, params=None, timeout=None, retries=None, priority=None):
+    """
+    GET a CoinGecko path (or absolute URL) through the breaker, with retries
+
+    Every attempt spends one call from the shared budget for `priority`
+    (default: derived from the path, see upstream_budget).
+
+    Returns the final Response (which may still be a non-200 that is not
+    worth retrying, e.g. 404). Raises UpstreamUnavailable when the breaker
+    is open, BudgetExhausted when the budget refuses the first attempt and
+    UpstreamError when every attempt failed.
+    """
+    url = path if path.startswith('http') else f"{COINGECKO_API}{path}"
+    timeout = timeout or timeout_for(path)
+    retries = UPSTREAM_RETRIES if retries is None else retries
+    priority = priority or priority_for(path)
+
+    if not breaker.allow():
+        raise UpstreamUnavailable(f"Circuit open, skipping {path}")
+
+    last_error = None
+    for attempt in range(retries + 1):
+        if not budget.acquire(priority):
+            if attempt == 0:
+                breaker.release_probe()
+                raise BudgetExhausted(f"No {priority} budget for {path}")
+            break
+        response = None
+        try:
+            response = get_session().get(url, params=params, timeout=timeout)
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return response
+            if response.status_code == 429:
+                retry_after = response.headers.get('Retry-After', '')
+                budget.penalize(float(retry_after) if retry_after.isdigit() else None)
+            last_error = UpstreamError(f"{path} returned {response.status_code}")
+        except requests.RequestException as e:
+            last_error = UpstreamError(f"{path} failed: {e}")
+        if attempt < retries:
+            time.sleep(_backoff(attempt, response))
+
+    breaker.record_failure()
+    raise last_error
+
+
+def _last_good_key(path, params):
+    return (path, tuple(sorted((params or {}).items())))
+
+
+def fetch_json(path, params=None, fallback=None, timeout=None, priority=None):
+    """
+    GET and decode JSON, failing over to the last good response
+
+    When upstream fails (or the breaker is open, or the budget refuses the
+    call) the most recent good response for the same request is returned;
+    if there is none, fallback() is returned when given, otherwise the
+    error is raised. Trade-priority calls only accept a TRADE_MAX_STALE
+    old response.
+    """
+    key = _last_good_key(path, params)
+    try:
+        response = get(path, params=params, timeout=timeout, priority=priority)
+        if response.status_code != 200:
+            raise UpstreamError(f"{path} returned {response.status_code}")
+        data = response.json()
+        last_good.set(key, data)
+        return data
+    except (UpstreamError, ValueError) as e:
+        max_stale = TRADE_MAX_STALE if priority == 'trade' else LAST_GOOD_MAX_AGE
+        stale = last_good.get(key, max_stale)
+        if stale is not None:
+            print(f"⚠️ Serving cached response for {path}: {e}")
+            return stale
+        if fallback is not None:
+            print(f"⚠️ Serving fallback data for {path}: {e}")
+            return fallback()
+        raise
+
+
+def status():
+    """Breaker state, call budget and pool settings for monitoring"""
+    return {
+        'breaker': breaker.snapshot(),
+        'budget': budget.snapshot(),
+        'pool_size': UPSTREAM_POOL_SIZE,
+        'max_concurrency': UPSTREAM_CONCURRENCY,
+        'retries': UPSTREAM_RETRIES,
+        'cached_responses': len(last_good)
+    }
+
+
+async def fetch_json_async(path, params=None, fallback=None, priority=None):
+    """Async fetch_json, run on the bounded upstream pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), fetch_json, path, params, fallback, None, priority)
+
+
+async def run_async(fn, *args):
+    """Run any blocking upstream helper on the bounded pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), fn, *args)
+
+
+async def gather(**calls):
+    """
+    Await named coroutines concurrently
+
+    Returns:
+        dict: name -> result, or the exception the call raised
+    """
+    names = list(calls)
+    results = await asyncio.gather(*calls.values(), return_exceptions=True)
+    return dict(zip(names, results))
@@ -0,0 +1,246 @@
+"""
+Priority-aware CoinGecko call budget
+
+The free CoinGecko tier allows a fixed number of calls per minute for the
+whole deployment process. This scheduler owns that budget as a single
+token bucket and hands tokens out by priority class:
+
+    trade    pricing a buy/sell; may wait for a token, never degraded
+    prices   live price tables; may wait briefly
+    history  chart data; degrades to stale data when the budget is tight
+    market   trending coins and global stats; degrades first
+
+Each class keeps a reserve: it may only spend a token while at least
+`reserve` of the bucket would remain, so background widgets cannot drain
+the budget that trades depend on. Waiting callers are served highest
+class first. A class that cannot get a token in time is refused and the
+caller falls back to stale data (see upstream.fetch_json).
+
+CoinGecko counts calls per host, so the bucket lives in a small state
+file guarded by flock: every gunicorn worker (and both apps) of a
+deployment spend the same budget instead of one budget each. The file
+sits in the deployment's data directory, so other deployments or users
+on the host cannot read, lock or exhaust it; if it cannot be opened the
+process falls back to a bucket of its own. Waiting queues and the
+counters in snapshot() remain per process.
+
+Environment:
+    COINGECKO_CALLS_PER_MINUTE   sustained budget (default 30)
+    COINGECKO_BURST              bucket size (default 10)
+    COINGECKO_BUDGET_FILE        shared bucket state (default
+                                 $JOURNAL_DIR/coingecko_budget, i.e.
+                                 ./data next to the app; empty keeps a
+                                 per-process bucket)
+"""
+
+import fcntl
+import os
+import struct
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+from rate_limit import TokenBuckets
+
+CALLS_PER_MINUTE = float(os.environ.get('COINGECKO_CALLS_PER_MINUTE', 30))
+BURST = float(os.environ.get('COINGECKO_BURST', 10))
+DATA_DIR = os.environ.get('JOURNAL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+BUDGET_FILE = os.environ.get('COINGECKO_BUDGET_FILE', os.path.join(DATA_DIR, 'coingecko_budget'))
+
+# Penalty when upstream answers 429 without a usable Retry-After
+RATE_LIMITED_PENALTY = 10
+
+# name -> (rank, reserve fraction of the bucket, max seconds to wait for a token)
+PRIORITIES = {
+    'trade': (0, 0.0, 5.0),
+    'prices': (1, 0.2, 1.0),
+    'history': (2, 0.4, 0.0),
+    'market': (3, 0.6, 0.0),
+}
+
+# Default class by path prefix; first match wins
+PATH_PRIORITIES = [
+    ('/simple/price', 'prices'),
+    ('/coins/', 'history'),
+]
+DEFAULT_PRIORITY = 'market'
+
+_KEY = 'coingecko'
+
+
+def priority_for(path):
+    for prefix, priority in PATH_PRIORITIES:
+        if path.startswith(prefix):
+            return priority
+    return DEFAULT_PRIORITY
+
+
+class SharedBucket:
+    """
+    One token bucket whose state (tokens, last update) is kept in a file
+
+    Same peek/spend/wait_time interface as TokenBuckets (the key is
+    ignored); read and change it only inside locked(), which holds an
+    exclusive flock and writes the state back on exit. Times are
+    time.monotonic(), which is system-wide on Linux.
+    """
+
+    _STATE = struct.Struct('<dd')
+
+    def __init__(self, path, rate, capacity):
+        self.path = path
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._fd = None
+        self._pid = None
+        self._state = None
+
+    def open(self):
+        """The state file's descriptor for this process (raises OSError if unusable)"""
+        # flock is shared through a forked descriptor, so each process opens its own
+        if self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+        return self._fd
+
+    @contextmanager
+    def locked(self):
+        fd = self.open()
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            data = os.pread(fd, self._STATE.size, 0)
+            tokens, updated = self._STATE.unpack(data) if len(data) == self._STATE.size else (self.capacity, 0.0)
+            if updated > time.monotonic():  # written before a reboot
+                tokens, updated = self.capacity, 0.0
+            self._state = [tokens, updated]
+            yield self
+            os.pwrite(fd, self._STATE.pack(*self._state), 0)
+        finally:
+            self._state = None
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def peek(self, key, now):
+        tokens, updated = self._state
+        return min(self.capacity, tokens + max(now - updated, 0.0) * self.rate)
+
+    def spend(self, key, cost, now):
+        tokens = self.peek(key, now) - cost
+        self._state[:] = [tokens, now]
+        return tokens
+
+    def wait_time(self, tokens, cost):
+        if tokens >= cost:
+            return 0.0
+        return (cost - tokens) / self.rate
+
+
+class RequestBudget:
+    """Token bucket shared by every upstream call, handed out by priority"""
+
+    def __init__(self, calls_per_minute=CALLS_PER_MINUTE, burst=BURST, path=BUDGET_FILE):
+        self.calls_per_minute = calls_per_minute
+        if path:
+            self.buckets = SharedBucket(path, calls_per_minute / 60.0, burst)
+        else:
+            self.buckets = self._local_buckets(calls_per_minute / 60.0, burst)
+        self._cond = threading.Condition()
+        self._recent = deque()  # monotonic times of granted calls in the last minute
+        self.waiting = {name: 0 for name in PRIORITIES}
+        self.counters = {name: {'granted': 0, 'waited': 0, 'degraded': 0} for name in PRIORITIES}
+
+    @staticmethod
+    def _local_buckets(rate, capacity):
+        return TokenBuckets(rate, capacity, idle_seconds=float('inf'))
+
+    def _shared(self):
+        """Hold the cross-process bucket lock (never across a wait)"""
+        if not isinstance(self.buckets, SharedBucket):
+            return nullcontext()
+        try:
+            self.buckets.open()
+        except OSError as e:
+            print(f"⚠️ CoinGecko budget file {self.buckets.path} unavailable ({e}), using a per-process budget")
+            self.buckets = self._local_buckets(self.buckets.rate, self.buckets.capacity)
+            return nullcontext()
+        return self.buckets.locked()
+
+    def _can_spend(self, priority, now):
+        rank, reserve, _ = PRIORITIES[priority]
+        if any(self.waiting[name] and PRIORITIES[name][0] < rank for name in PRIORITIES):
+            return False
+        tokens = self.buckets.peek(_KEY, now)
+        return tokens - 1 >= self.buckets.capacity * reserve
+
+    def _grant(self, priority, now):
+        self.buckets.spend(_KEY, 1, now)
+        self._recent.append(now)
+        self.counters[priority]['granted'] += 1
+        return True
+
+    def acquire(self, priority):
+        """
+        Take one call from the budget for a priority class
+
+        Returns:
+            bool: True if the call may go upstream, False if the caller
+            should degrade to stale or fallback data
+        """
+        max_wait = PRIORITIES[priority][2]
+        with self._cond:
+            now = time.monotonic()
+            with self._shared():
+                if self._can_spend(priority, now):
+                    return self._grant(priority, now)
+            if max_wait <= 0:
+                self.counters[priority]['degraded'] += 1
+                return False
+
+            deadline = now + max_wait
+            self.waiting[priority] += 1
+            self.counters[priority]['waited'] += 1
+            try:
+                while True:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.counters[priority]['degraded'] += 1
+                        return False
+                    with self._shared():
+                        tokens = self.buckets.peek(_KEY, now)
+                    refill = max(self.buckets.wait_time(tokens, 1), 0.01)
+                    self._cond.wait(min(remaining, refill))
+                    now = time.monotonic()
+                    with self._shared():
+                        if self._can_spend(priority, now):
+                            return self._grant(priority, now)
+            finally:
+                self.waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def penalize(self, seconds=None):
+        """Upstream said 429: empty the bucket and push refills back by `seconds`"""
+        seconds = RATE_LIMITED_PENALTY if seconds is None else seconds
+        with self._cond, self._shared():
+            now = time.monotonic()
+            self.buckets.spend(_KEY, self.buckets.peek(_KEY, now) + self.buckets.rate * seconds, now)
+
+    def snapshot(self):
+        with self._cond:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            with self._shared():
+                tokens = self.buckets.peek(_KEY, now)
+            return {
+                'calls_per_minute': self.calls_per_minute,
+                'burst': int(self.buckets.capacity),
+                'tokens_available': round(tokens, 2),
+                'shared': isinstance(self.buckets, SharedBucket),
+                'calls_last_minute': len(self._recent),
+                'queue_depth': dict(self.waiting),
+                'classes': {name: dict(counts) for name, counts in self.counters.items()}
+            }
+
+
+budget = RequestBudget()
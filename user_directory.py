@@ -0,0 +1,106 @@
+"""
+Indexed in-memory user directory for CryptoPulse
+
+Drop-in replacement for the plain `users_db` dict (keyed by email) that
+also maintains secondary indexes, so lookups by username or role and
+per-role counts are O(1) instead of full scans over every user:
+
+    username -> email
+    role     -> set of emails
+
+Indexes are updated on every insert, replace and delete. Code that edits
+a stored user's `username` or `role` in place must go through
+`update_user` so the indexes stay consistent.
+"""
+
+from collections.abc import MutableMapping
+
+ROLES = ('user', 'admin', 'analyst', 'moderator')
+
+
+class UserDirectory(MutableMapping):
+    """Email-keyed user store with username and role indexes"""
+
+    def __init__(self, users=None):
+        self._users = {}
+        self._email_by_username = {}
+        self._emails_by_role = {role: set() for role in ROLES}
+        if users:
+            self.update(users)
+
+    # Mapping interface (keyed by email)
+
+    def __getitem__(self, email):
+        return self._users[email]
+
+    def __setitem__(self, email, user):
+        # Validate before touching the indexes so a rejected write changes nothing
+        username = user.get('username')
+        if username is not None:
+            existing = self._email_by_username.get(username)
+            if existing is not None and existing != email:
+                raise ValueError(f"Username '{username}' is already taken")
+        if email in self._users:
+            self._unindex(email, self._users[email])
+        self._users[email] = user
+        self._index(email, user)
+
+    def __delitem__(self, email):
+        user = self._users.pop(email)
+        self._unindex(email, user)
+
+    def __contains__(self, email):
+        return email in self._users
+
+    def __iter__(self):
+        return iter(self._users)
+
+    def __len__(self):
+        return len(self._users)
+
+    def __repr__(self):
+        return f"<UserDirectory {len(self._users)} users>"
+
+    # Index maintenance
+
+    def _index(self, email, user):
+        username = user.get('username')
+        if username is not None:
+            self._email_by_username[username] = email
+        self._emails_by_role.setdefault(user.get('role', 'user'), set()).add(email)
+
+    def _unindex(self, email, user):
+        username = user.get('username')
+        if username is not None and self._email_by_username.get(username) == email:
+            del self._email_by_username[username]
+        self._emails_by_role.get(user.get('role', 'user'), set()).discard(email)
+
+    def update_user(self, email, **changes):
+        """Change fields of a stored user, keeping the indexes in sync"""
+        user = dict(self._users[email])
+        user.update(changes)
+        self[email] = user
+        return user
+
+    # Lookups
+
+    def has_username(self, username):
+        return username in self._email_by_username
+
+    def email_for_username(self, username):
+        return self._email_by_username.get(username)
+
+    def get_by_username(self, username):
+        email = self._email_by_username.get(username)
+        return self._users.get(email) if email is not None else None
+
+    def emails_with_role(self, role):
+        """Set of emails with the given role (do not mutate)"""
+        return self._emails_by_role.get(role, set())
+
+    def count_role(self, role):
+        return len(self._emails_by_role.get(role, ()))
+
+    def role_counts(self):
+        """{role: count} for every known role"""
+        return {role: len(emails) for role, emails in self._emails_by_role.items()}